@@ -17,6 +17,7 @@ from .auth_utils import (
     hash_password,
     verify_password,
     create_access_token,
+    create_user_access_token,
     verify_token,
     SECRET_KEY,
     ALGORITHM,
@@ -39,6 +40,7 @@ __all__ = [
     
     # Utilidades JWT
     'create_access_token',
+    'create_user_access_token',
     'verify_token',
     
     # Configuración
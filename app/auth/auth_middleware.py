@@ -1,75 +1,106 @@
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from auth.auth_utils import verify_token
+from auth.principal_cache import get_cached_principal, cache_principal
+from auth.token_revocation import token_revocation_store
 from typing import Optional
 
 security = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def _credentials_exception(detail: str = "Invalid authentication credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _decode_active_token(token: str) -> Optional[dict]:
     """
-    Middleware para obtener el usuario actual desde el token JWT
+    Decodifica el token y descarta los revocados (logout, eliminación,
+    cambio de contraseña o de rol). No consulta la base de datos.
+    """
+    payload = verify_token(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+    if token_revocation_store.is_revoked(payload):
+        return None
+    return payload
+
+def _resolve_principal(payload: dict) -> Optional[dict]:
+    """
+    Obtiene el usuario del token desde la caché de principals y solo consulta
+    la base de datos si no está cacheado.
     """
     # Import dentro de la función para evitar circular imports
     from services.user.userService import get_user_by_id_db
-    
-    token = credentials.credentials
-    payload = verify_token(token)
-    
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user_id: int = payload.get("sub")
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
+
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
+        return None
+    issued_at = payload.get("iat")
+
+    user = get_cached_principal(user_id, issued_at)
+    if user is not None:
+        return user
+
     user = get_user_by_id_db(user_id)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
+        return None
+    cache_principal(user_id, issued_at, user)
+    user.pop("password", None)
     return user
 
-def get_current_admin_user(current_user: dict = Depends(get_current_user)):
+def get_token_payload(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
-    Middleware para verificar que el usuario actual es admin
+    Middleware que valida el token y devuelve sus claims sin cargar el usuario
     """
-    if current_user.get("role") != "admin":
+    payload = _decode_active_token(credentials.credentials)
+    if payload is None:
+        raise _credentials_exception()
+    return payload
+
+def get_current_user(payload: dict = Depends(get_token_payload)):
+    """
+    Middleware para obtener el usuario actual desde el token JWT
+    """
+    user = _resolve_principal(payload)
+    if user is None:
+        raise _credentials_exception("User not found")
+
+    return user
+
+def get_current_admin_user(payload: dict = Depends(get_token_payload)):
+    """
+    Middleware para verificar que el usuario actual es admin.
+
+    Decide solo con el claim 'role' del token; un cambio de rol o la
+    eliminación del usuario revocan sus tokens. Los tokens emitidos antes de
+    incluir el rol se resuelven contra la base de datos.
+    """
+    role = payload.get("role")
+    if role is None:
+        user = _resolve_principal(payload)
+        if user is None:
+            raise _credentials_exception("User not found")
+        role = user.get("role")
+
+    if role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions"
         )
-    return current_user
+    return {"id": int(payload["sub"]), "role": role}
 
 def optional_auth(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
     """
     Middleware de autenticación opcional
     """
-    # Import dentro de la función para evitar circular imports
-    from services.user.userService import get_user_by_id_db
-    
     if credentials is None:
         return None
-    
-    token = credentials.credentials
-    payload = verify_token(token)
-    
+
+    payload = _decode_active_token(credentials.credentials)
     if payload is None:
         return None
-    
-    user_id: int = payload.get("sub")
-    if user_id is None:
-        return None
-    
-    user = get_user_by_id_db(user_id)
-    return user
+
+    return _resolve_principal(payload)
@@ -3,12 +3,24 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
 import os
+import uuid
 from dotenv import load_dotenv
+from auth.token_revocation import token_revocation_store
 
 load_dotenv()
 
 # Configuración para el hasheo de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# BCRYPT_ROUNDS se calibra con scripts/calibrate_password_hashing.py. min/max
+# iguales hacen que needs_update marque los hashes con otro costo, y el login
+# los re-hashea de forma transparente.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 # Configuración JWT
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
@@ -23,6 +35,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica si una contraseña coincide con su hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Verifica la contraseña y, si el hash usa parámetros distintos de los
+    actuales, devuelve también el nuevo hash. Retorna (valida, nuevo_hash | None).
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crea un token JWT de acceso"""
     to_encode = data.copy()
@@ -31,10 +50,25 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # iat identifica el token en la caché de principals; jti permite revocarlo (logout)
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_user_access_token(user: dict, expires_delta: Optional[timedelta] = None):
+    """
+    Crea el token de un usuario con su rol y la versión de token vigente, de
+    modo que la autorización pueda decidirse solo con los claims.
+    """
+    return create_access_token(
+        data={
+            "sub": str(user["id"]),
+            "role": user["role"],
+            "ver": token_revocation_store.get_version(user["id"]) or 0,
+        },
+        expires_delta=expires_delta,
+    )
+
 def verify_token(token: str) -> Optional[dict]:
     """Verifica y decodifica un token JWT"""
     try:
@@ -0,0 +1,260 @@
+"""
+Limitador de intentos de login por IP y por email.
+
+Cada intento fallido se registra en una ventana deslizante por IP y por
+email. Al superar el máximo de la ventana la clave queda bloqueada durante
+un tiempo que se duplica con cada bloqueo consecutivo (lockout exponencial).
+La verificación se hace antes de calcular bcrypt, así el tráfico de
+credential stuffing no se convierte en trabajo de CPU.
+
+Backends (LOGIN_RATE_LIMIT_BACKEND):
+- memory: estructuras del proceso (un solo worker)
+- redis: sorted sets compartidos entre workers (usa REDIS_URL)
+
+La IP del cliente se toma de X-Forwarded-For solo si la petición llega desde
+un proxy de LOGIN_TRUSTED_PROXIES (IPs o redes CIDR separadas por comas); si
+no, detrás de un proxy todos los usuarios compartirían la IP del proxy y 20
+fallos bloquearían todos los logins.
+"""
+import ipaddress
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOGIN_RATE_LIMIT_BACKEND = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory").lower()
+LOGIN_RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("LOGIN_RATE_LIMIT_WINDOW_SECONDS", "300"))
+LOGIN_RATE_LIMIT_IP_MAX = int(os.getenv("LOGIN_RATE_LIMIT_IP_MAX", "20"))
+LOGIN_RATE_LIMIT_EMAIL_MAX = int(os.getenv("LOGIN_RATE_LIMIT_EMAIL_MAX", "5"))
+LOGIN_LOCKOUT_BASE_SECONDS = int(os.getenv("LOGIN_LOCKOUT_BASE_SECONDS", "30"))
+LOGIN_LOCKOUT_MAX_SECONDS = int(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", "3600"))
+LOGIN_TRUSTED_PROXIES = [
+    ipaddress.ip_network(value.strip(), strict=False)
+    for value in os.getenv("LOGIN_TRUSTED_PROXIES", "").split(",") if value.strip()
+]
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+
+class LoginRateLimited(Exception):
+    """La IP o el email están bloqueados temporalmente"""
+
+    def __init__(self, scope: str, retry_after: int):
+        super().__init__(f"Too many login attempts ({scope})")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def _is_trusted_proxy(address: Optional[str]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except (TypeError, ValueError):
+        return False
+    return any(ip in network for network in LOGIN_TRUSTED_PROXIES)
+
+
+def client_ip(request) -> Optional[str]:
+    """
+    IP del cliente para el límite de intentos. X-Forwarded-For se recorre de
+    derecha a izquierda saltando los proxies de confianza: las entradas de la
+    izquierda las escribe el cliente y no son fiables.
+    """
+    peer = request.client.host if request.client else None
+    if not _is_trusted_proxy(peer):
+        return peer
+    forwarded = [value.strip() for value in request.headers.get("x-forwarded-for", "").split(",") if value.strip()]
+    for address in reversed(forwarded):
+        if not _is_trusted_proxy(address):
+            return address
+    return forwarded[0] if forwarded else peer
+
+
+class _MemoryStore:
+    MAX_TRACKED_KEYS = 100000
+    PURGE_INTERVAL_SECONDS = 60
+
+    def __init__(self):
+        self._attempts: Dict[str, Deque[float]] = {}
+        self._locks: Dict[str, float] = {}
+        # clave -> (bloqueos consecutivos, expiración del contador)
+        self._levels: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def _purge(self, now: float, window: int, force: bool = False):
+        # Debe llamarse con self._lock tomado. Quita bloqueos, niveles e
+        # intentos vencidos para que la memoria no crezca con cada IP/email visto
+        if not force and now < self._next_purge:
+            return
+        self._next_purge = now + self.PURGE_INTERVAL_SECONDS
+        for key in [k for k, until in self._locks.items() if until <= now]:
+            del self._locks[key]
+        for key in [k for k, (_, expires) in self._levels.items() if expires <= now]:
+            del self._levels[key]
+        for key in [k for k, v in self._attempts.items() if not v or v[-1] <= now - window]:
+            del self._attempts[key]
+
+    def locked_for(self, key: str, now: float) -> int:
+        with self._lock:
+            until = self._locks.get(key)
+            if until is None:
+                return 0
+            if until <= now:
+                del self._locks[key]
+                return 0
+            return int(until - now) + 1
+
+    def add_attempt(self, key: str, now: float, window: int) -> int:
+        with self._lock:
+            attempts = self._attempts.setdefault(key, deque())
+            attempts.append(now)
+            while attempts and attempts[0] <= now - window:
+                attempts.popleft()
+            count = len(attempts)
+            self._purge(now, window, force=len(self._attempts) > self.MAX_TRACKED_KEYS)
+            return count
+
+    def lock(self, key: str, now: float, base: int, maximum: int) -> int:
+        with self._lock:
+            level, expires = self._levels.get(key, (0, 0.0))
+            if expires <= now:
+                level = 0
+            duration = min(maximum, base * (2 ** level))
+            self._locks[key] = now + duration
+            # El nivel se olvida tras un periodo sin bloqueos igual al máximo
+            self._levels[key] = (level + 1, now + duration + maximum)
+            self._attempts.pop(key, None)
+            return duration
+
+    def reset(self, key: str):
+        with self._lock:
+            self._attempts.pop(key, None)
+            self._levels.pop(key, None)
+
+    def size(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tracked_keys": len(self._attempts),
+                "locked_keys": len(self._locks),
+                "lockout_levels": len(self._levels),
+            }
+
+
+class _RedisStore:
+    def __init__(self, client):
+        self._redis = client
+
+    def locked_for(self, key: str, now: float) -> int:
+        ttl = self._redis.ttl(f"login:lock:{key}")
+        return int(ttl) if ttl and ttl > 0 else 0
+
+    def add_attempt(self, key: str, now: float, window: int) -> int:
+        attempts_key = f"login:attempts:{key}"
+        pipe = self._redis.pipeline()
+        pipe.zadd(attempts_key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+        pipe.zremrangebyscore(attempts_key, 0, now - window)
+        pipe.zcard(attempts_key)
+        pipe.expire(attempts_key, window)
+        return int(pipe.execute()[2])
+
+    def lock(self, key: str, now: float, base: int, maximum: int) -> int:
+        level_key = f"login:lockouts:{key}"
+        level = int(self._redis.incr(level_key)) - 1
+        duration = min(maximum, base * (2 ** level))
+        pipe = self._redis.pipeline()
+        pipe.expire(level_key, duration + maximum)
+        pipe.set(f"login:lock:{key}", 1, ex=duration)
+        pipe.delete(f"login:attempts:{key}")
+        pipe.execute()
+        return duration
+
+    def reset(self, key: str):
+        self._redis.delete(f"login:attempts:{key}", f"login:lockouts:{key}")
+
+    def size(self) -> Dict[str, int]:
+        return {}
+
+
+class LoginRateLimiter:
+    """Ventana deslizante de intentos fallidos con lockout exponencial"""
+
+    def __init__(self, backend: str = LOGIN_RATE_LIMIT_BACKEND):
+        self.backend = backend
+        self._memory = _MemoryStore()
+        self._store = self._memory
+        if backend == "redis":
+            try:
+                import redis
+                self._store = _RedisStore(redis.Redis.from_url(REDIS_URL))
+            except Exception as e:
+                logger.error(f"No se pudo configurar Redis para el limitador de login, usando memoria: {e}")
+                self.backend = "memory"
+        self._counters_lock = threading.Lock()
+        self.blocked = {"ip": 0, "email": 0}
+        self.lockouts = {"ip": 0, "email": 0}
+
+    def _call(self, method: str, *args):
+        try:
+            return getattr(self._store, method)(*args)
+        except Exception as e:
+            if self._store is self._memory:
+                raise
+            logger.warning(f"Error en Redis del limitador de login, usando memoria: {e}")
+            return getattr(self._memory, method)(*args)
+
+    @staticmethod
+    def _keys(ip: Optional[str], email: Optional[str]):
+        keys = []
+        if ip:
+            keys.append(("ip", f"ip:{ip}", LOGIN_RATE_LIMIT_IP_MAX))
+        if email:
+            keys.append(("email", f"email:{email.strip().lower()}", LOGIN_RATE_LIMIT_EMAIL_MAX))
+        return keys
+
+    def check(self, ip: Optional[str], email: Optional[str]):
+        """Lanza LoginRateLimited si la IP o el email están bloqueados"""
+        now = time.time()
+        for scope, key, _ in self._keys(ip, email):
+            retry_after = self._call("locked_for", key, now)
+            if retry_after:
+                with self._counters_lock:
+                    self.blocked[scope] += 1
+                raise LoginRateLimited(scope, retry_after)
+
+    def record_failure(self, ip: Optional[str], email: Optional[str]):
+        """Registra un intento fallido y bloquea las claves que superen el límite"""
+        now = time.time()
+        for scope, key, maximum in self._keys(ip, email):
+            attempts = self._call("add_attempt", key, now, LOGIN_RATE_LIMIT_WINDOW_SECONDS)
+            if attempts >= maximum:
+                duration = self._call("lock", key, now, LOGIN_LOCKOUT_BASE_SECONDS, LOGIN_LOCKOUT_MAX_SECONDS)
+                with self._counters_lock:
+                    self.lockouts[scope] += 1
+                logger.warning(f"Login bloqueado para {key} durante {duration}s")
+
+    def record_success(self, ip: Optional[str], email: Optional[str]):
+        """Un login correcto limpia los intentos del email (no los de la IP)"""
+        if email:
+            self._call("reset", f"email:{email.strip().lower()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            stats = {
+                "backend": self.backend,
+                "window_seconds": LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+                "ip_max_failures": LOGIN_RATE_LIMIT_IP_MAX,
+                "email_max_failures": LOGIN_RATE_LIMIT_EMAIL_MAX,
+                "trusted_proxies": [str(network) for network in LOGIN_TRUSTED_PROXIES],
+                "blocked_attempts": dict(self.blocked),
+                "lockouts": dict(self.lockouts),
+            }
+        stats.update(self._store.size())
+        return stats
+
+
+# Instancia global del limitador
+login_rate_limiter = LoginRateLimiter()
@@ -0,0 +1,271 @@
+"""
+Ejecución acotada de bcrypt fuera del threadpool de FastAPI.
+
+bcrypt consume decenas o cientos de ms de CPU por llamada. Ejecutarlo en el
+threadpool compartido hace que una ráfaga de logins bloquee el resto de rutas
+síncronas. Aquí se ejecuta en un ProcessPoolExecutor dedicado (usa todos los
+núcleos y no compite por el GIL) con un límite de operaciones en vuelo: si
+el pool está saturado se lanza PasswordHasherBusy y la ruta responde 503
+inmediatamente en lugar de encolar sin límite.
+
+Las rutas usan las variantes async (hash_async, verify_and_update_async...):
+esperan el resultado en el event loop con asyncio.wrap_future, sin ocupar un
+hilo del threadpool de anyio (40 por defecto, menos que max_pending en
+máquinas con muchos núcleos). Las variantes síncronas quedan para scripts.
+
+Configuración:
+- PASSWORD_HASH_WORKERS: procesos del pool (por defecto, núcleos disponibles)
+- PASSWORD_HASH_MAX_PENDING: operaciones en vuelo permitidas (ejecutando + en cola)
+- PASSWORD_HASH_TIMEOUT: segundos máximos de espera por una operación
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 4)))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "5"))
+
+
+class PasswordHasherBusy(Exception):
+    """El pool de hashing está saturado o la operación excedió el timeout"""
+
+    def __init__(self, message: str = "Password hashing capacity exhausted", retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ---------- Funciones ejecutadas en los procesos del pool ----------
+# Cada una retorna (resultado, segundos de CPU consumidos en el proceso hijo)
+
+def _hash_in_worker(password: str):
+    from auth.auth_utils import hash_password
+    started = time.process_time()
+    return hash_password(password), time.process_time() - started
+
+
+def _verify_in_worker(plain_password: str, hashed_password: str):
+    from auth.auth_utils import verify_password
+    started = time.process_time()
+    return verify_password(plain_password, hashed_password), time.process_time() - started
+
+
+def _verify_and_update_in_worker(plain_password: str, hashed_password: str):
+    from auth.auth_utils import verify_and_update_password
+    started = time.process_time()
+    return verify_and_update_password(plain_password, hashed_password), time.process_time() - started
+
+
+def _warmup_worker() -> bool:
+    # Importa passlib/bcrypt en el proceso hijo antes del primer login
+    import auth.auth_utils  # noqa: F401
+    return True
+
+
+class LatencyStats:
+    """Latencias recientes (ms) de una operación, para p50/p99"""
+
+    def __init__(self, size: int = 1000):
+        self._wall = deque(maxlen=size)
+        self._cpu = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, wall_ms: float, cpu_ms: Optional[float] = None):
+        with self._lock:
+            self.count += 1
+            self._wall.append(wall_ms)
+            if cpu_ms is not None:
+                self._cpu.append(cpu_ms)
+
+    @staticmethod
+    def _percentile(values, p):
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            wall, cpu = list(self._wall), list(self._cpu)
+        stats = {
+            "count": self.count,
+            "p50_ms": self._percentile(wall, 50),
+            "p99_ms": self._percentile(wall, 99),
+        }
+        if cpu:
+            stats["cpu_avg_ms"] = round(sum(cpu) / len(cpu), 2)
+            stats["cpu_p99_ms"] = self._percentile(cpu, 99)
+        return stats
+
+
+class PasswordHasher:
+    """Pool de procesos acotado para hashear y verificar contraseñas"""
+
+    def __init__(self,
+                 workers: int = PASSWORD_HASH_WORKERS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 timeout: float = PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Operaciones enviadas al pool que aún no terminaron (ejecutando + en cola)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.rehashed = 0
+        self.latency: Dict[str, LatencyStats] = {
+            "hash": LatencyStats(),
+            "verify": LatencyStats(),
+            "login": LatencyStats(),
+        }
+
+    # ---------- Ciclo de vida ----------
+
+    def start(self):
+        """Crea el pool y precarga bcrypt en cada proceso"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            # spawn: el proceso padre tiene hilos (uvicorn, threadpool) y fork no es seguro
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        try:
+            for future in [self._executor.submit(_warmup_worker) for _ in range(self.workers)]:
+                future.result(timeout=60)
+            logger.info(f"Pool de hashing de contraseñas iniciado ({self.workers} procesos)")
+        except Exception as e:
+            logger.warning(f"Error precalentando el pool de hashing: {e}")
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Operaciones ----------
+
+    def _release(self, _future=None):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _submit(self, fn, *args):
+        """Envía la operación al pool o lanza PasswordHasherBusy si hay max_pending en vuelo"""
+        with self._in_flight_lock:
+            if self._in_flight >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self._in_flight += 1
+        try:
+            if self._executor is None:
+                self.start()
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # El hueco se libera cuando el proceso termina, no cuando el llamador
+        # deja de esperar: así un timeout no permite superar max_pending
+        future.add_done_callback(self._release)
+        return future
+
+    def _finish(self, operation: str, started: float, result):
+        value, cpu_seconds = result
+        self.completed += 1
+        # La latencia incluye la espera en cola; la CPU es solo la del proceso hijo
+        self.latency[operation].record((time.perf_counter() - started) * 1000, cpu_seconds * 1000)
+        return value
+
+    def _timed_out(self, future):
+        future.cancel()
+        self.timeouts += 1
+        return PasswordHasherBusy("Password hashing timed out")
+
+    def _run(self, operation: str, fn, *args):
+        started = time.perf_counter()
+        future = self._submit(fn, *args)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise self._timed_out(future)
+        return self._finish(operation, started, result)
+
+    async def _run_async(self, operation: str, fn, *args):
+        started = time.perf_counter()
+        future = self._submit(fn, *args)
+        try:
+            # shield: el timeout no cancela el wrapper antes que el future del pool
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out(future)
+        return self._finish(operation, started, result)
+
+    def hash(self, password: str) -> str:
+        """Hashea una contraseña en el pool. Lanza PasswordHasherBusy si está saturado."""
+        return self._run("hash", _hash_in_worker, password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verifica una contraseña en el pool. Lanza PasswordHasherBusy si está saturado."""
+        return self._run("verify", _verify_in_worker, plain_password, hashed_password)
+
+    def verify_and_update(self, plain_password: str, hashed_password: str):
+        """
+        Verifica y retorna (valida, nuevo_hash | None); hay nuevo hash cuando el
+        guardado usa un costo distinto de BCRYPT_ROUNDS.
+        """
+        valid, new_hash = self._run("verify", _verify_and_update_in_worker, plain_password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    async def hash_async(self, password: str) -> str:
+        """Como hash, sin bloquear un hilo mientras espera al pool"""
+        return await self._run_async("hash", _hash_in_worker, password)
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run_async("verify", _verify_in_worker, plain_password, hashed_password)
+
+    async def verify_and_update_async(self, plain_password: str, hashed_password: str):
+        valid, new_hash = await self._run_async(
+            "verify", _verify_and_update_in_worker, plain_password, hashed_password
+        )
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def record_login(self, elapsed_ms: float):
+        """Registra la latencia total de un login (BD + bcrypt)"""
+        self.latency["login"].record(elapsed_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        from auth.auth_utils import BCRYPT_ROUNDS
+        with self._in_flight_lock:
+            in_flight = self._in_flight
+        return {
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "rehashed": self.rehashed,
+            "latency": {operation: stats.snapshot() for operation, stats in self.latency.items()},
+        }
+
+
+# Instancia global del pool
+password_hasher = PasswordHasher()
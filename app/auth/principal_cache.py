@@ -0,0 +1,43 @@
+"""
+Caché de principals (usuarios autenticados) para el middleware de auth.
+
+get_current_user y optional_auth resolvían el usuario con una consulta a
+MySQL en cada petición. Aquí se guarda la fila del usuario (sin password)
+indexada por (user_id, iat del token) durante un TTL corto.
+
+update_user_db, delete_user_db y change_password_db invalidan todas las
+entradas del usuario al modificarlo.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from cache import TTLCache
+
+AUTH_PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+AUTH_PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("AUTH_PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+
+_principals = TTLCache(
+    max_size=AUTH_PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=AUTH_PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def get_cached_principal(user_id: int, issued_at: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Obtiene el usuario cacheado para un token, o None si no está"""
+    principal = _principals.get((user_id, issued_at))
+    return dict(principal) if principal is not None else None
+
+
+def cache_principal(user_id: int, issued_at: Optional[int], user: Dict[str, Any]):
+    """Guarda el usuario sin el hash de la contraseña"""
+    principal = {key: value for key, value in user.items() if key != "password"}
+    _principals.set((user_id, issued_at), principal)
+
+
+def invalidate_principal(user_id: int) -> int:
+    """Elimina todas las entradas de un usuario (de cualquier token)"""
+    return _principals.delete_where(lambda key: key[0] == user_id)
+
+
+def get_principal_cache_stats() -> Dict[str, Any]:
+    return _principals.get_stats()
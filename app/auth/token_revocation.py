@@ -0,0 +1,270 @@
+"""
+Lista de revocación de tokens JWT.
+
+Permite decidir la autorización con los claims del token (sub, role, ver,
+jti) sin cargar el usuario ni consultar MySQL en cada petición:
+- ver: versión de token del usuario. Al cambiar su contraseña o cerrar todas
+  sus sesiones se incrementa la versión y todos sus tokens previos quedan
+  revocados.
+- jti: identificador del token. /users/logout revoca un token concreto hasta
+  su expiración.
+- Al eliminar un usuario se revocan todos sus tokens hasta que expiren los
+  emitidos más recientemente (ACCESS_TOKEN_EXPIRE_MINUTES).
+
+El estado vive en memoria del proceso (versiones por usuario y jti revocados
+hasta su expiración). MySQL es la fuente persistente: users.token_version y
+la tabla revoked_tokens (las bajas de usuario se guardan como jti
+'user:<id>'). Se carga completo al arrancar (start) y se escribe en cada
+revocación; is_revoked nunca consulta la base de datos. Si la carga inicial
+falla, los tokens se rechazan y se reintenta cada
+TOKEN_REVOCATION_RETRY_SECONDS.
+
+Backends (TOKEN_REVOCATION_BACKEND):
+- memory (por defecto): las revocaciones se aplican solo en este proceso
+  (un solo worker); los demás las ven al reiniciar.
+- redis: además se publican en el canal pub/sub TOKEN_REVOCATION_CHANNEL
+  (usa REDIS_URL) y cada worker las aplica en su memoria. Tras una
+  reconexión se recarga desde MySQL para no perder publicaciones.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REVOCATION_BACKEND = os.getenv("TOKEN_REVOCATION_BACKEND", "memory").lower()
+TOKEN_REVOCATION_CHANNEL = os.getenv("TOKEN_REVOCATION_CHANNEL", "token_revocation")
+TOKEN_REVOCATION_RETRY_SECONDS = float(os.getenv("TOKEN_REVOCATION_RETRY_SECONDS", "5"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+_USER_JTI = "user:{}"
+
+
+class TokenRevocationStore:
+    """Versiones de token por usuario y tokens revocados por jti"""
+
+    def __init__(self, backend: str = TOKEN_REVOCATION_BACKEND):
+        if backend not in ("memory", "redis"):
+            raise ValueError(f"TOKEN_REVOCATION_BACKEND inválido: {backend}")
+        self.backend = backend
+        self._versions: Dict[int, int] = {}
+        # jti -> expiración (epoch en segundos)
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._next_load = 0.0
+        self._redis = None
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.revoked_hits = 0
+        self.errors = 0
+        self.loads = 0
+
+    # ---------- Ciclo de vida ----------
+
+    def start(self):
+        """Carga el estado desde MySQL y, con redis, se suscribe al canal"""
+        self._try_load()
+        if self.backend == "redis" and self._listener is None:
+            import redis
+            # from_url no abre la conexión hasta el primer comando
+            self._redis = redis.Redis.from_url(REDIS_URL)
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._listen, name="token-revocation", daemon=True)
+            self._listener.start()
+
+    def stop(self):
+        self._stop.set()
+        self._listener = None
+
+    def load(self):
+        """Reemplaza el estado en memoria por el de MySQL"""
+        from database import get_connection
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, token_version FROM users WHERE token_version > 0")
+            versions = {row["id"]: row["token_version"] for row in cursor.fetchall()}
+            cursor.execute(
+                """SELECT jti, UNIX_TIMESTAMP(expires_at) AS expires_at
+                   FROM revoked_tokens WHERE expires_at >= UTC_TIMESTAMP()"""
+            )
+            revoked = {row["jti"]: float(row["expires_at"]) for row in cursor.fetchall()}
+        finally:
+            conn.close()
+        with self._lock:
+            # max: no perder una revocación aplicada mientras se leía MySQL
+            for user_id, version in self._versions.items():
+                versions[user_id] = max(version, versions.get(user_id, 0))
+            for jti, expires_at in self._revoked.items():
+                revoked[jti] = max(expires_at, revoked.get(jti, 0.0))
+            self._versions, self._revoked = versions, revoked
+            self._loaded = True
+        self.loads += 1
+        logger.info(f"Revocación de tokens cargada: {len(versions)} versiones, {len(revoked)} jti revocados")
+
+    def _try_load(self) -> bool:
+        if self._loaded:
+            return True
+        now = time.monotonic()
+        if now < self._next_load:
+            return False
+        self._next_load = now + TOKEN_REVOCATION_RETRY_SECONDS
+        try:
+            self.load()
+            return True
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"No se pudo cargar la revocación de tokens desde MySQL: {e}")
+            return False
+
+    # ---------- Redis pub/sub ----------
+
+    def _publish(self, message: Dict[str, Any]):
+        if self._redis is None:
+            return
+        try:
+            self._redis.publish(TOKEN_REVOCATION_CHANNEL, json.dumps(message))
+        except Exception as e:
+            # Ya está en MySQL: los demás workers la verán al recargar
+            self.errors += 1
+            logger.error(f"Error publicando revocación de tokens en Redis: {e}")
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(TOKEN_REVOCATION_CHANNEL)
+                # Las publicaciones perdidas mientras no había suscripción están en MySQL
+                self.load()
+                for message in pubsub.listen():
+                    if self._stop.is_set():
+                        break
+                    if message.get("type") == "message":
+                        self._apply(json.loads(message["data"]))
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Listener de revocación de tokens desconectado: {e}")
+                self._stop.wait(2)
+
+    def _apply(self, message: Dict[str, Any]):
+        with self._lock:
+            if message.get("type") == "version":
+                user_id = int(message["user_id"])
+                self._versions[user_id] = max(self._versions.get(user_id, 0), int(message["version"]))
+            elif message.get("type") == "jti":
+                self._revoked[message["jti"]] = float(message["expires_at"])
+
+    # ---------- Versiones ----------
+
+    def get_version(self, user_id: int) -> int:
+        """Versión vigente de los tokens del usuario"""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def bump_version(self, user_id: int) -> int:
+        """Revoca todos los tokens emitidos hasta ahora para el usuario"""
+        from database import get_connection
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET token_version = token_version + 1 WHERE id = %s", (user_id,))
+            cursor.execute("SELECT token_version FROM users WHERE id = %s", (user_id,))
+            row = cursor.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            version = max(self._versions.get(user_id, 0) + 1, row["token_version"] if row else 0)
+        message = {"type": "version", "user_id": user_id, "version": version}
+        self._apply(message)
+        self._publish(message)
+        return version
+
+    # ---------- Tokens individuales ----------
+
+    def revoke_jti(self, jti: str, expires_at: float):
+        """Revoca un token concreto hasta su expiración (epoch en segundos)"""
+        from database import get_connection
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """INSERT INTO revoked_tokens (jti, expires_at) VALUES (%s, %s)
+                   ON DUPLICATE KEY UPDATE expires_at = GREATEST(expires_at, VALUES(expires_at))""",
+                (jti, datetime.utcfromtimestamp(expires_at))
+            )
+            # Purga de tokens ya expirados (usa idx_expires)
+            cursor.execute("DELETE FROM revoked_tokens WHERE expires_at < UTC_TIMESTAMP() LIMIT 1000")
+            conn.commit()
+        finally:
+            conn.close()
+        message = {"type": "jti", "jti": jti, "expires_at": expires_at}
+        self._apply(message)
+        self._publish(message)
+        now = time.time()
+        with self._lock:
+            # Purga perezosa de tokens ya expirados
+            for expired in [key for key, exp in self._revoked.items() if exp < now]:
+                del self._revoked[expired]
+
+    def revoke_user(self, user_id: int):
+        """
+        Revoca todos los tokens de un usuario eliminado. Sin fila en users la
+        versión no se puede persistir: se guarda como jti 'user:<id>' hasta
+        que expiren los tokens emitidos hasta ahora.
+        """
+        from auth.auth_utils import ACCESS_TOKEN_EXPIRE_MINUTES
+        self.revoke_jti(_USER_JTI.format(user_id), time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """
+        Indica si un token decodificado fue revocado por jti, por versión o
+        por baja del usuario. Solo consulta memoria; si el estado aún no se
+        pudo cargar desde MySQL el token se considera revocado.
+        """
+        if not self._try_load():
+            self.errors += 1
+            return True
+        user_id = _user_id(payload)
+        jti = payload.get("jti")
+        version = int(payload.get("ver", 0))
+        now = time.time()
+        with self._lock:
+            current = self._versions.get(user_id, 0)
+            revoked_until = max(
+                self._revoked.get(jti, 0.0) if jti else 0.0,
+                self._revoked.get(_USER_JTI.format(user_id), 0.0),
+            )
+        revoked = version < current or revoked_until >= now
+        if revoked:
+            self.revoked_hits += 1
+        return revoked
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "loaded": self._loaded,
+                "loads": self.loads,
+                "users_with_version": len(self._versions),
+                "revoked_tokens": len(self._revoked),
+                "revoked_hits": self.revoked_hits,
+                "errors": self.errors,
+                "listener_alive": self._listener is not None and self._listener.is_alive(),
+            }
+
+
+def _user_id(payload: Dict[str, Any]) -> Optional[int]:
+    try:
+        return int(payload.get("sub"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Instancia global de la lista de revocación
+token_revocation_store = TokenRevocationStore()
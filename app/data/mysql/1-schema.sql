@@ -11,7 +11,20 @@ CREATE TABLE IF NOT EXISTS users (
     email VARCHAR(100) UNIQUE NOT NULL,
     password VARCHAR(255) NOT NULL,
     register_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    -- Versión de los tokens JWT del usuario (claim 'ver'); se incrementa al revocarlos
+    token_version INT NOT NULL DEFAULT 0,
+    -- Listado admin filtrado por rol y paginado por id (InnoDB incluye el PK en el índice)
+    INDEX idx_role (role)
+);
+
+-- Tokens revocados individualmente (logout) hasta su expiración (ver auth/token_revocation.py).
+-- Las bajas de usuario se guardan como jti 'user:<id>'. Se carga en memoria al arrancar.
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    expires_at DATETIME NOT NULL,
+
+    INDEX idx_expires (expires_at)
 );
 
 -- Tabla general de productos
@@ -222,15 +235,17 @@ CREATE TABLE IF NOT EXISTS sales_products (
 CREATE TABLE IF NOT EXISTS chats (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NULL, -- Puede ser NULL para usuarios no registrados
-    phone_number VARCHAR(20) NULL, -- Número de WhatsApp principalmente
-    email VARCHAR(100) NULL, -- Email alternativo para chat web
+    phone_number VARCHAR(20) NULL, -- Número de WhatsApp normalizado ('+' y dígitos)
+    email VARCHAR(100) NULL, -- Email alternativo para chat web (en minúsculas)
     last_message TEXT NULL, -- Último mensaje para preview
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    archived_at TIMESTAMP NULL, -- Fecha en que sus mensajes se movieron a messages_archive
     
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
-    INDEX idx_phone (phone_number),
-    INDEX idx_email (email),
+    -- Claves únicas: get_or_create_chat bloquea ambas con FOR UPDATE (NULL no colisiona)
+    UNIQUE KEY uq_phone (phone_number),
+    UNIQUE KEY uq_email (email),
     INDEX idx_last_activity (last_activity)
 );
 
@@ -245,5 +260,44 @@ CREATE TABLE IF NOT EXISTS messages (
     FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE CASCADE,
     INDEX idx_chat_id (chat_id),
     INDEX idx_sender (sender),
-    INDEX idx_created_at (created_at)
-);
\ No newline at end of file
+    INDEX idx_created_at (created_at),
+    INDEX idx_chat_created (chat_id, created_at),
+    FULLTEXT INDEX ft_body (body) -- Búsqueda global de mensajes por relevancia
+);
+
+-- Archivo frío de mensajes de chats inactivos (ver services/chats/archiveService.py).
+-- Particionado por mes para poder descartar meses antiguos con DROP PARTITION.
+-- MySQL no permite claves foráneas ni FULLTEXT en tablas particionadas, por eso
+-- la tabla caliente `messages` no se particiona.
+CREATE TABLE IF NOT EXISTS messages_archive (
+    id INT NOT NULL, -- Mismo id que tenía en messages
+    chat_id INT NOT NULL,
+    sender ENUM('user','bot','system') NOT NULL,
+    body TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (id, created_at),
+    INDEX idx_chat_created (chat_id, created_at)
+) ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+    PARTITION p_old VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
+
+-- Outbox de sincronización de productos con Qdrant (ver services/qdrant/vector_outbox.py).
+-- Cada escritura de productos agrega una fila en la misma transacción; un worker
+-- en segundo plano la procesa por lotes y la borra al sincronizar; tras
+-- VECTOR_OUTBOX_MAX_ATTEMPTS intentos se marca con failed_at y no se reintenta.
+CREATE TABLE IF NOT EXISTS vector_outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL, -- Sin FK: las bajas también pasan por el outbox
+    operation ENUM('upsert','delete') NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    last_error VARCHAR(500) NULL,
+    created_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+    available_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3), -- Próximo intento (backoff)
+    failed_at TIMESTAMP(3) NULL, -- Intentos agotados: fuera de la cola
+
+    INDEX idx_available (failed_at, available_at, id)
+);
@@ -0,0 +1,49 @@
+-- Migración para bases existentes: claves únicas normalizadas en chats
+-- (las instalaciones nuevas ya las crean desde 1-schema.sql)
+
+USE applestore_db;
+
+-- 1. Normalizar identificadores existentes
+UPDATE chats
+SET phone_number = NULLIF(
+        CONCAT(IF(phone_number LIKE '+%', '+', ''), REGEXP_REPLACE(phone_number, '[^0-9]', '')),
+        ''),
+    last_activity = last_activity
+WHERE phone_number IS NOT NULL;
+
+UPDATE chats
+SET email = NULLIF(LOWER(TRIM(email)), ''),
+    last_activity = last_activity
+WHERE email IS NOT NULL;
+
+-- 2. Fusionar chats duplicados en el más antiguo (mueve sus mensajes)
+UPDATE messages m
+JOIN chats c ON c.id = m.chat_id
+JOIN (SELECT phone_number, MIN(id) AS keep_id FROM chats
+      WHERE phone_number IS NOT NULL GROUP BY phone_number HAVING COUNT(*) > 1) d
+  ON d.phone_number = c.phone_number AND c.id <> d.keep_id
+SET m.chat_id = d.keep_id;
+
+DELETE c FROM chats c
+JOIN (SELECT phone_number, MIN(id) AS keep_id FROM chats
+      WHERE phone_number IS NOT NULL GROUP BY phone_number HAVING COUNT(*) > 1) d
+  ON d.phone_number = c.phone_number AND c.id <> d.keep_id;
+
+UPDATE messages m
+JOIN chats c ON c.id = m.chat_id
+JOIN (SELECT email, MIN(id) AS keep_id FROM chats
+      WHERE email IS NOT NULL GROUP BY email HAVING COUNT(*) > 1) d
+  ON d.email = c.email AND c.id <> d.keep_id
+SET m.chat_id = d.keep_id;
+
+DELETE c FROM chats c
+JOIN (SELECT email, MIN(id) AS keep_id FROM chats
+      WHERE email IS NOT NULL GROUP BY email HAVING COUNT(*) > 1) d
+  ON d.email = c.email AND c.id <> d.keep_id;
+
+-- 3. Reemplazar índices simples por claves únicas
+ALTER TABLE chats
+    DROP INDEX idx_phone,
+    DROP INDEX idx_email,
+    ADD UNIQUE KEY uq_phone (phone_number),
+    ADD UNIQUE KEY uq_email (email);
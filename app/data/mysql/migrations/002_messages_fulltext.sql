@@ -0,0 +1,6 @@
+-- Migración para bases existentes: índice FULLTEXT para la búsqueda global de mensajes
+-- En tablas grandes InnoDB reconstruye el índice; ejecutar fuera de horas pico.
+
+USE applestore_db;
+
+ALTER TABLE messages ADD FULLTEXT INDEX ft_body (body);
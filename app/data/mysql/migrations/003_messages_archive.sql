@@ -0,0 +1,23 @@
+-- Migración para bases existentes: archivo frío de mensajes
+
+USE applestore_db;
+
+ALTER TABLE chats ADD COLUMN archived_at TIMESTAMP NULL AFTER last_activity;
+
+ALTER TABLE messages ADD INDEX idx_chat_created (chat_id, created_at);
+
+CREATE TABLE IF NOT EXISTS messages_archive (
+    id INT NOT NULL,
+    chat_id INT NOT NULL,
+    sender ENUM('user','bot','system') NOT NULL,
+    body TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (id, created_at),
+    INDEX idx_chat_created (chat_id, created_at)
+) ROW_FORMAT=COMPRESSED
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+    PARTITION p_old VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
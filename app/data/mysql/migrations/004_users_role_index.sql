@@ -0,0 +1,6 @@
+-- Migración para bases existentes: índice por rol para el listado admin de usuarios
+-- (GET /users?role=...&after_id=...). El filtro por prefijo de email usa el índice único de email.
+
+USE applestore_db;
+
+ALTER TABLE users ADD INDEX idx_role (role);
@@ -0,0 +1,15 @@
+-- Migración para bases existentes: outbox de sincronización de productos con Qdrant
+
+USE applestore_db;
+
+CREATE TABLE IF NOT EXISTS vector_outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL, -- Sin FK: las bajas también pasan por el outbox
+    operation ENUM('upsert','delete') NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    last_error VARCHAR(500) NULL,
+    created_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+    available_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3), -- Próximo intento (backoff)
+
+    INDEX idx_available (available_at, id)
+);
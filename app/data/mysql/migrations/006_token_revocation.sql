@@ -0,0 +1,13 @@
+-- Migración para bases existentes: revocación de tokens JWT persistente en MySQL
+-- (versión de token por usuario y tokens revocados por logout).
+
+USE applestore_db;
+
+ALTER TABLE users ADD COLUMN token_version INT NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    expires_at DATETIME NOT NULL,
+
+    INDEX idx_expires (expires_at)
+);
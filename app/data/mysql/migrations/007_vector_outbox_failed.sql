@@ -0,0 +1,9 @@
+-- Migración para bases existentes: estado fallido en vector_outbox
+-- (filas que agotaron VECTOR_OUTBOX_MAX_ATTEMPTS dejan de reintentarse).
+
+USE applestore_db;
+
+ALTER TABLE vector_outbox
+    ADD COLUMN failed_at TIMESTAMP(3) NULL,
+    DROP INDEX idx_available,
+    ADD INDEX idx_available (failed_at, available_at, id);
@@ -1,8 +1,48 @@
+"""
+Sincroniza los productos de MySQL con la colección de Qdrant (incremental).
+
+Cada ejecución:
+
+1. Borra los puntos de productos que ya no existen o están inactivos.
+2. Lee los productos con updated_at >= la marca de la ejecución anterior
+   (guardada en KB_SYNC_STATE_FILE, fuera del código fuente) más los activos
+   que no tienen punto en Qdrant (colección vaciada o borrada fuera de
+   --recreate), por lotes de --batch-size.
+3. Vuelve a embeber únicamente los productos cuyo texto embebido cambió (hash
+   en el payload); si solo cambiaron precio o categoría se reemplaza el
+   payload sin tocar el vector, y si nada cambió no se escribe.
+
+El payload contiene solo los campos de services/qdrant/payload_schema.py; los
+puntos cargados con la fila completa se recortan en la primera ejecución.
+
+Sin cambios en el catálogo termina en segundos. Los vectores se leen del
+almacén persistente de embeddings (services/embeddings/embedding_store.py):
+incluso con --full o --recreate solo se infieren los textos nuevos.
+
+Uso (desde app/):
+    python data/qdrant/load_kb.py
+    python data/qdrant/load_kb.py --full        # revisa todos los productos (ignora la marca)
+    python data/qdrant/load_kb.py --recreate    # borra y recrea la colección (vector disperso BM25)
+    python data/qdrant/load_kb.py --profile accurate   # perfil HNSW/cuantización (QDRANT_COLLECTION_PROFILE)
+"""
+import argparse
+import json
 import os
+import sys
+import time
 import pymysql
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, VectorParams, Distance
+from qdrant_client.http.models import (
+    PointStruct, SparseVector, PointIdsList, SetPayload, OverwritePayloadOperation
+)
+
+# Permite importar los servicios de la app (registro de embeddings compartido)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+from services.embeddings.embedding_registry import embedding_registry, get_collection_vector_size
+from services.embeddings.sparse_encoder import SPARSE_VECTOR_NAME, encode_document, product_text
+from services.qdrant.collection_config import QDRANT_COLLECTION_PROFILE, apply_profile, create_collection, get_profile
+from services.qdrant.payload_schema import ensure_payload_indexes
+from services.qdrant.vector_sync_service import product_payload, TEXT_HASH_FIELD
 
 # Configuración por variables de entorno (usa los nombres de servicio de Docker Compose)
 MYSQL_CONFIG = {
@@ -16,70 +56,206 @@ COLLECTION = os.getenv("QDRANT_COLLECTION", "products_kb")
 VECTOR_SIZE = 384
 EMBED_MODEL = os.getenv("EMBED_MODEL", "intfloat/multilingual-e5-small")
 
-def main():
-    # 1. Conectar a MySQL y extraer productos
-    conn = pymysql.connect(**MYSQL_CONFIG)
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    cursor.execute("SELECT * FROM products")
-    products = cursor.fetchall()
-    conn.close()
-
-    # 2. Generar embeddings
-    embedder = SentenceTransformer(EMBED_MODEL)
-    texts = [f"{row['name']}. {row['description']}" for row in products]
-    print(f"Generando embeddings para {len(texts)} productos...")
-    vectors = embedder.encode(texts, show_progress_bar=True, normalize_embeddings=True)
-    print(f"Embeddings generados. Dimensión: {vectors.shape}")
-
-    # 3. Conectar a Qdrant y crear colección si no existe
-    client = QdrantClient(url=QDRANT_URL)
+# Fuera de ./app: el código se monta en el contenedor y el estado no debe acabar en el repositorio
+DEFAULT_STATE_FILE = os.getenv(
+    "KB_SYNC_STATE_FILE", os.path.expanduser("~/.cache/applestore/load_kb_state.json")
+)
+
+
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(path, state):
+    # Escritura atómica: una ejecución interrumpida no deja el archivo a medias
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def ensure_collection(client, recreate, profile):
+    """
+    Crea la colección si no existe (o le aplica el perfil si difiere) y sus
+    índices de payload; retorna si tiene el vector disperso (búsqueda híbrida)
+    """
     collections = [c.name for c in client.get_collections().collections]
-    print(f"Colecciones existentes en Qdrant: {collections}")
+
+    if COLLECTION in collections and recreate:
+        print(f"Borrando colección '{COLLECTION}' (--recreate)")
+        client.delete_collection(COLLECTION)
+        collections.remove(COLLECTION)
 
     if COLLECTION not in collections:
-        print(f"Creando colección '{COLLECTION}' con dimensión {VECTOR_SIZE}")
-        client.create_collection(
+        print(f"Creando colección '{COLLECTION}' con dimensión {VECTOR_SIZE}, vector disperso "
+              f"'{SPARSE_VECTOR_NAME}' y perfil '{profile.name}'")
+        create_collection(client, COLLECTION, VECTOR_SIZE, profile)
+    else:
+        embedding_registry.check_collection(
+            COLLECTION, get_collection_vector_size(client, COLLECTION), EMBED_MODEL
+        )
+        changed = apply_profile(client, COLLECTION, profile)
+        if changed:
+            print(f"Perfil '{profile.name}' aplicado ({', '.join(changed)}); Qdrant reindexa en segundo plano")
+    created = ensure_payload_indexes(client, COLLECTION)
+    if created:
+        print(f"Índices de payload creados: {', '.join(created)}")
+    sparse_vectors = client.get_collection(COLLECTION).config.params.sparse_vectors or {}
+    hybrid = SPARSE_VECTOR_NAME in sparse_vectors
+    if not hybrid:
+        print(f"⚠️  La colección no tiene el vector disperso '{SPARSE_VECTOR_NAME}'; usa --recreate para la búsqueda híbrida")
+    return hybrid
+
+
+def qdrant_point_ids(client):
+    """Todos los ids de la colección (sin payload ni vectores)"""
+    ids, offset = set(), None
+    while True:
+        points, offset = client.scroll(
+            collection_name=COLLECTION, limit=1000, offset=offset, with_payload=False, with_vectors=False
+        )
+        ids.update(point.id for point in points)
+        if offset is None:
+            return ids
+
+
+def reconcile_point_ids(client, cursor, batch_size):
+    """
+    Borra los puntos de productos eliminados o inactivos; retorna
+    (borrados, ids de productos activos sin punto en Qdrant)
+    """
+    cursor.execute("SELECT id FROM products WHERE is_active = TRUE")
+    active_ids = {row["id"] for row in cursor.fetchall()}
+    point_ids = qdrant_point_ids(client)
+    stale = sorted(point_ids - active_ids)
+    for start in range(0, len(stale), batch_size):
+        client.delete(collection_name=COLLECTION, points_selector=PointIdsList(points=stale[start:start + batch_size]))
+    return len(stale), sorted(active_ids - point_ids)
+
+
+def fetch_products(cursor, ids, batch_size):
+    rows = []
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        cursor.execute(f"SELECT * FROM products WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def sync_batch(client, rows, hybrid):
+    """Sincroniza un lote; retorna (embebidos, solo payload, sin cambios)"""
+    payloads = {}
+    for row in rows:
+        payload = product_payload(row)
+        payloads[payload["id"]] = payload
+    # Payload completo: los campos que ya no son del esquema también cuentan como cambio
+    existing = {
+        point.id: point.payload or {}
+        for point in client.retrieve(collection_name=COLLECTION, ids=list(payloads), with_payload=True)
+    }
+
+    to_embed, payload_only = [], []
+    for product_id, payload in payloads.items():
+        current = existing.get(product_id)
+        if current is None or current.get(TEXT_HASH_FIELD) != payload[TEXT_HASH_FIELD]:
+            to_embed.append(payload)
+        elif current != payload:
+            payload_only.append(payload)
+
+    if to_embed:
+        vectors = embedding_registry.encode([product_text(payload) for payload in to_embed], model_name=EMBED_MODEL)
+        points = []
+        for payload, vector in zip(to_embed, vectors):
+            vector = vector.tolist()
+            if hybrid:
+                indices, values = encode_document(product_text(payload))
+                vector = {"": vector, SPARSE_VECTOR_NAME: SparseVector(indices=indices, values=values)}
+            points.append(PointStruct(id=payload["id"], vector=vector, payload=payload))
+        client.upsert(collection_name=COLLECTION, points=points)
+
+    if payload_only:
+        # Un solo request para todos los cambios de payload del lote; overwrite
+        # (no set) para quitar los campos que ya no están en el esquema
+        client.batch_update_points(
             collection_name=COLLECTION,
-            vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+            update_operations=[
+                OverwritePayloadOperation(overwrite_payload=SetPayload(payload=payload, points=[payload["id"]]))
+                for payload in payload_only
+            ]
         )
-    else:
-        print(f"La colección '{COLLECTION}' ya existe")
+    return len(to_embed), len(payload_only), len(payloads) - len(to_embed) - len(payload_only)
 
-    # 4. Verificar si ya hay puntos cargados
-    collection_info = client.get_collection(COLLECTION)
-    if getattr(collection_info, 'points_count', 0) > 0:
-        print(f"La colección '{COLLECTION}' ya tiene {collection_info.points_count} puntos. No se recarga.")
-        return
-
-    # Insertar productos como puntos vectoriales
-    points = []
-    for row, vector in zip(products, vectors):
-        # Convertir numpy array a lista de Python
-        vector_list = vector.tolist() if hasattr(vector, 'tolist') else list(vector)
-        # Qdrant no soporta Decimal ni datetime, convertir a tipos serializables
-        def convert(obj):
-            import decimal, datetime
-            if isinstance(obj, decimal.Decimal):
-                return float(obj)
-            if isinstance(obj, (datetime.datetime, datetime.date)):
-                return obj.isoformat()
-            if isinstance(obj, dict):
-                return {k: convert(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [convert(i) for i in obj]
-            return obj
-        payload = convert(row)
-        points.append(PointStruct(
-            id=row['id'],
-            vector=vector_list,
-            payload=payload
-        ))
-    print(f"Insertando {len(points)} puntos en Qdrant...")
-    client.upsert(collection_name=COLLECTION, points=points)
-    # Verificar que se insertaron correctamente
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza los productos de MySQL con Qdrant")
+    parser.add_argument("--recreate", action="store_true",
+                        help="Borra y recrea la colección (necesario para agregar el vector disperso BM25)")
+    parser.add_argument("--full", action="store_true", help="Revisa todos los productos, no solo los modificados")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("KB_SYNC_BATCH_SIZE", "64")))
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE)
+    parser.add_argument("--profile", default=QDRANT_COLLECTION_PROFILE,
+                        help="Perfil HNSW/cuantización de services/qdrant/collection_config.py")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    client = QdrantClient(url=QDRANT_URL)
+    hybrid = ensure_collection(client, args.recreate, get_profile(args.profile))
+
+    state = load_state(args.state_file)
+    # Otro modelo o backend cambia todos los vectores: se revisa el catálogo completo
+    embedding = f"{embedding_registry.variant}|{EMBED_MODEL}"
+    incremental = not (args.full or args.recreate) and state.get("collection") == COLLECTION and state.get("embedding") == embedding
+    since = state.get("high_water") if incremental else None
+
+    conn = pymysql.connect(**MYSQL_CONFIG, cursorclass=pymysql.cursors.DictCursor)
+    try:
+        cursor = conn.cursor()
+        # Marca tomada antes de leer: lo modificado durante la sincronización entra en la siguiente
+        cursor.execute("SELECT MAX(updated_at) AS high_water FROM products")
+        high_water = cursor.fetchone()["high_water"]
+
+        deleted, missing = reconcile_point_ids(client, cursor, args.batch_size)
+        print(f"Puntos eliminados (productos borrados o inactivos): {deleted}")
+        print(f"Productos activos sin punto en Qdrant: {len(missing)}")
+
+        # >= y no >: varias filas pueden compartir el segundo de la marca; el hash evita re-embeberlas
+        query = "SELECT * FROM products WHERE is_active = TRUE"
+        params = ()
+        if since:
+            query += " AND updated_at >= %s"
+            params = (since,)
+        cursor.execute(query + " ORDER BY updated_at, id", params)
+        rows = cursor.fetchall()
+        if since:
+            # Los que faltan en Qdrant se cargan aunque no hayan cambiado desde la marca
+            seen = {row["id"] for row in rows}
+            rows.extend(fetch_products(cursor, [product_id for product_id in missing if product_id not in seen],
+                                       args.batch_size))
+    finally:
+        conn.close()
+
+    mode = f"modificados desde {since} o faltantes" if since else "todos"
+    print(f"Productos a revisar ({mode}): {len(rows)}")
+    totals = [0, 0, 0]
+    for start in range(0, len(rows), args.batch_size):
+        counts = sync_batch(client, rows[start:start + args.batch_size], hybrid)
+        totals = [total + count for total, count in zip(totals, counts)]
+        print(f"  [{min(start + args.batch_size, len(rows))}/{len(rows)}] "
+              f"embebidos: {totals[0]} | solo payload: {totals[1]} | sin cambios: {totals[2]}")
+
+    if high_water is not None:
+        save_state(args.state_file, {
+            "collection": COLLECTION, "embedding": embedding, "high_water": high_water.isoformat(sep=" ")
+        })
     collection_info = client.get_collection(COLLECTION)
     print(f"Colección '{COLLECTION}' - Puntos totales: {collection_info.points_count}")
-    print(f"Carga completada exitosamente.")
+    print(f"Sincronización completada en {time.perf_counter() - started:.1f}s")
+
 
 if __name__ == "__main__":
     main()
@@ -2,8 +2,12 @@
 Script para verificar y consultar la base de conocimiento en Qdrant
 """
 import os
+import sys
 from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
+
+# Permite importar los servicios de la app (registro de embeddings compartido)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+from services.embeddings.embedding_registry import embedding_registry, get_collection_vector_size
 
 # Configuración
 QDRANT_URL = os.getenv("QDRANT_URL", "http://qdrant:6333")
@@ -39,13 +43,15 @@ def main():
     
     # 3. Búsqueda semántica de ejemplo
     print("=== BÚSQUEDA SEMÁNTICA ===")
-    embedder = SentenceTransformer(EMBED_MODEL)
+    embedding_registry.check_collection(
+        COLLECTION, get_collection_vector_size(client, COLLECTION), EMBED_MODEL
+    )
     query = "iPhone con cámara avanzada"
-    query_vector = embedder.encode([query], normalize_embeddings=True)[0]
+    query_vector = embedding_registry.encode_query(query, EMBED_MODEL)
     
     search_results = client.search(
         collection_name=COLLECTION,
-        query_vector=query_vector.tolist(),
+        query_vector=query_vector,
         limit=3,
         with_payload=True
     )
@@ -87,6 +87,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Headers de paginación del listado admin de usuarios
+    expose_headers=["X-Total-Count", "X-Next-After-Id"],
 )
 
 #routers
@@ -2,4 +2,4 @@ from .createChat import get_or_create_chat
 from .getChat import get_chat_by_id, get_all_chats, search_chats
 from .deleteChat import delete_chat, delete_message
 from .createMensaje import create_message
-from .getMensajes import get_messages_by_chat, get_last_message_by_chat, count_messages_by_chat, get_messages_by_sender, search_messages_in_chat
\ No newline at end of file
+from .getMensajes import get_messages_by_chat, get_message_by_id, get_last_message_by_chat, count_messages_by_chat, get_messages_by_sender, search_messages_in_chat, search_messages_global
\ No newline at end of file
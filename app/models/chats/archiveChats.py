@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+
+def get_inactive_chat_ids(conn, cutoff, limit=200):
+    """
+    Obtiene chats sin mensajes nuevos desde `cutoff` que aún tienen mensajes
+    en la tabla caliente.
+
+    Args:
+        conn: Conexión a la base de datos
+        cutoff: Fecha límite de inactividad
+        limit: Máximo de chats a retornar
+
+    Returns:
+        list: IDs de chats a archivar
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT c.id FROM chats c
+           WHERE c.last_activity < %s
+             AND EXISTS (SELECT 1 FROM messages m WHERE m.chat_id = c.id)
+             AND NOT EXISTS (
+                 SELECT 1 FROM messages m
+                 WHERE m.chat_id = c.id AND m.created_at >= %s
+             )
+           ORDER BY c.id
+           LIMIT %s""",
+        (cutoff, cutoff, limit)
+    )
+    return [row["id"] for row in cursor.fetchall()]
+
+
+def archive_chat_messages(conn, chat_ids, cutoff):
+    """
+    Mueve a messages_archive los mensajes anteriores a `cutoff` de los chats
+    indicados y marca los chats como archivados, en una sola transacción.
+
+    Solo se mueven mensajes anteriores a `cutoff`, así un mensaje que llegue
+    durante el archivado se queda en la tabla caliente.
+
+    Args:
+        conn: Conexión a la base de datos
+        chat_ids: IDs de los chats
+        cutoff: Fecha límite de inactividad
+
+    Returns:
+        int: Número de mensajes archivados
+    """
+    if not chat_ids:
+        return 0
+    placeholders = ", ".join(["%s"] * len(chat_ids))
+    params = list(chat_ids) + [cutoff]
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""INSERT INTO messages_archive (id, chat_id, sender, body, created_at)
+               SELECT id, chat_id, sender, body, created_at FROM messages
+               WHERE chat_id IN ({placeholders}) AND created_at < %s""",
+            params
+        )
+        archived = cursor.rowcount
+        cursor.execute(
+            f"DELETE FROM messages WHERE chat_id IN ({placeholders}) AND created_at < %s",
+            params
+        )
+        # last_activity = last_activity evita que ON UPDATE la renueve
+        cursor.execute(
+            f"""UPDATE chats SET archived_at = NOW(), last_activity = last_activity
+               WHERE id IN ({placeholders})""",
+            list(chat_ids)
+        )
+        conn.commit()
+        return archived
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def get_archive_partitions(conn):
+    """
+    Lista las particiones de messages_archive.
+
+    Returns:
+        list: Diccionarios con 'name' y 'upper_bound' (epoch, None para MAXVALUE)
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS description
+           FROM information_schema.PARTITIONS
+           WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'messages_archive'
+           ORDER BY PARTITION_ORDINAL_POSITION"""
+    )
+    partitions = []
+    for row in cursor.fetchall():
+        description = row["description"]
+        upper_bound = None if description in (None, "MAXVALUE") else int(description)
+        partitions.append({"name": row["name"], "upper_bound": upper_bound})
+    return partitions
+
+
+def add_archive_partitions(conn, month_starts):
+    """
+    Crea particiones mensuales dividiendo p_future.
+
+    Args:
+        conn: Conexión a la base de datos
+        month_starts: Lista de fechas (primer día de mes) ordenadas; cada una
+            crea la partición del mes anterior a ella (pYYYYMM)
+    """
+    if not month_starts:
+        return
+    definitions = []
+    for upper in month_starts:
+        previous_month = (upper.replace(day=1) - timedelta(days=1)).strftime("%Y%m")
+        definitions.append(
+            f"PARTITION p{previous_month} VALUES LESS THAN "
+            f"(UNIX_TIMESTAMP('{upper.strftime('%Y-%m-%d')} 00:00:00'))"
+        )
+    definitions.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+    cursor = conn.cursor()
+    cursor.execute(
+        f"ALTER TABLE messages_archive REORGANIZE PARTITION p_future INTO ({', '.join(definitions)})"
+    )
+
+
+def drop_archive_partitions(conn, names):
+    """
+    Elimina particiones completas de messages_archive (operación de metadatos,
+    no borra fila por fila).
+    """
+    if not names:
+        return
+    cursor = conn.cursor()
+    cursor.execute(f"ALTER TABLE messages_archive DROP PARTITION {', '.join(names)}")
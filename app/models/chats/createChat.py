@@ -1,3 +1,31 @@
+import re
+
+import pymysql
+
+
+def normalize_phone_number(phone_number):
+    """
+    Normaliza un número de teléfono para usarlo como clave única.
+    Conserva solo dígitos y un '+' inicial (ej: '+57 310-571 4739' -> '+573105714739').
+    """
+    if not phone_number:
+        return None
+    phone_number = phone_number.strip()
+    digits = re.sub(r"\D", "", phone_number)
+    if not digits:
+        return None
+    return f"+{digits}" if phone_number.startswith("+") else digits
+
+
+def normalize_email(email):
+    """
+    Normaliza un email para usarlo como clave única (sin espacios y en minúsculas).
+    """
+    if not email:
+        return None
+    email = email.strip().lower()
+    return email or None
+
 
 def create_chat(conn, phone_number=None, email=None, user_id=None):
     """
@@ -5,47 +33,105 @@ def create_chat(conn, phone_number=None, email=None, user_id=None):
     """
     cursor = conn.cursor()
     cursor.execute(
-        """INSERT INTO chats (user_id, phone_number, email) 
+        """INSERT INTO chats (user_id, phone_number, email)
            VALUES (%s, %s, %s)""",
-        (user_id, phone_number, email)
+        (user_id, normalize_phone_number(phone_number), normalize_email(email))
     )
     conn.commit()
     return cursor.lastrowid
 
 
-def get_or_create_chat(conn, phone_number=None, email=None, user_id=None):
+class ChatContactConflict(Exception):
+    """El teléfono y el email pertenecen a chats distintos"""
+
+    def __init__(self, phone_chat_id, email_chat_id):
+        super().__init__(
+            f"El teléfono pertenece al chat {phone_chat_id} y el email al chat {email_chat_id}"
+        )
+        self.phone_chat_id = phone_chat_id
+        self.email_chat_id = email_chat_id
+
+
+# Duplicado (otra petición insertó el mismo contacto) o deadlock entre los gap locks de FOR UPDATE
+_RETRYABLE_ERRORS = {1062, 1213}
+
+
+def get_or_create_chat(conn, phone_number=None, email=None, user_id=None, max_attempts=3):
     """
     Busca un chat existente por phone_number o email, si no existe lo crea.
+
+    Bloquea con SELECT ... FOR UPDATE las filas de ambas claves únicas
+    normalizadas (uq_phone / uq_email) y resuelve el caso explícitamente:
+    - ninguna: inserta el chat. Si una petición concurrente insertó el mismo
+      contacto (duplicado o deadlock) se reintenta y se encuentra su fila.
+    - una: la retorna, asociando el identificador o el user_id que le falten.
+    - dos chats distintos: lanza ChatContactConflict (la ruta responde 409).
     """
-    cursor = conn.cursor()
-    
+    phone_number = normalize_phone_number(phone_number)
+    email = normalize_email(email)
+
     # Validar que al menos uno de los identificadores esté presente
     if not phone_number and not email:
         raise ValueError("Debe proporcionar phone_number o email")
-    
-    # Buscar chat existente
-    if phone_number:
+
+    for attempt in range(max_attempts):
+        try:
+            chat = _get_or_create_locked(conn, phone_number, email, user_id)
+            conn.commit()
+            return chat
+        except pymysql.err.MySQLError as e:
+            conn.rollback()
+            code = e.args[0] if e.args else None
+            if code not in _RETRYABLE_ERRORS or attempt == max_attempts - 1:
+                raise
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def _get_or_create_locked(conn, phone_number, email, user_id):
+    cursor = conn.cursor()
+    # NULL no coincide con nada: con un solo identificador se busca solo por ese
+    cursor.execute(
+        "SELECT * FROM chats WHERE phone_number = %s OR email = %s FOR UPDATE",
+        (phone_number, email)
+    )
+    rows = cursor.fetchall()
+    by_phone = next((row for row in rows if phone_number and row["phone_number"] == phone_number), None)
+    by_email = next((row for row in rows if email and row["email"] == email), None)
+
+    if by_phone and by_email and by_phone["id"] != by_email["id"]:
+        raise ChatContactConflict(by_phone["id"], by_email["id"])
+
+    chat = by_phone or by_email
+    if chat is None:
         cursor.execute(
-            "SELECT * FROM chats WHERE phone_number = %s", 
-            (phone_number,)
+            """INSERT INTO chats (user_id, phone_number, email)
+               VALUES (%s, %s, %s)""",
+            (user_id, phone_number, email)
         )
-        existing_chat = cursor.fetchone()
-        if existing_chat:
-            return existing_chat
-    
-    if email:
+        chat_id = cursor.lastrowid
+    else:
+        chat_id = chat["id"]
+        # Asociar lo que el chat aún no tiene; un valor distinto ya guardado se conserva
+        updates, params = [], []
+        if phone_number and not chat["phone_number"]:
+            updates.append("phone_number = %s")
+            params.append(phone_number)
+        if email and not chat["email"]:
+            updates.append("email = %s")
+            params.append(email)
+        if user_id is not None and chat["user_id"] is None:
+            updates.append("user_id = %s")
+            params.append(user_id)
+        if not updates:
+            return chat
+        # last_activity = last_activity evita que ON UPDATE la renueve
         cursor.execute(
-            "SELECT * FROM chats WHERE email = %s", 
-            (email,)
+            f"UPDATE chats SET {', '.join(updates)}, last_activity = last_activity WHERE id = %s",
+            params + [chat_id]
         )
-        existing_chat = cursor.fetchone()
-        if existing_chat:
-            return existing_chat
-    
-    # Si no existe, crear nuevo chat
-    chat_id = create_chat(conn, phone_number, email, user_id)
-    
-    # Obtener el chat recién creado
+
+    # MySQL no soporta RETURNING: leer la fila por PK en la misma transacción
     cursor.execute("SELECT * FROM chats WHERE id = %s", (chat_id,))
     return cursor.fetchone()
-
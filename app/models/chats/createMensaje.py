@@ -20,6 +20,14 @@ def create_message(conn, chat_id, sender, body):
         (chat_id, sender, body)
     )
     message_id = cursor.lastrowid
+
+    # Vista previa y actividad del chat en la misma transacción que el mensaje
+    cursor.execute(
+        """UPDATE chats c JOIN messages m ON m.id = %s
+           SET c.last_message = LEFT(m.body, 200), c.last_activity = m.created_at
+           WHERE c.id = %s""",
+        (message_id, chat_id)
+    )
     
     conn.commit()
     return message_id
@@ -7,7 +7,8 @@ def delete_chat(conn, chat_id):
         chat_id: ID del chat a eliminar
     """
     cursor = conn.cursor()
-    # Los mensajes se eliminan automáticamente por CASCADE
+    # Los mensajes se eliminan automáticamente por CASCADE; el archivo no tiene FK
+    cursor.execute("DELETE FROM messages_archive WHERE chat_id = %s", (chat_id,))
     cursor.execute("DELETE FROM chats WHERE id = %s", (chat_id,))
     conn.commit()
     return cursor.rowcount > 0
@@ -25,8 +26,13 @@ def delete_message(conn, message_id):
     """
     cursor = conn.cursor()
     cursor.execute("DELETE FROM messages WHERE id = %s", (message_id,))
+    deleted = cursor.rowcount > 0
+    if not deleted:
+        # Puede estar en el archivo frío (conserva el id original)
+        cursor.execute("DELETE FROM messages_archive WHERE id = %s", (message_id,))
+        deleted = cursor.rowcount > 0
     conn.commit()
-    return cursor.rowcount > 0
+    return deleted
 
 def delete_messages_chat(conn, chat_id):
     """
@@ -42,6 +48,8 @@ def delete_messages_chat(conn, chat_id):
     cursor = conn.cursor()
     cursor.execute("DELETE FROM messages WHERE chat_id = %s", (chat_id,))
     deleted_count = cursor.rowcount
+    cursor.execute("DELETE FROM messages_archive WHERE chat_id = %s", (chat_id,))
+    deleted_count += cursor.rowcount
     
     # Resetear último mensaje del chat
     cursor.execute(
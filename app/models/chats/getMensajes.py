@@ -1,3 +1,45 @@
+# Mensajes de un chat: la tabla caliente sola salvo que el chat esté archivado
+# (chats.archived_at); solo entonces se une messages_archive, con chat_id,
+# filtros, orden y límite dentro de cada rama para usar idx_chat_created.
+MESSAGE_COLUMNS = "id, chat_id, sender, body, created_at"
+
+
+def _is_archived(cursor, chat_id):
+    cursor.execute("SELECT archived_at FROM chats WHERE id = %s", (chat_id,))
+    row = cursor.fetchone()
+    return bool(row and row["archived_at"])
+
+
+def _select_messages(cursor, chat_id, where="", params=(), order="created_at ASC, id ASC",
+                     limit=None, offset=0):
+    """
+    Ejecuta la consulta de mensajes del chat sobre messages y, si el chat está
+    archivado, también sobre messages_archive.
+    """
+    condition = f"chat_id = %s{' AND ' + where if where else ''}"
+    branch_params = [chat_id] + list(params)
+    if not _is_archived(cursor, chat_id):
+        query = f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE {condition} ORDER BY {order}"
+        query_params = list(branch_params)
+        if limit is not None:
+            query += " LIMIT %s OFFSET %s"
+            query_params += [limit, offset]
+        cursor.execute(query, query_params)
+        return
+    # Cada rama aporta como mucho offset + limit filas ya ordenadas
+    branch_limit = f" LIMIT {int(offset) + int(limit)}" if limit is not None else ""
+    query = f"""SELECT * FROM (
+               (SELECT {MESSAGE_COLUMNS} FROM messages WHERE {condition} ORDER BY {order}{branch_limit})
+               UNION ALL
+               (SELECT {MESSAGE_COLUMNS} FROM messages_archive WHERE {condition} ORDER BY {order}{branch_limit})
+           ) AS m ORDER BY {order}"""
+    query_params = branch_params * 2
+    if limit is not None:
+        query += " LIMIT %s OFFSET %s"
+        query_params += [limit, offset]
+    cursor.execute(query, query_params)
+
+
 def get_messages_by_chat(conn, chat_id, limit=100, offset=0):
     """
     Obtiene todos los mensajes de un chat ordenados por fecha.
@@ -12,15 +54,24 @@ def get_messages_by_chat(conn, chat_id, limit=100, offset=0):
         list: Lista de mensajes del chat
     """
     cursor = conn.cursor()
-    cursor.execute(
-        """SELECT * FROM messages 
-           WHERE chat_id = %s 
-           ORDER BY created_at ASC 
-           LIMIT %s OFFSET %s""",
-        (chat_id, limit, offset)
-    )
+    _select_messages(cursor, chat_id, limit=limit, offset=offset)
     return cursor.fetchall()
 
+def get_message_by_id(conn, message_id):
+    """
+    Obtiene un mensaje de la tabla caliente por su ID.
+    
+    Args:
+        conn: Conexión a la base de datos
+        message_id: ID del mensaje
+    
+    Returns:
+        dict: Mensaje o None
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM messages WHERE id = %s", (message_id,))
+    return cursor.fetchone()
+
 def get_last_message_by_chat(conn, chat_id):
     """
     Obtiene el último mensaje de un chat.
@@ -34,13 +85,22 @@ def get_last_message_by_chat(conn, chat_id):
     """
     cursor = conn.cursor()
     cursor.execute(
-        """SELECT * FROM messages 
-           WHERE chat_id = %s 
-           ORDER BY created_at DESC 
+        f"""SELECT {MESSAGE_COLUMNS} FROM messages WHERE chat_id = %s
+           ORDER BY created_at DESC, id DESC
            LIMIT 1""",
         (chat_id,)
     )
-    return cursor.fetchone()
+    message = cursor.fetchone()
+    # El archivo solo tiene mensajes anteriores a los de la tabla caliente
+    if message is None and _is_archived(cursor, chat_id):
+        cursor.execute(
+            f"""SELECT {MESSAGE_COLUMNS} FROM messages_archive WHERE chat_id = %s
+               ORDER BY created_at DESC, id DESC
+               LIMIT 1""",
+            (chat_id,)
+        )
+        message = cursor.fetchone()
+    return message
 
 def count_messages_by_chat(conn, chat_id):
     """
@@ -54,12 +114,14 @@ def count_messages_by_chat(conn, chat_id):
         int: Número total de mensajes
     """
     cursor = conn.cursor()
-    cursor.execute(
-        "SELECT COUNT(*) as total FROM messages WHERE chat_id = %s",
-        (chat_id,)
-    )
+    cursor.execute("SELECT COUNT(*) as total FROM messages WHERE chat_id = %s", (chat_id,))
     result = cursor.fetchone()
-    return result[0] if result else 0
+    total = result["total"] if result else 0
+    if _is_archived(cursor, chat_id):
+        cursor.execute("SELECT COUNT(*) as total FROM messages_archive WHERE chat_id = %s", (chat_id,))
+        result = cursor.fetchone()
+        total += result["total"] if result else 0
+    return total
 
 def get_messages_by_sender(conn, chat_id, sender):
     """
@@ -74,12 +136,7 @@ def get_messages_by_sender(conn, chat_id, sender):
         list: Lista de mensajes del sender especificado
     """
     cursor = conn.cursor()
-    cursor.execute(
-        """SELECT * FROM messages 
-           WHERE chat_id = %s AND sender = %s 
-           ORDER BY created_at ASC""",
-        (chat_id, sender)
-    )
+    _select_messages(cursor, chat_id, where="sender = %s", params=(sender,))
     return cursor.fetchall()
 
 def search_messages_in_chat(conn, chat_id, search_term):
@@ -96,10 +153,54 @@ def search_messages_in_chat(conn, chat_id, search_term):
     """
     cursor = conn.cursor()
     search_pattern = f"%{search_term}%"
+    _select_messages(cursor, chat_id, where="body LIKE %s", params=(search_pattern,),
+                     order="created_at DESC, id DESC")
+    return cursor.fetchall()
+
+
+def search_messages_global(conn, search_term, chat_id=None, sender=None,
+                           date_from=None, date_to=None, limit=20, offset=0):
+    """
+    Busca mensajes en todas las conversaciones usando el índice FULLTEXT
+    de messages.body, ordenados por relevancia. Los mensajes archivados en
+    messages_archive no se incluyen (la tabla particionada no admite FULLTEXT).
+
+    Args:
+        conn: Conexión a la base de datos
+        search_term: Texto a buscar (modo lenguaje natural de MySQL)
+        chat_id: Filtrar por chat (opcional)
+        sender: Filtrar por sender ('user', 'bot', 'system') (opcional)
+        date_from: Fecha/hora mínima de creación (opcional)
+        date_to: Fecha/hora máxima de creación (opcional)
+        limit: Límite de resultados
+        offset: Offset para paginación
+
+    Returns:
+        list: Mensajes con la columna adicional 'relevance'
+    """
+    conditions = ["MATCH(body) AGAINST (%s IN NATURAL LANGUAGE MODE)"]
+    params = [search_term]
+
+    if chat_id is not None:
+        conditions.append("chat_id = %s")
+        params.append(chat_id)
+    if sender is not None:
+        conditions.append("sender = %s")
+        params.append(sender)
+    if date_from is not None:
+        conditions.append("created_at >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("created_at <= %s")
+        params.append(date_to)
+
+    cursor = conn.cursor()
     cursor.execute(
-        """SELECT * FROM messages 
-           WHERE chat_id = %s AND body LIKE %s 
-           ORDER BY created_at DESC""",
-        (chat_id, search_pattern)
+        f"""SELECT *, MATCH(body) AGAINST (%s IN NATURAL LANGUAGE MODE) AS relevance
+           FROM messages
+           WHERE {' AND '.join(conditions)}
+           ORDER BY relevance DESC, id DESC
+           LIMIT %s OFFSET %s""",
+        [search_term] + params + [limit, offset]
     )
     return cursor.fetchall()
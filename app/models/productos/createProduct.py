@@ -1,4 +1,4 @@
-def create_product(conn, name, category, description, price, stock, image_primary_url=None, image_secondary_url=None, image_tertiary_url=None, release_date=None, is_active=True):
+def create_product(conn, name, category, description, price, stock, image_primary_url=None, image_secondary_url=None, image_tertiary_url=None, release_date=None, is_active=True, commit=True):
     """
     Create a new product in the database with all fields.
     """
@@ -9,5 +9,6 @@ def create_product(conn, name, category, description, price, stock, image_primar
            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
         (name, category, description, price, stock, image_primary_url, image_secondary_url, image_tertiary_url, release_date, is_active)
     )
-    conn.commit()
+    if commit:
+        conn.commit()
     return cursor.lastrowid
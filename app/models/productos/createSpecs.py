@@ -1,6 +1,6 @@
 import json
 
-def create_iphone_spec(conn, product_id, spec):
+def create_iphone_spec(conn, product_id, spec, commit=True):
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -40,9 +40,10 @@ def create_iphone_spec(conn, product_id, spec):
             json.dumps(spec.box_contents)
         )
     )
-    conn.commit()
+    if commit:
+        conn.commit()
 
-def create_mac_spec(conn, product_id, spec):
+def create_mac_spec(conn, product_id, spec, commit=True):
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -84,9 +85,10 @@ def create_mac_spec(conn, product_id, spec):
             spec.target_audience
         )
     )
-    conn.commit()
+    if commit:
+        conn.commit()
 
-def create_ipad_spec(conn, product_id, spec):
+def create_ipad_spec(conn, product_id, spec, commit=True):
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -128,9 +130,10 @@ def create_ipad_spec(conn, product_id, spec):
             json.dumps(spec.colors)
         )
     )
-    conn.commit()
+    if commit:
+        conn.commit()
 
-def create_apple_watch_spec(conn, product_id, spec):
+def create_apple_watch_spec(conn, product_id, spec, commit=True):
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -172,9 +175,10 @@ def create_apple_watch_spec(conn, product_id, spec):
             spec.target_audience
         )
     )
-    conn.commit()
+    if commit:
+        conn.commit()
 
-def create_accessory_spec(conn, product_id, spec):
+def create_accessory_spec(conn, product_id, spec, commit=True):
     cursor = conn.cursor()
     cursor.execute(
         """
@@ -203,4 +207,5 @@ def create_accessory_spec(conn, product_id, spec):
             spec.operating_system_req
         )
     )
-    conn.commit()
+    if commit:
+        conn.commit()
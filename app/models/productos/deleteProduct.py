@@ -1,8 +1,9 @@
-def delete_product(conn, product_id):
+def delete_product(conn, product_id, commit=True):
     """
     Delete a product by its ID.
     """
     cursor = conn.cursor()
     cursor.execute("DELETE FROM products WHERE id=%s", (product_id,))
-    conn.commit()
+    if commit:
+        conn.commit()
     return cursor.rowcount > 0
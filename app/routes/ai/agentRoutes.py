@@ -16,6 +16,12 @@ from services.ai.config import ai_config, AIProvider, ModelType
 from services.ai.cost_tracker import cost_tracker, CostSummary
 from services.ai.nodes import AgentNodeFactory
 from services.chats.chatService import get_chat_service
+from services.embeddings.embedding_registry import embedding_registry, EMBEDDING_WARMUP
+from services.embeddings.backends import validate_backend
+from services.qdrant.client_provider import qdrant_provider
+from services.embeddings.local_index import PRODUCT_SEARCH_ENGINE, local_product_index
+from services.qdrant.vector_outbox import VECTOR_OUTBOX_WORKER, vector_outbox_worker
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -335,13 +341,25 @@ async def system_health_check():
         
         # Verificar Qdrant
         try:
-            from services.ai.nodes import BaseAgentNode
-            test_node = BaseAgentNode(ai_config.get_agent_config("general_assistant"))
-            test_results = await test_node.search_products("test", limit=1)
+            # Usa el cliente compartido: no abre una conexión nueva por health check
+            exists = await qdrant_provider.call_async(
+                lambda client: client.collection_exists(qdrant_provider.collection_name), "health check"
+            )
+            if not exists:
+                raise RuntimeError(f"La colección '{qdrant_provider.collection_name}' no existe")
             health_status["components"]["qdrant"] = "✅ Conectado"
+            health_status["qdrant"] = qdrant_provider.get_stats()
+            health_status["embeddings"] = embedding_registry.get_stats()
         except Exception as e:
             health_status["components"]["qdrant"] = f"❌ Error: {str(e)}"
             health_status["status"] = "degraded"
+        health_status["local_index"] = local_product_index.get_stats()
+        
+        # Lag de la sincronización de productos (vector_outbox)
+        try:
+            health_status["vector_outbox"] = await asyncio.to_thread(vector_outbox_worker.get_stats)
+        except Exception as e:
+            health_status["vector_outbox"] = {"error": str(e)}
         
         # Verificar Redis (costos)
         try:
@@ -388,3 +406,45 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Error inicializando sistema de agentes: {str(e)}")
         # No fallar el startup, pero log el error
+
+    # Configuración inválida (p. ej. EMBED_MODEL no disponible en fastembed):
+    # se aborta el arranque con un mensaje claro en lugar de fallar en la primera búsqueda
+    await asyncio.to_thread(validate_backend, embedding_registry.default_model, embedding_registry.backend)
+
+    # Cargar el modelo de embeddings antes de la primera búsqueda
+    if EMBEDDING_WARMUP:
+        try:
+            await asyncio.to_thread(embedding_registry.warmup)
+            logger.info("Modelo de embeddings precargado")
+        except Exception as e:
+            logger.error(f"Error precargando modelo de embeddings: {str(e)}")
+
+    # Verificar una sola vez la colección (existencia y dimensión) en lugar de en cada consulta
+    try:
+        if await asyncio.to_thread(qdrant_provider.ensure_collection):
+            logger.info(f"Colección '{qdrant_provider.collection_name}' verificada en Qdrant")
+    except Exception as e:
+        logger.error(f"Error verificando la colección de Qdrant: {str(e)}")
+
+    # Índice NumPy en memoria: motor principal o respaldo si Qdrant cae
+    if PRODUCT_SEARCH_ENGINE in ("local", "fallback"):
+        try:
+            await asyncio.to_thread(local_product_index.load)
+        except Exception as e:
+            logger.error(f"Error cargando el índice local de productos: {str(e)}")
+
+    # Sincronización de productos con Qdrant fuera de las peticiones HTTP
+    if VECTOR_OUTBOX_WORKER:
+        vector_outbox_worker.start()
+
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    """Detiene el worker del outbox, cierra Qdrant y persiste el índice local"""
+    await asyncio.to_thread(vector_outbox_worker.stop)
+    await qdrant_provider.close()
+    if local_product_index.dirty:
+        try:
+            await asyncio.to_thread(local_product_index.save)
+        except Exception as e:
+            logger.error(f"Error guardando el índice local de productos: {str(e)}")
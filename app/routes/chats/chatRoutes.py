@@ -1,15 +1,20 @@
-from fastapi import APIRouter, HTTPException, Query, Path, status
+from fastapi import APIRouter, HTTPException, Query, Path, Request, status
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+from datetime import datetime
+import asyncio
 from schemas.chats.chatSchemas import (
     ChatCreate, ChatResponse, MessageCreate, MessageResponse, 
-    ChatWithMessages, MessageUpdate
+    ChatWithMessages, MessageUpdate, MessageSender, MessageSearchPage
 )
 from services.chats.chatService import (
     create_chat_service, get_chat_service, get_all_chats_service, search_chats_service,
     delete_chat_service, create_message_service,
     get_messages_service, get_chat_with_messages_service, 
-    delete_message_service, search_messages_service
+    delete_message_service, search_messages_service, search_all_messages_service
 )
+from services.chats.chatEvents import chat_event_broker, format_sse
+from models.chats.createChat import ChatContactConflict
 
 router = APIRouter(
     prefix="/chats",
@@ -17,6 +22,33 @@ router = APIRouter(
     responses={404: {"description": "No encontrado"}},
 )
 
+SSE_HEARTBEAT_SECONDS = 15
+
+
+async def _event_stream(request: Request, chat_id: Optional[int]):
+    """Generador SSE: reenvía eventos del broker y envía heartbeats"""
+    subscription = chat_event_broker.subscribe(chat_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            if await request.is_disconnected():
+                break
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                yield format_sse(event)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+    finally:
+        chat_event_broker.unsubscribe(subscription)
+
+
+def _sse_response(request: Request, chat_id: Optional[int]) -> StreamingResponse:
+    return StreamingResponse(
+        _event_stream(request, chat_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ========== ENDPOINTS DE CHATS ==========
 
 @router.post(
@@ -31,13 +63,17 @@ router = APIRouter(
     - **email**: Email alternativo para chat web (opcional)
     - **user_id**: ID del usuario registrado (opcional)
     
-    Si ya existe un chat con ese identificador, lo retorna en lugar de crear uno duplicado.
+    Si ya existe un chat con ese identificador, lo retorna en lugar de crear uno duplicado
+    (asociándole el otro identificador si no lo tenía). Si el teléfono y el email
+    pertenecen a chats distintos responde 409.
     """
 )
 def create_chat(chat: ChatCreate):
     """Crear un nuevo chat o obtener uno existente"""
     try:
         return create_chat_service(chat)
+    except ChatContactConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -91,6 +127,62 @@ def search_chats(
             detail=f"Error al buscar chats: {str(e)}"
         )
 
+@router.get(
+    "/events",
+    summary="📡 Eventos en tiempo real de todos los chats",
+    description="""
+    Stream Server-Sent Events con la actividad de todos los chats
+    (`message.created`, `chat.activity`, `chat.messages_deleted`, `chat.deleted`).
+    
+    Reemplaza el polling de `GET /chats/{chat_id}/messages` en la consola de agentes.
+    Cada evento se envía como `event: <tipo>` con un JSON en `data`.
+    """
+)
+async def stream_all_chat_events(request: Request):
+    """Stream SSE de actividad de todos los chats"""
+    return _sse_response(request, None)
+
+@router.get(
+    "/messages/search",
+    response_model=MessageSearchPage,
+    summary="🔎 Búsqueda global de mensajes",
+    description="""
+    Busca mensajes en todas las conversaciones usando el índice FULLTEXT,
+    ordenados por relevancia.
+    
+    - **q**: Texto a buscar (palabras de menos de 3 caracteres se ignoran)
+    - **chat_id**: Limitar a un chat (opcional)
+    - **sender**: Filtrar por quien envía: user, bot, system (opcional)
+    - **date_from** / **date_to**: Rango de fechas de creación (opcional)
+    - **limit** / **offset**: Paginación; `has_more` indica si hay otra página
+    """
+)
+def search_all_messages(
+    q: str = Query(..., min_length=1, description="Texto a buscar"),
+    chat_id: Optional[int] = Query(None, gt=0, description="Filtrar por ID de chat"),
+    sender: Optional[MessageSender] = Query(None, description="Filtrar por sender"),
+    date_from: Optional[datetime] = Query(None, description="Fecha mínima (ISO 8601)"),
+    date_to: Optional[datetime] = Query(None, description="Fecha máxima (ISO 8601)"),
+    limit: int = Query(20, ge=1, le=100, description="Límite de resultados"),
+    offset: int = Query(0, ge=0, description="Offset para paginación")
+    ):
+    """Buscar mensajes en todos los chats"""
+    try:
+        return search_all_messages_service(
+            q,
+            chat_id=chat_id,
+            sender=sender.value if sender else None,
+            date_from=date_from,
+            date_to=date_to,
+            limit=limit,
+            offset=offset
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al buscar mensajes: {str(e)}"
+        )
+
 @router.get(
     "/{chat_id}",
     response_model=ChatResponse,
@@ -242,6 +334,23 @@ def get_messages(
 
 
 
+@router.get(
+    "/{chat_id}/events",
+    summary="📡 Eventos en tiempo real de un chat",
+    description="""
+    Stream Server-Sent Events con los mensajes nuevos (`message.created`) y la
+    actividad (`chat.activity`, `chat.messages_deleted`, `chat.deleted`) de un chat específico.
+    """
+)
+async def stream_chat_events(
+    request: Request,
+    chat_id: int = Path(..., gt=0, description="ID del chat")
+    ):
+    """Stream SSE de un chat"""
+    return _sse_response(request, chat_id)
+
+
+
 @router.get(
     "/{chat_id}/messages/search",
     response_model=List[MessageResponse],
@@ -286,4 +395,15 @@ def delete_message(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al eliminar mensaje: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.on_event("startup")
+async def start_chat_events():
+    """Inicia el broker de eventos de chat (listener de Redis si aplica)"""
+    await chat_event_broker.start()
+
+
+@router.on_event("shutdown")
+async def stop_chat_events():
+    await chat_event_broker.stop()
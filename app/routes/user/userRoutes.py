@@ -1,20 +1,37 @@
 
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
-from typing import List
+import time
+from typing import List, Optional
 from schemas.user.userSchemas import (
     UserCreate, UserUpdate, UserResponse, UserPublicResponse, 
     UserLogin, TokenResponse, UserChangePassword
 )
 from services.user.userService import (
-    create_user_db, get_user_by_id_db, get_all_users_db, update_user_db, 
+    create_user_async, get_user_by_id_db, get_all_users_db, update_user_db, 
     delete_user_db
 )
-from auth.auth_utils import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from auth.auth_middleware import get_current_user, get_current_admin_user
+from auth.auth_utils import create_user_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth.auth_middleware import get_current_user, get_current_admin_user, get_token_payload
+from auth.token_revocation import token_revocation_store
+from auth.password_hasher import password_hasher, PasswordHasherBusy
+from auth.login_rate_limiter import login_rate_limiter, LoginRateLimited, client_ip as get_client_ip
+from auth.principal_cache import get_principal_cache_stats
+from services.user.userCounts import user_counts
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+
+def _password_hasher_busy(e: PasswordHasherBusy) -> HTTPException:
+    """503 inmediato cuando el pool de bcrypt está saturado"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, please retry",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
 @router.post(
     "/register", 
     response_model=UserPublicResponse, 
@@ -60,15 +77,18 @@ router = APIRouter(prefix="/users", tags=["users"])
         }
     }
 )
-def register_user(user: UserCreate):
+async def register_user(user: UserCreate):
     """Registra un nuevo usuario en el sistema"""
-    user_id = create_user_db(user.name, user.email, user.password, user.role)
+    try:
+        user_id = await create_user_async(user.name, user.email, user.password, user.role)
+    except PasswordHasherBusy as e:
+        raise _password_hasher_busy(e)
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="Email already registered"
         )
-    created_user = get_user_by_id_db(user_id)
+    created_user = await run_in_threadpool(get_user_by_id_db, user_id)
     return UserPublicResponse(**created_user)
 
 @router.post(
@@ -116,29 +136,93 @@ def register_user(user: UserCreate):
                     "example": {"detail": "Incorrect email or password"}
                 }
             }
+        },
+        429: {
+            "description": "Demasiados intentos fallidos desde la IP o para el email",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Too many login attempts, retry later"}
+                }
+            }
         }
     }
 )
-def login_user(user_credentials: UserLogin):
+async def login_user(user_credentials: UserLogin, request: Request):
     """Autentica un usuario y devuelve un token JWT"""
-    from services.user.userService import authenticate_user
-    user = authenticate_user(user_credentials.email, user_credentials.password)
+    from services.user.userService import authenticate_user_async
+    started = time.perf_counter()
+    # Detrás de un proxy de confianza (LOGIN_TRUSTED_PROXIES) se usa X-Forwarded-For
+    client_ip = get_client_ip(request)
+    # El límite se comprueba antes de calcular bcrypt (en el threadpool: puede consultar Redis)
+    try:
+        await run_in_threadpool(login_rate_limiter.check, client_ip, user_credentials.email)
+    except LoginRateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        user = await authenticate_user_async(user_credentials.email, user_credentials.password)
+    except PasswordHasherBusy as e:
+        raise _password_hasher_busy(e)
+    password_hasher.record_login((time.perf_counter() - started) * 1000)
     if not user:
+        await run_in_threadpool(login_rate_limiter.record_failure, client_ip, user_credentials.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    await run_in_threadpool(login_rate_limiter.record_success, client_ip, user_credentials.email)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user["id"])}, expires_delta=access_token_expires
-    )
+    # Lee la versión de token vigente (MySQL o Redis): fuera del event loop
+    access_token = await run_in_threadpool(create_user_access_token, user, access_token_expires)
     return {
         "access_token": access_token,
         "token_type": "bearer",
         "user": UserPublicResponse(**user)
     }
 
+@router.post(
+    "/logout",
+    summary="Cerrar sesión",
+    description="""
+    Revoca el token JWT usado en la petición hasta su expiración.
+
+    **Parámetros:**
+    - **all_sessions**: Si es true, revoca todos los tokens del usuario (todas las sesiones)
+
+    **Requiere autenticación:** Token JWT válido en header Authorization
+    """,
+    responses={
+        200: {
+            "description": "Sesión cerrada",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Logged out successfully"}
+                }
+            }
+        },
+        401: {
+            "description": "No autenticado"
+        }
+    }
+)
+def logout_user(
+    all_sessions: bool = Query(False, description="Revocar todas las sesiones del usuario"),
+    payload: dict = Depends(get_token_payload)
+):
+    """Revoca el token actual (o todos los del usuario)"""
+    if all_sessions:
+        token_revocation_store.bump_version(int(payload["sub"]))
+    elif payload.get("jti"):
+        token_revocation_store.revoke_jti(payload["jti"], payload["exp"])
+    else:
+        # Tokens antiguos sin jti: solo se pueden revocar por versión
+        token_revocation_store.bump_version(int(payload["sub"]))
+    return {"message": "Logged out successfully"}
+
 @router.get(
     "/me", 
     response_model=UserResponse,
@@ -273,10 +357,13 @@ def update_current_user(user_data: UserUpdate, current_user: dict = Depends(get_
         }
     }
 )
-def change_current_user_password(password_data: UserChangePassword, current_user: dict = Depends(get_current_user)):
+async def change_current_user_password(password_data: UserChangePassword, current_user: dict = Depends(get_current_user)):
     """Cambia la contraseña del usuario autenticado"""
-    from services.user.userService import change_password_db
-    success = change_password_db(current_user["id"], password_data.current_password, password_data.new_password)
+    from services.user.userService import change_password_async
+    try:
+        success = await change_password_async(current_user["id"], password_data.current_password, password_data.new_password)
+    except PasswordHasherBusy as e:
+        raise _password_hasher_busy(e)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
@@ -324,6 +411,33 @@ def delete_current_user(current_user: dict = Depends(get_current_user)):
 
 # === RUTAS DE ADMINISTRACIÓN ===
 
+@router.get(
+    "/auth/metrics",
+    summary="Métricas de autenticación (Admin)",
+    description="""
+    Contadores del subsistema de autenticación:
+    - **login_rate_limiter**: intentos bloqueados y lockouts por IP y por email
+    - **password_hasher**: operaciones bcrypt completadas, rechazadas (503) y en vuelo
+    - **principal_cache**: aciertos de la caché de usuarios autenticados
+    - **token_revocation**: tokens revocados y rechazados
+
+    **Requiere permisos de administrador**
+    """,
+    responses={
+        403: {
+            "description": "Sin permisos de administrador"
+        }
+    }
+)
+def get_auth_metrics(current_admin: dict = Depends(get_current_admin_user)):
+    """Obtiene métricas de autenticación (solo admins)"""
+    return {
+        "login_rate_limiter": login_rate_limiter.get_stats(),
+        "password_hasher": password_hasher.get_stats(),
+        "principal_cache": get_principal_cache_stats(),
+        "token_revocation": token_revocation_store.get_stats(),
+    }
+
 @router.get(
     "/", 
     response_model=List[UserResponse],
@@ -333,13 +447,22 @@ def delete_current_user(current_user: dict = Depends(get_current_user)):
     
     **Requiere permisos de administrador.**
     
-    **Parámetros de paginación:**
-    - **skip**: Número de usuarios a omitir (para paginación)
+    **Parámetros de paginación (keyset):**
+    - **after_id**: Devuelve usuarios con id mayor a este (usar X-Next-After-Id de la página anterior)
     - **limit**: Número máximo de usuarios a devolver (1-1000)
+    - **skip**: Obsoleto, paginación por OFFSET (solo si no se envía after_id)
+    
+    **Filtros:**
+    - **role**: 'admin' o 'user'
+    - **email_prefix**: Inicio del email (ej: 'juan')
+    
+    **Headers de respuesta:**
+    - **X-Total-Count**: Total aproximado de usuarios del rol (cacheado); ausente si se filtra por email_prefix
+    - **X-Next-After-Id**: Cursor de la siguiente página (ausente en la última)
     
     **Respuesta:**
     - Lista de usuarios con toda su información
-    - Ordenados por fecha de registro (más recientes primero)
+    - Ordenados por id
     """,
     responses={
         200: {
@@ -375,9 +498,22 @@ def delete_current_user(current_user: dict = Depends(get_current_user)):
         }
     }
 )
-def get_all_users(skip: int = Query(0, ge=0, description="Number of users to skip"), limit: int = Query(100, ge=1, le=1000, description="Number of users to return"), current_admin: dict = Depends(get_current_admin_user)):
+def get_all_users(
+    response: Response,
+    after_id: Optional[int] = Query(None, ge=0, description="Return users with id greater than this"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of users to return"),
+    role: Optional[str] = Query(None, pattern="^(admin|user)$", description="Filter by role"),
+    email_prefix: Optional[str] = Query(None, min_length=1, max_length=100, description="Filter by email prefix"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Number of users to skip (use after_id)"),
+    current_admin: dict = Depends(get_current_admin_user)
+):
     """Obtiene todos los usuarios (solo admins)"""
-    users = get_all_users_db(skip, limit)
+    users = get_all_users_db(skip, limit, after_id=after_id, role=role, email_prefix=email_prefix)
+    if not email_prefix:
+        # Solo el total general y por rol se cachean: por prefijo no hay total
+        response.headers["X-Total-Count"] = str(user_counts.get(role))
+    if len(users) == limit:
+        response.headers["X-Next-After-Id"] = str(users[-1]["id"])
     return [UserResponse(**user) for user in users]
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -414,3 +550,19 @@ def delete_user_admin(user_id: int, current_admin: dict = Depends(get_current_ad
         )
 
 
+@router.on_event("startup")
+async def start_password_hasher():
+    """Crea el pool de bcrypt y precarga los procesos sin bloquear el event loop"""
+    await run_in_threadpool(password_hasher.start)
+
+
+@router.on_event("startup")
+async def load_token_revocation():
+    """Carga desde MySQL las versiones de token y los jti revocados"""
+    await run_in_threadpool(token_revocation_store.start)
+
+
+@router.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.stop()
+    token_revocation_store.stop()
@@ -76,6 +76,17 @@ class MessageResponse(MessageBase):
     class Config:
         from_attributes = True
 
+class MessageSearchResult(MessageResponse):
+    """Mensaje encontrado en la búsqueda global"""
+    relevance: float = Field(..., description="Puntuación de relevancia FULLTEXT")
+
+class MessageSearchPage(BaseModel):
+    """Página de resultados de la búsqueda global de mensajes"""
+    results: List[MessageSearchResult] = []
+    limit: int
+    offset: int
+    has_more: bool = Field(False, description="Hay más resultados después de esta página")
+
 class MessageUpdate(BaseModel):
     """Para actualizar un mensaje"""
     body: Optional[str] = None
@@ -0,0 +1,45 @@
+"""
+Job de archivado de chats inactivos.
+
+Uso (desde app/):
+    python scripts/archive_chats.py                  # un ciclo
+    python scripts/archive_chats.py --interval 3600  # en bucle cada hora
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.chats.archiveService import (
+    run_archive_job, ARCHIVE_INACTIVE_DAYS, ARCHIVE_RETENTION_MONTHS, ARCHIVE_BATCH_SIZE
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archiva chats inactivos en messages_archive")
+    parser.add_argument("--inactive-days", type=int, default=ARCHIVE_INACTIVE_DAYS)
+    parser.add_argument("--retention-months", type=int, default=ARCHIVE_RETENTION_MONTHS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--interval", type=int, default=0,
+                        help="Segundos entre ciclos; 0 ejecuta una sola vez")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    while True:
+        try:
+            result = run_archive_job(args.inactive_days, args.retention_months, args.batch_size)
+            print(f"Archivado completado: {result}")
+        except Exception as e:
+            print(f"Error en el archivado: {e}")
+            if not args.interval:
+                raise
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark de perfiles de colección: recall@k vs latencia.
+
+Copia los vectores densos de la colección de productos a una colección
+temporal por perfil de services/qdrant/collection_config.py (HNSW,
+cuantización int8 con rescoring, vectores en disco), espera a que Qdrant
+termine de indexar y mide, para consultas generadas a partir de los nombres
+de producto:
+
+- recall@k contra el top-k exacto (producto punto en NumPy sobre los mismos vectores)
+- latencia p50/p99 de query_points con los search_params del perfil
+- tiempo de carga + indexación y vectores indexados en HNSW
+
+Un catálogo de unos miles de productos queda por debajo de indexing_threshold
+de algunos perfiles (búsqueda por fuerza bruta); --replicate agrega copias con
+ruido de los vectores para medir a escalas mayores.
+
+Uso (desde app/, con la colección cargada con load_kb.py):
+    python scripts/benchmark_collection_profiles.py
+    python scripts/benchmark_collection_profiles.py --profiles balanced accurate --ef 16 32 64 128
+    python scripts/benchmark_collection_profiles.py --replicate 50 --k 10
+
+Las colecciones temporales ('<colección>_bench_<perfil>') se borran al
+terminar salvo con --keep.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from qdrant_client.models import CollectionStatus, PointStruct
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.embeddings.query_cache import embed_query
+from services.qdrant.client_provider import qdrant_provider
+from services.qdrant.collection_config import PROFILES, create_collection, search_params
+
+UPSERT_BATCH = 256
+
+
+def load_vectors(client, collection):
+    """Vectores densos y nombres de todos los puntos de la colección"""
+    vectors, names, offset = [], [], None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=UPSERT_BATCH, offset=offset, with_payload=["name"], with_vectors=True
+        )
+        for point in points:
+            # Colección híbrida: vector denso sin nombre + BM25
+            vector = point.vector[""] if isinstance(point.vector, dict) else point.vector
+            vectors.append(vector)
+            names.append((point.payload or {}).get("name", ""))
+        if offset is None:
+            return np.asarray(vectors, dtype=np.float32), names
+
+
+def replicate(matrix, copies, seed):
+    """Agrega copias con ruido gaussiano (renormalizadas) para simular un catálogo mayor"""
+    rng = np.random.default_rng(seed)
+    blocks = [matrix]
+    for _ in range(copies):
+        noisy = matrix + rng.normal(0, 0.02, matrix.shape).astype(np.float32)
+        blocks.append(noisy / np.linalg.norm(noisy, axis=1, keepdims=True))
+    return np.vstack(blocks)
+
+
+def wait_indexed(client, collection, timeout):
+    # El optimizador arranca tras las escrituras: la colección pasa a amarilla y vuelve a verde
+    time.sleep(1)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = client.get_collection(collection)
+        if info.status == CollectionStatus.GREEN:
+            return info
+        time.sleep(0.5)
+    print(f"⚠️  '{collection}' no terminó de indexar en {timeout}s; se mide igual")
+    return client.get_collection(collection)
+
+
+def build_collection(client, name, matrix, profile, timeout):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    started = time.perf_counter()
+    create_collection(client, name, matrix.shape[1], profile, sparse=False)
+    for start in range(0, len(matrix), UPSERT_BATCH):
+        client.upsert(collection_name=name, points=[
+            PointStruct(id=start + i, vector=vector.tolist())
+            for i, vector in enumerate(matrix[start:start + UPSERT_BATCH])
+        ], wait=True)
+    info = wait_indexed(client, name, timeout)
+    return time.perf_counter() - started, info.indexed_vectors_count
+
+
+def measure(client, name, queries, exact, k, params):
+    recalls, latencies = [], []
+    for query, expected in zip(queries, exact):
+        started = time.perf_counter()
+        response = client.query_points(
+            collection_name=name, query=query.tolist(), limit=k, search_params=params, with_payload=False
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len({point.id for point in response.points} & expected) / k)
+    latencies.sort()
+    return {
+        "recall": sum(recalls) / len(recalls),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara perfiles de colección de Qdrant (recall@k vs latencia)")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(PROFILES), default=list(PROFILES))
+    parser.add_argument("--ef", nargs="+", type=int, help="Valores de hnsw_ef a barrer (por defecto el del perfil)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--replicate", type=int, default=0, help="Copias con ruido de cada vector")
+    parser.add_argument("--index-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--keep", action="store_true", help="No borrar las colecciones temporales")
+    args = parser.parse_args()
+
+    client = qdrant_provider.get_client()
+    source = qdrant_provider.collection_name
+    matrix, names = load_vectors(client, source)
+    if not len(matrix):
+        print(f"La colección '{source}' no tiene productos")
+        return
+    matrix = replicate(matrix, args.replicate, args.seed)
+
+    rng = random.Random(args.seed)
+    texts = [name for name in names if name]
+    texts = rng.sample(texts, min(args.queries, len(texts)))
+    queries = np.asarray([embed_query(text) for text in texts], dtype=np.float32)
+    # Top-k exacto: vectores normalizados, similitud coseno = producto punto
+    scores = queries @ matrix.T
+    exact = [set(np.argsort(-row)[:args.k].tolist()) for row in scores]
+    print(f"{len(matrix)} vectores de dimensión {matrix.shape[1]}, {len(queries)} consultas, k={args.k}\n")
+
+    print(f"{'perfil':<10} {'ef':>5} {'recall@k':>9} {'p50':>9} {'p99':>9} {'carga+índice':>13} {'indexados':>10}")
+    for profile_name in args.profiles:
+        profile = PROFILES[profile_name]
+        name = f"{source}_bench_{profile_name}"
+        build_seconds, indexed = build_collection(client, name, matrix, profile, args.index_timeout)
+        try:
+            for ef in args.ef or [profile.search_ef]:
+                params = search_params(profile, hnsw_ef=ef)
+                # Calentar cachés de segmentos antes de medir
+                measure(client, name, queries[:10], exact[:10], args.k, params)
+                result = measure(client, name, queries, exact, args.k, params)
+                print(
+                    f"{profile_name:<10} {ef or '-':>5} {result['recall']:>9.3f} {result['p50_ms']:>7.2f}ms "
+                    f"{result['p99_ms']:>7.2f}ms {build_seconds:>12.1f}s {indexed or 0:>10}"
+                )
+        finally:
+            if not args.keep:
+                client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark de backends de embeddings en CPU.
+
+Cada variante (backend + cuantización) se carga en un proceso aparte para
+medir su memoria sin interferencias, y se reporta:
+
+- carga: segundos hasta tener el modelo listo
+- RSS: memoria residente del proceso tras cargar y codificar
+- p50/p99: latencia de un encode de una sola consulta
+- textos/s: throughput codificando el corpus por lotes
+- coseno: concordancia con sentence_transformers (PyTorch), media y mínima
+
+Uso (desde app/):
+    python scripts/benchmark_embedding_backends.py
+    python scripts/benchmark_embedding_backends.py --variants sentence_transformers onnx onnx:int8 fastembed
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from services.embeddings.embedding_registry import EMBED_MODEL
+
+REFERENCE = "sentence_transformers"
+WORDS = (
+    "hola quiero precio iphone pro max mac macbook air ipad mini watch ultra airpods "
+    "envío garantía cargador funda color negro blanco azul titanio cuotas disponible "
+    "pantalla batería cámara chip memoria almacenamiento comparar recomendar regalo"
+).split()
+
+
+def make_corpus(count):
+    rng = random.Random(7)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 24))) for _ in range(count)]
+
+
+def rss_mb():
+    # VmRSS de /proc (Linux); en otros sistemas se usa el pico de ru_maxrss
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(model_name, backend, quantize, corpus, queries, batch_size):
+    # Se importa aquí: cada variante corre en su propio proceso
+    from services.embeddings.backends import load_backend
+
+    started = time.perf_counter()
+    model = load_backend(model_name, backend, quantize)
+    model.encode(["warmup"])
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        model.encode([query])
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    vectors = model.encode(corpus, batch_size=batch_size)
+    throughput = len(corpus) / (time.perf_counter() - started)
+
+    latencies.sort()
+    return {
+        "label": model.label,
+        "load_seconds": load_seconds,
+        "rss_mb": rss_mb(),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+        "throughput": throughput,
+        "vectors": np.asarray(vectors, dtype=np.float32),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de backends de embeddings")
+    parser.add_argument("--model", default=EMBED_MODEL)
+    parser.add_argument("--variants", nargs="+", default=[REFERENCE, "onnx", "onnx:int8", "fastembed"],
+                        help="backend[:cuantización]")
+    parser.add_argument("--texts", type=int, default=1000, help="Textos del corpus de throughput")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas individuales para latencia")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.texts)
+    queries = corpus[:args.queries]
+    variants = [variant if ":" in variant else f"{variant}:none" for variant in args.variants]
+    if f"{REFERENCE}:none" not in variants:
+        # La referencia de concordancia siempre se mide
+        variants.insert(0, f"{REFERENCE}:none")
+
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for variant in variants:
+        backend, quantize = variant.split(":", 1)
+        print(f"Midiendo {variant}...")
+        with ctx.Pool(1) as pool:
+            try:
+                results[variant] = pool.apply(
+                    run_variant, (args.model, backend, quantize, corpus, queries, args.batch_size)
+                )
+            except Exception as e:
+                print(f"  ⚠️  {variant} no disponible: {e}")
+
+    reference = results.get(f"{REFERENCE}:none")
+    print(f"\nModelo: {args.model} | corpus: {len(corpus)} textos | lote: {args.batch_size}\n")
+    print(f"{'variante':<28} {'carga':>7} {'RSS':>9} {'p50':>9} {'p99':>9} {'textos/s':>9} {'coseno':>15}")
+    for variant, result in results.items():
+        agreement = "-"
+        if reference is not None and result["vectors"].shape == reference["vectors"].shape:
+            # Vectores normalizados: el producto punto fila a fila es el coseno
+            cosines = np.sum(result["vectors"] * reference["vectors"], axis=1)
+            agreement = f"{cosines.mean():.4f}/{cosines.min():.4f}"
+        print(
+            f"{result['label']:<28} {result['load_seconds']:>6.1f}s {result['rss_mb']:>7.0f}MB "
+            f"{result['p50_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms {result['throughput']:>9.1f} {agreement:>15}"
+        )
+    print("\ncoseno = media/mínima contra PyTorch; valores >= 0.99 conservan el ranking de la búsqueda")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark del micro-batching de embeddings.
+
+Compara, con 1, 8 y 64 llamadores concurrentes, el encode directo de un
+texto por llamada contra BatchingEmbeddingExecutor, reportando throughput
+(consultas/s) y latencia p50/p99. Cada consulta es distinta para que no
+intervenga la caché de embeddings.
+
+Uso (desde app/):
+    python scripts/benchmark_embedding_batching.py
+    python scripts/benchmark_embedding_batching.py --concurrency 1 8 64 --requests 512 --window-ms 5
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.embeddings.embedding_registry import embedding_registry
+from services.embeddings.batch_executor import BatchingEmbeddingExecutor
+
+WORDS = (
+    "hola quiero precio iphone pro max mac macbook air ipad mini watch ultra airpods "
+    "envío garantía cargador funda color negro blanco azul titanio cuotas disponible"
+).split()
+
+
+def make_queries(count):
+    rng = random.Random(42)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))) + f" {i}" for i in range(count)]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+def run(encode_one, queries, concurrency):
+    latencies = []
+    lock = threading.Lock()
+
+    def call(text):
+        started = time.perf_counter()
+        encode_one(text)
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, queries))
+    elapsed = time.perf_counter() - started
+    return len(queries) / elapsed, percentile(latencies, 50), percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de micro-batching de embeddings")
+    parser.add_argument("--model", default=embedding_registry.default_model)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"Cargando modelo {args.model}...")
+    embedding_registry.warmup([args.model])
+    executor = BatchingEmbeddingExecutor(args.model, window_ms=args.window_ms, max_batch_size=args.max_batch)
+
+    def direct(text):
+        return embedding_registry.encode([text], model_name=args.model, use_store=False)[0]
+
+    print(f"{'concurrencia':>12} {'modo':>10} {'consultas/s':>12} {'p50':>10} {'p99':>10}")
+    for concurrency in args.concurrency:
+        queries = make_queries(args.requests)
+        results = {}
+        for mode, encode_one in (("directo", direct), ("batching", executor.encode)):
+            qps, p50, p99 = run(encode_one, queries, concurrency)
+            results[mode] = qps
+            print(f"{concurrency:>12} {mode:>10} {qps:>12.1f} {p50:>8.1f}ms {p99:>8.1f}ms")
+        print(f"{'':>12} {'ganancia':>10} {results['batching'] / results['directo']:>11.2f}x")
+
+    stats = executor.get_stats()
+    print(f"\nLotes: {stats['batches']} | tamaño medio: {stats['avg_batch_size']} | máximo: {stats['max_observed_batch']}")
+
+
+if __name__ == "__main__":
+    main()
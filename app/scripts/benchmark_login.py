@@ -0,0 +1,132 @@
+"""
+Benchmark de una ráfaga de logins contra la API en ejecución.
+
+Mide la latencia (p50/p99) de un endpoint ajeno a la autenticación antes y
+durante una tormenta de logins concurrentes. Con bcrypt en el pool de
+procesos acotado (auth/password_hasher.py) el p99 de ese endpoint debe
+mantenerse estable y los logins sobrantes deben recibir 503 rápido.
+
+Uso (con la API levantada):
+    python scripts/benchmark_login.py --base-url http://localhost:8000 \\
+        --email bench@bench.local --password benchpass123 --register \\
+        --concurrency 64 --duration 20
+"""
+import argparse
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def probe(base_url, path, duration, interval):
+    """Llama al endpoint de control durante `duration` segundos y retorna latencias en ms"""
+    latencies = []
+    session = requests.Session()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        try:
+            session.get(f"{base_url}{path}", timeout=30)
+        except requests.RequestException:
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(interval)
+    return latencies
+
+
+def login_storm(base_url, email, password, concurrency, stop_event, results):
+    def worker():
+        session = requests.Session()
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                response = session.post(
+                    f"{base_url}/users/login",
+                    json={"email": email, "password": password},
+                    timeout=30,
+                )
+                status = response.status_code
+            except requests.RequestException:
+                status = "error"
+            results.append((status, (time.perf_counter() - start) * 1000))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+
+
+def report(label, latencies):
+    print(
+        f"{label:<22} n={len(latencies):<6} "
+        f"p50={percentile(latencies, 50):8.1f} ms  "
+        f"p99={percentile(latencies, 99):8.1f} ms  "
+        f"max={max(latencies) if latencies else 0:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tormenta de logins")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--register", action="store_true", help="Registrar el usuario antes de empezar")
+    parser.add_argument("--probe-path", default="/products/?limit=1", help="Endpoint de control (ruta síncrona)")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+
+    if args.register:
+        requests.post(
+            f"{args.base_url}/users/register",
+            json={"name": "Bench User", "email": args.email, "password": args.password, "role": "user"},
+            timeout=30,
+        )
+
+    print("Midiendo endpoint de control sin carga...")
+    baseline = probe(args.base_url, args.probe_path, args.duration / 2, args.probe_interval)
+
+    print(f"Tormenta de logins: {args.concurrency} clientes durante {args.duration}s...")
+    stop_event = threading.Event()
+    results = []
+    storm = threading.Thread(
+        target=login_storm,
+        args=(args.base_url, args.email, args.password, args.concurrency, stop_event, results),
+    )
+    storm.start()
+    time.sleep(1)  # dejar que la tormenta arranque
+    under_load = probe(args.base_url, args.probe_path, args.duration, args.probe_interval)
+    stop_event.set()
+    storm.join()
+
+    print()
+    report("control (sin carga)", baseline)
+    report("control (tormenta)", under_load)
+
+    statuses = Counter(status for status, _ in results)
+    ok = [latency for status, latency in results if status == 200]
+    busy = [latency for status, latency in results if status == 503]
+    elapsed = args.duration + 1
+    print(f"\nLogins: {dict(statuses)}  ({len(results) / elapsed:.1f} req/s)")
+    if ok:
+        report("login 200", ok)
+    if busy:
+        report("login 503", busy)
+    if baseline and under_load:
+        ratio = percentile(under_load, 99) / max(percentile(baseline, 99), 0.001)
+        print(f"\np99 control tormenta/sin carga: x{ratio:.2f} (mediana x{statistics.median(under_load) / max(statistics.median(baseline), 0.001):.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark de la búsqueda global de mensajes (FULLTEXT vs LIKE).
+
+Siembra mensajes sintéticos hasta alcanzar cada nivel pedido (por defecto
+1M y 10M) y mide la latencia de search_messages_global con y sin filtros,
+comparándola con un LIKE '%termino%' equivalente.
+
+Uso (desde app/):
+    python scripts/benchmark_message_search.py --levels 1000000 10000000
+    python scripts/benchmark_message_search.py --levels 1000000 --no-seed
+
+ADVERTENCIA: escribe en la base configurada por MYSQL_*; usar una base de
+pruebas. Los chats sembrados usan emails '@bench.local'.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import get_connection
+from models.chats.getMensajes import search_messages_global
+
+WORDS = (
+    "hola quiero precio iphone pro max mac macbook air ipad mini watch ultra airpods "
+    "envío garantía reembolso pedido problema batería pantalla cámara cargador funda "
+    "tienda pago tarjeta cuotas disponible stock color negro blanco azul titanio "
+    "gracias ayuda reclamo queja demora factura devolución cambio soporte técnico"
+).split()
+
+QUERIES = ["reembolso", "iphone titanio", "batería problema", "factura devolución", "precio macbook"]
+CHATS = 5000
+BATCH = 5000
+
+
+def count_messages(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) AS total FROM messages")
+    return cursor.fetchone()["total"]
+
+
+def ensure_bench_chats(conn):
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT IGNORE INTO chats (email) VALUES (%s)",
+        [(f"bench{i}@bench.local",) for i in range(CHATS)]
+    )
+    conn.commit()
+    cursor.execute("SELECT id FROM chats WHERE email LIKE %s", ("%@bench.local",))
+    return [row["id"] for row in cursor.fetchall()]
+
+
+def seed_messages(conn, chat_ids, target):
+    current = count_messages(conn)
+    missing = target - current
+    if missing <= 0:
+        return
+    print(f"Sembrando {missing:,} mensajes (actual: {current:,}, objetivo: {target:,})...")
+    rng = random.Random(current)
+    start_date = datetime.now() - timedelta(days=365)
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    inserted = 0
+    while inserted < missing:
+        size = min(BATCH, missing - inserted)
+        rows = []
+        for _ in range(size):
+            body = " ".join(rng.choices(WORDS, k=rng.randint(4, 20)))
+            created_at = start_date + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            rows.append((rng.choice(chat_ids), rng.choice(("user", "bot")), body, created_at))
+        cursor.executemany(
+            "INSERT INTO messages (chat_id, sender, body, created_at) VALUES (%s, %s, %s, %s)",
+            rows
+        )
+        conn.commit()
+        inserted += size
+        if inserted % (BATCH * 20) == 0 or inserted == missing:
+            rate = inserted / (time.perf_counter() - started)
+            print(f"  {inserted:,}/{missing:,} ({rate:,.0f} msg/s)")
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    return statistics.median(samples), p95
+
+
+def like_search(conn, term, limit):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT * FROM messages WHERE body LIKE %s ORDER BY created_at DESC LIMIT %s",
+        (f"%{term}%", limit)
+    )
+    return cursor.fetchall()
+
+
+def run_level(conn, level, chat_ids, repeat, with_like):
+    print(f"\n=== {level:,} mensajes ===")
+    since = datetime.now() - timedelta(days=30)
+    cases = {
+        "fulltext": lambda q: search_messages_global(conn, q, limit=20),
+        "fulltext+chat": lambda q: search_messages_global(conn, q, chat_id=chat_ids[0], limit=20),
+        "fulltext+sender+fecha": lambda q: search_messages_global(
+            conn, q, sender="user", date_from=since, limit=20),
+        "fulltext página 5": lambda q: search_messages_global(conn, q, limit=20, offset=80),
+    }
+    if with_like:
+        cases["LIKE (baseline)"] = lambda q: like_search(conn, q.split()[0], 20)
+
+    print(f"{'caso':<24}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, fn in cases.items():
+        p50s, p95s = [], []
+        for query in QUERIES:
+            p50, p95 = timed(lambda: fn(query), repeat)
+            p50s.append(p50)
+            p95s.append(p95)
+        print(f"{name:<24}{statistics.median(p50s):>10.1f}{max(p95s):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=10, help="Repeticiones por consulta")
+    parser.add_argument("--no-seed", action="store_true", help="No sembrar datos, medir la tabla actual")
+    parser.add_argument("--skip-like", action="store_true", help="Omitir la línea base LIKE (lenta en 10M)")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    try:
+        chat_ids = ensure_bench_chats(conn)
+        for level in sorted(args.levels):
+            if not args.no_seed:
+                seed_messages(conn, chat_ids, level)
+            run_level(conn, count_messages(conn), chat_ids, args.repeat, not args.skip_like)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
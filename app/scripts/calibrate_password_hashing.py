@@ -0,0 +1,75 @@
+"""
+Calibra el costo de bcrypt (BCRYPT_ROUNDS) para este host.
+
+Mide, para cada número de rondas, la latencia y el tiempo de CPU de una
+verificación, y recomienda el costo más alto cuya mediana no supera el
+objetivo. Con PASSWORD_HASH_WORKERS procesos, la capacidad estimada de
+logins por segundo es workers * 1000 / cpu_ms.
+
+Uso (desde app/):
+    python scripts/calibrate_password_hashing.py
+    python scripts/calibrate_password_hashing.py --target-ms 150 --min-rounds 10 --max-rounds 14
+
+Después de cambiar BCRYPT_ROUNDS, los usuarios se re-hashean en su próximo
+login (needs_update / verify_and_update).
+"""
+import argparse
+import os
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+SAMPLE_PASSWORD = "calibration-Password-123"
+
+
+def measure(rounds, samples):
+    """Retorna (mediana ms, p99 ms, cpu medio ms) de verificar un hash con `rounds`"""
+    hashed = bcrypt.using(rounds=rounds).hash(SAMPLE_PASSWORD)
+    wall, cpu = [], []
+    for _ in range(samples):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        bcrypt.verify(SAMPLE_PASSWORD, hashed)
+        wall.append((time.perf_counter() - wall_start) * 1000)
+        cpu.append((time.process_time() - cpu_start) * 1000)
+    wall.sort()
+    p99 = wall[min(len(wall) - 1, int(0.99 * len(wall)))]
+    return statistics.median(wall), p99, statistics.mean(cpu)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra BCRYPT_ROUNDS para un tiempo de verificación objetivo")
+    parser.add_argument("--target-ms", type=float, default=250, help="Tiempo máximo de verificación deseado")
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=15)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2))))
+    args = parser.parse_args()
+
+    current = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    print(f"Host: {os.cpu_count()} núcleos | workers: {args.workers} | BCRYPT_ROUNDS actual: {current}")
+    print(f"{'rondas':>6} {'mediana':>10} {'p99':>10} {'cpu':>10} {'logins/s':>10}")
+
+    recommended = None
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        median, p99, cpu = measure(rounds, args.samples)
+        capacity = args.workers * 1000 / cpu if cpu > 0 else 0
+        print(f"{rounds:>6} {median:>8.1f}ms {p99:>8.1f}ms {cpu:>8.1f}ms {capacity:>10.1f}")
+        if median <= args.target_ms:
+            recommended = rounds
+        elif median > args.target_ms * 4:
+            # Cada ronda duplica el costo: no tiene sentido seguir midiendo
+            break
+
+    print()
+    if recommended is None:
+        print(f"Ningún costo >= {args.min_rounds} cumple {args.target_ms}ms; usar BCRYPT_ROUNDS={args.min_rounds} "
+              f"o revisar el hardware.")
+    else:
+        print(f"Recomendado: BCRYPT_ROUNDS={recommended} (objetivo {args.target_ms}ms por verificación)")
+        if recommended != current:
+            print("Los hashes existentes se actualizarán en el próximo login de cada usuario.")
+
+
+if __name__ == "__main__":
+    main()
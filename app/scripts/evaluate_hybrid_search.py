@@ -0,0 +1,119 @@
+"""
+Evaluación de la búsqueda de productos: densa + palabras clave vs híbrida.
+
+Genera consultas etiquetadas a partir del catálogo cargado en Qdrant (el
+producto buscado es la respuesta correcta) y compara los dos modos de
+services/qdrant/product_search.py:
+
+- keywords: densa + búsquedas filtradas por palabra clave (comportamiento previo)
+- hybrid: densa + BM25 fusionadas con RRF en una sola consulta
+
+Reporta recall@1/5/10, MRR y latencia p50/p99 por modo.
+
+Uso (desde app/, con la colección cargada con load_kb.py --recreate):
+    python scripts/evaluate_hybrid_search.py
+    python scripts/evaluate_hybrid_search.py --max-products 200 --limit 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.qdrant.client_provider import qdrant_provider
+from services.qdrant.product_search import search_product_points
+
+# Variantes de cómo un cliente pregunta por un producto
+QUERY_TEMPLATES = (
+    "{name}",
+    "precio del {name}",
+    "tienen el {short} disponible?",
+    "quiero comprar {short}",
+)
+
+
+def load_products(max_products):
+    products, offset = [], None
+    while True:
+        points, offset = qdrant_provider.call(
+            lambda client: client.scroll(
+                collection_name=qdrant_provider.collection_name,
+                limit=256, offset=offset, with_payload=["name"], with_vectors=False
+            ),
+            "scroll"
+        )
+        products.extend((point.id, point.payload.get("name", "")) for point in points if point.payload.get("name"))
+        if offset is None or len(products) >= max_products:
+            return products[:max_products]
+
+
+def build_queries(products, seed):
+    rng = random.Random(seed)
+    queries = []
+    for product_id, name in products:
+        short = name.replace("Apple ", "").lower()
+        template = rng.choice(QUERY_TEMPLATES)
+        queries.append((template.format(name=name, short=short), product_id))
+    return queries
+
+
+async def evaluate(queries, mode, limit):
+    ranks, latencies = [], []
+    for query, expected_id in queries:
+        started = time.perf_counter()
+        points = await search_product_points(query, limit, mode=mode)
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids = [point.id for point in points]
+        ranks.append(ids.index(expected_id) + 1 if expected_id in ids else None)
+    latencies.sort()
+    found = [rank for rank in ranks if rank is not None]
+    return {
+        "recall@1": sum(rank <= 1 for rank in found) / len(ranks),
+        "recall@5": sum(rank <= 5 for rank in found) / len(ranks),
+        "recall@10": sum(rank <= 10 for rank in found) / len(ranks),
+        "mrr": sum(1 / rank for rank in found) / len(ranks),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+    }
+
+
+async def main_async(args):
+    products = load_products(args.max_products)
+    if not products:
+        print(f"La colección '{qdrant_provider.collection_name}' no tiene productos")
+        return
+    queries = build_queries(products, args.seed)
+    print(f"{len(queries)} consultas etiquetadas sobre {len(products)} productos\n")
+
+    modes = ["keywords"]
+    if qdrant_provider.has_sparse_vector():
+        modes.append("hybrid")
+    else:
+        print("⚠️  La colección no tiene vector disperso: recargar con load_kb.py --recreate para evaluar la híbrida\n")
+
+    # Calentar el modelo y las conexiones antes de medir
+    await search_product_points("warmup", args.limit, mode="keywords")
+
+    print(f"{'modo':<10} {'recall@1':>9} {'recall@5':>9} {'recall@10':>10} {'MRR':>7} {'p50':>9} {'p99':>9}")
+    for mode in modes:
+        result = await evaluate(queries, mode, args.limit)
+        print(
+            f"{mode:<10} {result['recall@1']:>9.3f} {result['recall@5']:>9.3f} {result['recall@10']:>10.3f} "
+            f"{result['mrr']:>7.3f} {result['p50_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms"
+        )
+    await qdrant_provider.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evalúa búsqueda densa+palabras clave vs híbrida")
+    parser.add_argument("--max-products", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=13)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,21 @@
+"""
+Migra a bcrypt las contraseñas guardadas en texto plano.
+
+Recorre los usuarios por bloques de id (keyset), hashea cada bloque en un
+pool de procesos y lo escribe con executemany, haciendo commit por bloque.
+El último id procesado se guarda en un archivo de estado, así una ejecución
+interrumpida continúa donde quedó.
+
+Uso:
+    python scripts/hash_passwords.py
+    python scripts/hash_passwords.py --chunk-size 2000 --workers 8
+    python scripts/hash_passwords.py --reset   # ignora el estado guardado
+"""
+import argparse
+import json
 import os
 import pymysql
+from multiprocessing import Pool
 from passlib.context import CryptContext
 from dotenv import load_dotenv
 import time
@@ -14,11 +30,22 @@ DB_USER = os.getenv("MYSQL_USER", "root")
 DB_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
 DB_NAME = os.getenv("MYSQL_DATABASE", "applestore")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+DEFAULT_STATE_FILE = os.path.join(os.path.dirname(__file__), ".hash_passwords_state.json")
+
+# Cubre $2a$, $2b$ y $2y$: nunca se debe volver a hashear un hash existente
+BCRYPT_PATTERN = "$2_$%"
+
+# Mismo costo que la API (auth/auth_utils.py)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=BCRYPT_ROUNDS)
 
 def hash_password(password):
     return pwd_context.hash(password)
 
+def _hash_row(row):
+    user_id, plain_password = row
+    return hash_password(plain_password), user_id, plain_password
+
 def wait_for_mysql(host, port, user, password, database, retries=10, delay=3):
     for i in range(retries):
         try:
@@ -37,7 +64,34 @@ def wait_for_mysql(host, port, user, password, database, retries=10, delay=3):
             time.sleep(delay)
     raise Exception("No se pudo conectar a MySQL después de varios intentos.")
 
+def load_last_id(state_file):
+    if not os.path.exists(state_file):
+        return 0
+    with open(state_file) as f:
+        return int(json.load(f).get("last_id", 0))
+
+def save_last_id(state_file, last_id, processed):
+    # Escritura atómica: un corte a mitad de escritura no deja el estado corrupto
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump({"last_id": last_id, "processed": processed, "updated_at": time.time()}, f)
+    os.replace(tmp_file, state_file)
+
+def fetch_chunk(cur, last_id, chunk_size):
+    cur.execute(
+        "SELECT id, password FROM users WHERE id > %s AND password NOT LIKE %s ORDER BY id LIMIT %s",
+        (last_id, BCRYPT_PATTERN, chunk_size)
+    )
+    return cur.fetchall()
+
 def main():
+    parser = argparse.ArgumentParser(description="Hashea contraseñas en texto plano con bcrypt")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE)
+    parser.add_argument("--reset", action="store_true", help="Empezar desde el principio")
+    args = parser.parse_args()
+
     wait_for_mysql(DB_HOST, 3306, DB_USER, DB_PASSWORD, DB_NAME)
     conn = pymysql.connect(
         host=DB_HOST,
@@ -46,17 +100,48 @@ def main():
         database=DB_NAME
     )
     cur = conn.cursor()
-    # Selecciona usuarios cuyas contraseñas no están hasheadas (no empiezan por $2b$)
-    cur.execute("SELECT id, password FROM users WHERE password NOT LIKE '$2b$%';")
-    users = cur.fetchall()
-    for user_id, plain_password in users:
-        hashed = hash_password(plain_password)
-        cur.execute("UPDATE users SET password=%s WHERE id=%s;", (hashed, user_id))
-        print(f"Usuario {user_id} actualizado.")
-    conn.commit()
+
+    if args.reset and os.path.exists(args.state_file):
+        os.remove(args.state_file)
+    last_id = load_last_id(args.state_file)
+    if last_id:
+        print(f"Reanudando desde id > {last_id}")
+
+    processed = 0
+    started = time.perf_counter()
+    with Pool(processes=args.workers) as pool:
+        while True:
+            rows = fetch_chunk(cur, last_id, args.chunk_size)
+            if not rows:
+                break
+            chunk_started = time.perf_counter()
+            hashed = pool.map(_hash_row, rows)
+            # La condición sobre el password leído evita pisar un cambio hecho
+            # por el usuario mientras corría la migración
+            cur.executemany(
+                "UPDATE users SET password=%s WHERE id=%s AND password=%s",
+                hashed
+            )
+            conn.commit()
+
+            last_id = rows[-1][0]
+            processed += len(rows)
+            save_last_id(args.state_file, last_id, processed)
+
+            chunk_rate = len(rows) / (time.perf_counter() - chunk_started)
+            total_rate = processed / (time.perf_counter() - started)
+            print(
+                f"Hasta id {last_id}: {processed} usuarios "
+                f"({chunk_rate:.1f} usuarios/s en el bloque, {total_rate:.1f} usuarios/s en total)"
+            )
+
     cur.close()
     conn.close()
-    print("Contraseñas hasheadas correctamente.")
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Contraseñas hasheadas correctamente: {processed} usuarios en {elapsed:.1f}s ({rate:.1f} usuarios/s).")
+    if os.path.exists(args.state_file):
+        os.remove(args.state_file)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
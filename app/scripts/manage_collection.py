@@ -0,0 +1,75 @@
+"""
+Administración de la colección de productos en Qdrant.
+
+Muestra la configuración actual (HNSW, cuantización, vectores en disco,
+umbrales del optimizador) y aplica un perfil de
+services/qdrant/collection_config.py de forma idempotente: solo se envía a
+Qdrant lo que difiere, y Qdrant reconstruye índices en segundo plano.
+
+Uso (desde app/):
+    python scripts/manage_collection.py profiles
+    python scripts/manage_collection.py show
+    python scripts/manage_collection.py apply --profile balanced --dry-run
+    python scripts/manage_collection.py apply --profile balanced
+"""
+import argparse
+import os
+import sys
+from dataclasses import asdict
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.qdrant.client_provider import qdrant_provider
+from services.qdrant.collection_config import (
+    PROFILES, QDRANT_COLLECTION_PROFILE, apply_profile, describe_collection, get_profile, profile_diff
+)
+
+
+def show(client, collection, profile):
+    info = client.get_collection(collection)
+    print(f"Colección '{collection}'")
+    for key, value in describe_collection(info).items():
+        print(f"  {key:<24} {value}")
+    pending = sorted(profile_diff(info, profile))
+    if pending:
+        print(f"\nDifiere del perfil '{profile.name}' en: {', '.join(pending)}")
+    else:
+        print(f"\nCoincide con el perfil '{profile.name}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Administra la colección de productos en Qdrant")
+    parser.add_argument("command", choices=["profiles", "show", "apply"])
+    parser.add_argument("--profile", default=QDRANT_COLLECTION_PROFILE, choices=sorted(PROFILES))
+    parser.add_argument("--collection", default=qdrant_provider.collection_name)
+    parser.add_argument("--dry-run", action="store_true", help="Solo muestra qué cambiaría")
+    args = parser.parse_args()
+
+    if args.command == "profiles":
+        for name, profile in PROFILES.items():
+            marker = " (activo)" if name == QDRANT_COLLECTION_PROFILE else ""
+            settings = ", ".join(f"{key}={value}" for key, value in asdict(profile).items() if key != "name")
+            print(f"{name}{marker}: {settings}")
+        return
+
+    client = qdrant_provider.get_client()
+    if not client.collection_exists(args.collection):
+        print(f"La colección '{args.collection}' no existe; créala con data/qdrant/load_kb.py")
+        sys.exit(1)
+
+    profile = get_profile(args.profile)
+    if args.command == "show":
+        show(client, args.collection, profile)
+        return
+
+    changed = apply_profile(client, args.collection, profile, dry_run=args.dry_run)
+    if not changed:
+        print(f"La colección '{args.collection}' ya tiene el perfil '{profile.name}'; nada que aplicar")
+    elif args.dry_run:
+        print(f"Se actualizarían: {', '.join(changed)}")
+    else:
+        print(f"Perfil '{profile.name}' aplicado ({', '.join(changed)}); Qdrant reindexa en segundo plano")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Reencola las filas de vector_outbox marcadas como fallidas.
+
+Tras VECTOR_OUTBOX_MAX_ATTEMPTS intentos con error una fila deja de
+reintentarse (failed_at). Una vez corregida la causa (producto con datos
+inválidos, modelo, colección), este script las devuelve a la cola con los
+intentos a cero para que el worker de la API las sincronice.
+
+Uso (desde app/):
+    python scripts/requeue_vector_outbox.py --list
+    python scripts/requeue_vector_outbox.py                      # todas
+    python scripts/requeue_vector_outbox.py --product-ids 12 40  # solo esos productos
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.qdrant.vector_outbox import vector_outbox_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reencola filas fallidas de vector_outbox")
+    parser.add_argument("--product-ids", nargs="+", type=int, help="Solo las filas de estos productos")
+    parser.add_argument("--list", action="store_true", help="Solo muestra las filas fallidas")
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.list:
+        rows = vector_outbox_worker.list_failed(args.limit)
+        if not rows:
+            print("No hay filas fallidas en vector_outbox")
+        for row in rows:
+            print(f"{row['id']:>8} producto {row['product_id']:>6} {row['operation']:<6} "
+                  f"intentos={row['attempts']} fallida={row['failed_at']} error={row['last_error']}")
+        return
+
+    requeued = vector_outbox_worker.requeue_failed(args.product_ids)
+    print(f"{requeued} filas reencoladas; el worker de la API las sincronizará en el próximo sondeo")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,13 @@ import json
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-import requests
-from sentence_transformers import SentenceTransformer
+
+from services.embeddings.embedding_registry import embedding_registry
+from services.embeddings.query_cache import embed_query
+from services.qdrant.client_provider import qdrant_provider
+from services.qdrant.collection_config import search_params
+from services.qdrant.payload_schema import SEARCH_PAYLOAD_FIELDS
+from services.embeddings.local_index import PRODUCT_SEARCH_ENGINE, local_product_index
 
 # Langroid imports
 from langroid import ChatAgent, ChatAgentConfig
@@ -22,33 +27,42 @@ class QdrantSearchService:
     """Servicio para búsquedas semánticas en Qdrant"""
     
     def __init__(self):
-        self.qdrant_url = os.getenv("QDRANT_URL", "http://qdrant:6333")
-        self.collection_name = os.getenv("QDRANT_COLLECTION", "products_kb")
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Cliente compartido del proceso (keep-alive, timeout y reintentos)
+        self.collection_name = qdrant_provider.collection_name
+        # Modelo compartido del proceso; debe ser el mismo con que se cargó la colección
+        # (antes se usaba all-MiniLM-L6-v2, de igual dimensión pero otro espacio vectorial)
+        self.model_name = embedding_registry.default_model
     
     def search_products(self, query: str, limit: int = 5, threshold: float = 0.5) -> List[Dict[str, Any]]:
         """
         Busca productos similares usando búsqueda vectorial
         """
+        query_vector = None
         try:
             # Generar embedding de la consulta
-            query_vector = self.model.encode(query).tolist()
-            
-            search_payload = {
-                "vector": query_vector,
-                "limit": limit,
-                "score_threshold": threshold,
-                "with_payload": True
-            }
-            
-            url = f"{self.qdrant_url}/collections/{self.collection_name}/points/search"
-            response = requests.post(url, json=search_payload)
-            response.raise_for_status()
-            
-            results = response.json().get("result", [])
-            return [{"score": r["score"], "product": r["payload"]} for r in results]
+            query_vector = embed_query(query, self.model_name)
+            if PRODUCT_SEARCH_ENGINE == "local":
+                hits = local_product_index.search(query_vector, limit, score_threshold=threshold)
+                return [{"score": hit.score, "product": hit.payload} for hit in hits]
+            
+            response = qdrant_provider.call(
+                lambda client: client.query_points(
+                    collection_name=self.collection_name,
+                    query=query_vector,
+                    limit=limit,
+                    score_threshold=threshold,
+                    search_params=search_params(),
+                    with_payload=SEARCH_PAYLOAD_FIELDS
+                ),
+                "búsqueda de productos"
+            )
+            return [{"score": point.score, "product": point.payload} for point in response.points]
             
         except Exception as e:
+            if PRODUCT_SEARCH_ENGINE == "fallback" and local_product_index.ready and query_vector is not None:
+                logger.warning(f"Qdrant no disponible ({e}); usando el índice local")
+                hits = local_product_index.search(query_vector, limit, score_threshold=threshold)
+                return [{"score": hit.score, "product": hit.payload} for hit in hits]
             logger.error(f"Error en búsqueda de productos: {str(e)}")
             return []
 
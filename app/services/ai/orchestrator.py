@@ -12,6 +12,9 @@ from services.ai.routing import bot_orchestrator, BotType, ResponseType
 from services.ai.nodes import AgentNodeFactory
 from services.ai.cost_tracker import cost_tracker
 from services.ai.config import ai_config
+from services.embeddings.embedding_registry import embedding_registry
+from services.embeddings.query_cache import query_embedding_cache
+from services.embeddings.batch_executor import get_executors_stats
 from services.chats.chatService import create_message_service, get_messages_service
 from schemas.chats.chatSchemas import MessageCreate, MessageSender
 
@@ -451,6 +454,11 @@ class GraphOrchestrator:
                     "limits": cost_limits
                 },
                 "agent_status": agent_status,
+                "embeddings": {
+                    **embedding_registry.get_stats(),
+                    "query_cache": query_embedding_cache.get_stats(),
+                    "batching": get_executors_stats()
+                },
                 "active_conversations": len(self.active_conversations),
                 "system_health": "healthy",
                 "ai_provider": ai_config.current_provider.value,
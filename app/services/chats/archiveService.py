@@ -0,0 +1,134 @@
+"""
+Archivado en frío de chats inactivos.
+
+Mueve los mensajes de chats sin actividad a la tabla particionada
+messages_archive, mantiene particiones mensuales por adelantado y descarta
+las particiones más antiguas que el periodo de retención con DROP PARTITION.
+Las lecturas de models/chats/getMensajes.py combinan ambas tablas, por lo que
+el archivado es transparente para la API.
+"""
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from database import get_connection
+from models.chats.archiveChats import (
+    get_inactive_chat_ids, archive_chat_messages,
+    get_archive_partitions, add_archive_partitions, drop_archive_partitions
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_INACTIVE_DAYS = int(os.getenv("CHAT_ARCHIVE_INACTIVE_DAYS", "90"))
+ARCHIVE_RETENTION_MONTHS = int(os.getenv("CHAT_ARCHIVE_RETENTION_MONTHS", "24"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("CHAT_ARCHIVE_BATCH_SIZE", "200"))
+ARCHIVE_MONTHS_AHEAD = int(os.getenv("CHAT_ARCHIVE_MONTHS_AHEAD", "3"))
+
+
+def _add_months(day: date, months: int) -> date:
+    """Primer día del mes desplazado `months` meses"""
+    month_index = day.year * 12 + (day.month - 1) + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def ensure_archive_partitions_service(months_ahead: int = ARCHIVE_MONTHS_AHEAD) -> int:
+    """
+    Garantiza que existan particiones mensuales hasta `months_ahead` meses en
+    el futuro, para que p_future quede vacía y dividirla sea barato.
+
+    Returns:
+        Número de particiones creadas
+    """
+    conn = get_connection()
+    try:
+        bounds = [p["upper_bound"] for p in get_archive_partitions(conn) if p["upper_bound"] is not None]
+        if bounds:
+            # +1 día absorbe la diferencia de zona horaria entre MySQL y el proceso
+            last_bound = (datetime.fromtimestamp(max(bounds)) + timedelta(days=1)).date()
+            next_start = _add_months(last_bound, 1)
+        else:
+            next_start = _add_months(date.today(), 1)
+        target = _add_months(date.today(), months_ahead + 1)
+
+        month_starts = []
+        while next_start <= target:
+            month_starts.append(next_start)
+            next_start = _add_months(next_start, 1)
+
+        add_archive_partitions(conn, month_starts)
+        if month_starts:
+            logger.info(f"Creadas {len(month_starts)} particiones en messages_archive")
+        return len(month_starts)
+    finally:
+        conn.close()
+
+
+def drop_old_archive_partitions_service(retention_months: int = ARCHIVE_RETENTION_MONTHS) -> int:
+    """
+    Elimina las particiones cuyo rango completo es anterior al periodo de retención.
+
+    Returns:
+        Número de particiones eliminadas
+    """
+    cutoff = _add_months(date.today(), -retention_months)
+    cutoff_epoch = datetime.combine(cutoff, datetime.min.time()).timestamp()
+    conn = get_connection()
+    try:
+        partitions = get_archive_partitions(conn)
+        expired = [
+            p["name"] for p in partitions
+            if p["upper_bound"] is not None and p["upper_bound"] <= cutoff_epoch
+        ]
+        # MySQL exige conservar al menos una partición
+        if len(expired) >= len(partitions):
+            expired = expired[:-1]
+        drop_archive_partitions(conn, expired)
+        if expired:
+            logger.info(f"Particiones eliminadas de messages_archive: {expired}")
+        return len(expired)
+    finally:
+        conn.close()
+
+
+def archive_inactive_chats_service(inactive_days: int = ARCHIVE_INACTIVE_DAYS,
+                                   batch_size: int = ARCHIVE_BATCH_SIZE,
+                                   max_batches: Optional[int] = None) -> Dict[str, int]:
+    """
+    Archiva por lotes los chats sin mensajes en los últimos `inactive_days` días.
+    Cada lote se confirma en su propia transacción.
+
+    Returns:
+        Diccionario con chats y mensajes archivados
+    """
+    cutoff = datetime.now() - timedelta(days=inactive_days)
+    totals = {"chats": 0, "messages": 0}
+    batches = 0
+    conn = get_connection()
+    try:
+        while max_batches is None or batches < max_batches:
+            chat_ids = get_inactive_chat_ids(conn, cutoff, batch_size)
+            if not chat_ids:
+                break
+            totals["messages"] += archive_chat_messages(conn, chat_ids, cutoff)
+            totals["chats"] += len(chat_ids)
+            batches += 1
+            logger.info(f"Lote {batches}: {len(chat_ids)} chats archivados")
+        return totals
+    finally:
+        conn.close()
+
+
+def run_archive_job(inactive_days: int = ARCHIVE_INACTIVE_DAYS,
+                    retention_months: int = ARCHIVE_RETENTION_MONTHS,
+                    batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict[str, Any]:
+    """Ejecuta un ciclo completo: particiones, archivado y retención"""
+    created = ensure_archive_partitions_service()
+    archived = archive_inactive_chats_service(inactive_days, batch_size)
+    dropped = drop_old_archive_partitions_service(retention_months)
+    return {
+        "partitions_created": created,
+        "chats_archived": archived["chats"],
+        "messages_archived": archived["messages"],
+        "partitions_dropped": dropped,
+    }
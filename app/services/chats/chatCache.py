@@ -0,0 +1,104 @@
+"""
+Caché de metadatos de chats para la ruta caliente del bot.
+
+/ai-agent/process verifica que el chat exista y el gateway de WhatsApp llama
+POST /chats por cada mensaje entrante; con esta caché ambas consultas se
+resuelven sin ir a MySQL mientras la conversación está activa.
+
+Las entradas se indexan por id, teléfono y email (normalizados). Se invalidan
+al eliminar el chat o sus mensajes y, con CHAT_EVENTS_BACKEND=redis, también
+cuando lo hace otro worker (eventos chat.deleted y chat.messages_deleted).
+Cada mensaje nuevo (chat.activity) actualiza last_activity y last_message
+con los mismos valores que create_message escribe en chats al insertarlo.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from cache import TTLCache
+from models.chats.createChat import normalize_phone_number, normalize_email
+from services.chats.chatEvents import chat_event_broker
+
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "300"))
+CHAT_CACHE_MAX_SIZE = int(os.getenv("CHAT_CACHE_MAX_SIZE", "10000"))
+
+
+class ChatMetadataCache:
+    """Caché de filas de chats con índices secundarios por teléfono y email"""
+
+    def __init__(self, max_size: int = CHAT_CACHE_MAX_SIZE, ttl_seconds: float = CHAT_CACHE_TTL_SECONDS):
+        self._chats = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        # Índices secundarios: clave -> chat_id
+        self._keys = TTLCache(max_size=max_size * 2, ttl_seconds=ttl_seconds)
+
+    def get_by_id(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        return self._chats.get(chat_id)
+
+    def get_by_contact(self, phone_number: Optional[str] = None, email: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Busca por teléfono y luego por email, igual que get_or_create_chat"""
+        for key in (("phone", normalize_phone_number(phone_number)), ("email", normalize_email(email))):
+            if key[1] is None:
+                continue
+            chat_id = self._keys.get(key)
+            if chat_id is None:
+                continue
+            chat = self._chats.get(chat_id)
+            if chat is not None:
+                return chat
+        return None
+
+    @staticmethod
+    def has_contact(chat: Dict[str, Any], phone_number: Optional[str] = None, email: Optional[str] = None) -> bool:
+        """Indica si el chat ya tiene todos los identificadores recibidos"""
+        phone_number, email = normalize_phone_number(phone_number), normalize_email(email)
+        return (phone_number is None or chat.get("phone_number") == phone_number) and \
+            (email is None or chat.get("email") == email)
+
+    def put(self, chat: Dict[str, Any]):
+        if not chat:
+            return
+        self._chats.set(chat["id"], chat)
+        if chat.get("phone_number"):
+            self._keys.set(("phone", chat["phone_number"]), chat["id"])
+        if chat.get("email"):
+            self._keys.set(("email", chat["email"]), chat["id"])
+
+    def touch(self, chat_id: int, last_activity: Any, last_message: Optional[str] = None):
+        """Actualiza last_activity (y last_message) de un chat cacheado sin ir a la BD"""
+        chat = self._chats.get(chat_id)
+        if chat is not None:
+            updated = {**chat, "last_activity": last_activity}
+            if last_message is not None:
+                updated["last_message"] = last_message
+            self._chats.set(chat_id, updated)
+
+    def invalidate(self, chat_id: int):
+        # Las claves secundarias huérfanas no se devuelven: get_by_contact
+        # siempre confirma la fila en self._chats
+        chat = self._chats.get(chat_id)
+        self._chats.delete(chat_id)
+        if chat:
+            self._keys.delete(("phone", chat.get("phone_number")))
+            self._keys.delete(("email", chat.get("email")))
+
+    def clear(self):
+        self._chats.clear()
+        self._keys.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"chats": self._chats.get_stats(), "keys": self._keys.get_stats()}
+
+
+# Instancia global de la caché
+chat_cache = ChatMetadataCache()
+
+
+def _on_chat_event(event: Dict[str, Any]):
+    if event.get("type") in ("chat.deleted", "chat.messages_deleted"):
+        chat_cache.invalidate(event.get("chat_id"))
+    elif event.get("type") == "chat.activity":
+        data = event.get("data", {})
+        if data.get("last_activity"):
+            chat_cache.touch(event.get("chat_id"), data["last_activity"], data.get("last_message"))
+
+
+chat_event_broker.add_listener(_on_chat_event)
@@ -0,0 +1,189 @@
+"""
+Broker de eventos de chat en tiempo real (SSE).
+
+create_message_service y delete_chat_service publican eventos aquí; los
+endpoints /chats/events y /chats/{chat_id}/events los reciben por suscripción
+en lugar de consultar la tabla messages periódicamente.
+
+Backends (CHAT_EVENTS_BACKEND):
+- memory: fan-out dentro del proceso (un solo worker)
+- redis: cada publicación va al canal pub/sub de Redis y cada worker la
+  re-distribuye a sus suscriptores locales
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+CHAT_EVENTS_BACKEND = os.getenv("CHAT_EVENTS_BACKEND", "memory").lower()
+CHAT_EVENTS_CHANNEL = os.getenv("CHAT_EVENTS_CHANNEL", "chat_events")
+CHAT_EVENTS_QUEUE_SIZE = int(os.getenv("CHAT_EVENTS_QUEUE_SIZE", "100"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+
+def _json_default(obj):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+class ChatSubscription:
+    """Suscripción de un cliente: cola asyncio ligada a su event loop"""
+
+    def __init__(self, chat_id: Optional[int], loop: asyncio.AbstractEventLoop, max_size: int):
+        self.chat_id = chat_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+
+    def deliver(self, event: Dict[str, Any]):
+        """Encola un evento; si el cliente va lento se descarta el más antiguo"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+
+class ChatEventBroker:
+    """Distribuye eventos de chat a los suscriptores SSE"""
+
+    def __init__(self, backend: str = CHAT_EVENTS_BACKEND):
+        self.backend = backend
+        self._subscribers: Dict[Optional[int], Set[ChatSubscription]] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._redis_sync = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self.published = 0
+
+    # ---------- Ciclo de vida ----------
+
+    async def start(self):
+        """Inicia el listener de Redis si el backend es redis"""
+        if self.backend != "redis" or self._listener_task:
+            return
+        try:
+            import redis as sync_redis
+            self._redis_sync = sync_redis.Redis.from_url(REDIS_URL)
+            self._listener_task = asyncio.create_task(self._listen_redis())
+            logger.info(f"Broker de eventos de chat usando Redis ({CHAT_EVENTS_CHANNEL})")
+        except Exception as e:
+            logger.error(f"No se pudo iniciar Redis para eventos de chat, usando memoria: {e}")
+            self.backend = "memory"
+
+    async def stop(self):
+        if self._listener_task:
+            self._listener_task.cancel()
+            self._listener_task = None
+
+    async def _listen_redis(self):
+        import redis.asyncio as redis
+        while True:
+            try:
+                client = redis.from_url(REDIS_URL)
+                pubsub = client.pubsub()
+                await pubsub.subscribe(CHAT_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._dispatch_local(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.warning(f"Evento de chat inválido desde Redis: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Listener de eventos de chat desconectado: {e}")
+                await asyncio.sleep(2)
+
+    # ---------- Suscripciones ----------
+
+    def subscribe(self, chat_id: Optional[int] = None) -> ChatSubscription:
+        """
+        Suscribe al event loop actual. chat_id=None recibe la actividad de todos los chats.
+        """
+        subscription = ChatSubscription(chat_id, asyncio.get_running_loop(), CHAT_EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(chat_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ChatSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.chat_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.chat_id]
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """
+        Registra un callback síncrono que recibe todos los eventos entregados
+        en este proceso (por ejemplo, para invalidar cachés locales).
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    # ---------- Publicación ----------
+
+    def publish(self, event_type: str, chat_id: int, data: Optional[Dict[str, Any]] = None):
+        """
+        Publica un evento. Es síncrono y seguro desde cualquier hilo (las rutas
+        síncronas de FastAPI corren en el threadpool).
+        """
+        event = {
+            "type": event_type,
+            "chat_id": chat_id,
+            "data": data or {},
+            "timestamp": datetime.now().isoformat(),
+        }
+        self.published += 1
+        if self.backend == "redis" and self._redis_sync is not None:
+            try:
+                self._redis_sync.publish(CHAT_EVENTS_CHANNEL, json.dumps(event, default=_json_default))
+                return
+            except Exception as e:
+                logger.warning(f"Error publicando evento en Redis, entrega local: {e}")
+        self._dispatch_local(json.loads(json.dumps(event, default=_json_default)))
+
+    def _dispatch_local(self, event: Dict[str, Any]):
+        with self._lock:
+            targets = list(self._subscribers.get(event.get("chat_id"), ()))
+            targets += list(self._subscribers.get(None, ()))
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"Error en listener de eventos de chat: {e}")
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                self.unsubscribe(subscription)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscriptions = sum(len(s) for s in self._subscribers.values())
+        return {
+            "backend": self.backend,
+            "subscriptions": subscriptions,
+            "published": self.published,
+        }
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serializa un evento en formato text/event-stream"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=_json_default)}\n\n"
+
+
+# Instancia global del broker
+chat_event_broker = ChatEventBroker()
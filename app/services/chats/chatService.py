@@ -1,29 +1,48 @@
 
 from typing import List, Optional
+from datetime import datetime
 from database import get_connection
 from models.chats.createChat import  get_or_create_chat
 from models.chats.getChat import get_chat_by_id, get_all_chats, search_chats
 from models.chats.deleteChat import delete_chat, delete_message
 from models.chats.createMensaje import create_message
-from models.chats.getMensajes import get_messages_by_chat, search_messages_in_chat
-from schemas.chats.chatSchemas import ChatCreate, ChatResponse, MessageCreate, MessageResponse, ChatWithMessages
+from models.chats.getMensajes import get_messages_by_chat, get_message_by_id, search_messages_in_chat, search_messages_global
+from schemas.chats.chatSchemas import (
+    ChatCreate, ChatResponse, MessageCreate, MessageResponse, ChatWithMessages,
+    MessageSearchResult, MessageSearchPage
+)
+from services.chats.chatEvents import chat_event_broker
+from services.chats.chatCache import chat_cache
 
 # ========== SERVICIOS DE CHAT ==========
 
 def create_chat_service(chat_data: ChatCreate) -> ChatResponse:
+    email = getattr(chat_data, 'email', None)
+    chat = chat_cache.get_by_contact(chat_data.phone_number, email)
+    # Si al chat cacheado le falta un identificador o el usuario que llega, hay
+    # que asociarlo (o detectar el conflicto entre dos chats) en BD
+    if chat and chat_cache.has_contact(chat, chat_data.phone_number, email) and \
+            (chat_data.user_id is None or chat.get("user_id") is not None):
+        return ChatResponse(**chat)
     with get_connection() as conn:
         chat = get_or_create_chat(
             conn,
             phone_number=chat_data.phone_number,
-            email=getattr(chat_data, 'email', None),
+            email=email,
             user_id=chat_data.user_id,
         )
-        return ChatResponse(**chat)
+    chat_cache.put(chat)
+    return ChatResponse(**chat)
 
 def get_chat_service(chat_id: int) -> Optional[ChatResponse]:
-    with get_connection() as conn:
-        chat = get_chat_by_id(conn, chat_id)
-        return ChatResponse(**chat) if chat else None
+    chat = chat_cache.get_by_id(chat_id)
+    if chat is None:
+        with get_connection() as conn:
+            chat = get_chat_by_id(conn, chat_id)
+        if not chat:
+            return None
+        chat_cache.put(chat)
+    return ChatResponse(**chat)
 
 def get_all_chats_service() -> List[ChatResponse]:
     with get_connection() as conn:
@@ -38,18 +57,29 @@ def search_chats_service(search_term: str) -> List[ChatResponse]:
 
 def delete_chat_service(chat_id: int) -> bool:
     with get_connection() as conn:
-        return delete_chat(conn, chat_id)
+        deleted = delete_chat(conn, chat_id)
+    chat_cache.invalidate(chat_id)
+    if deleted:
+        chat_event_broker.publish("chat.deleted", chat_id)
+    return deleted
 
 # ========== SERVICIOS DE MENSAJES ==========
 
 def create_message_service(message_data: MessageCreate) -> MessageResponse:
     with get_connection() as conn:
         message_id = create_message(conn, message_data.chat_id, message_data.sender.value, message_data.body)
-        messages = get_messages_by_chat(conn, message_data.chat_id)
-        created_message = next((msg for msg in messages if msg['id'] == message_id), None)
+        created_message = get_message_by_id(conn, message_id)
         if not created_message:
             raise Exception("Error retrieving created message")
-        return MessageResponse(**created_message)
+    message = MessageResponse(**created_message)
+    # Notificar a los clientes suscritos (consola de agentes) en lugar de que hagan polling
+    chat_event_broker.publish("message.created", message.chat_id, message.dict())
+    chat_event_broker.publish("chat.activity", message.chat_id, {
+        "sender": message.sender.value,
+        "last_message": message.body[:200],
+        "last_activity": message.created_at,
+    })
+    return message
 
 def get_messages_service(chat_id: int, limit: int = 100, offset: int = 0) -> List[MessageResponse]:
     with get_connection() as conn:
@@ -69,10 +99,37 @@ def get_chat_with_messages_service(chat_id: int) -> Optional[ChatWithMessages]:
 
 def delete_message_service(message_id: int) -> bool:
     with get_connection() as conn:
-        return delete_message(conn, message_id)
+        message = get_message_by_id(conn, message_id)
+        deleted = delete_message(conn, message_id)
+    if deleted and message:
+        # La vista previa del chat cacheado puede ser el mensaje borrado
+        chat_cache.invalidate(message["chat_id"])
+        chat_event_broker.publish("chat.messages_deleted", message["chat_id"], {"message_id": message_id})
+    return deleted
 
 
 def search_messages_service(chat_id: int, search_term: str) -> List[MessageResponse]:
     with get_connection() as conn:
         messages = search_messages_in_chat(conn, chat_id, search_term)
-        return [MessageResponse(**msg) for msg in messages]
\ No newline at end of file
+        return [MessageResponse(**msg) for msg in messages]
+
+
+def search_all_messages_service(search_term: str,
+                                chat_id: Optional[int] = None,
+                                sender: Optional[str] = None,
+                                date_from: Optional[datetime] = None,
+                                date_to: Optional[datetime] = None,
+                                limit: int = 20,
+                                offset: int = 0) -> MessageSearchPage:
+    with get_connection() as conn:
+        # Se pide un resultado extra para saber si hay más páginas sin hacer COUNT(*)
+        rows = search_messages_global(
+            conn, search_term, chat_id=chat_id, sender=sender,
+            date_from=date_from, date_to=date_to, limit=limit + 1, offset=offset
+        )
+        return MessageSearchPage(
+            results=[MessageSearchResult(**row) for row in rows[:limit]],
+            limit=limit,
+            offset=offset,
+            has_more=len(rows) > limit
+        )
\ No newline at end of file
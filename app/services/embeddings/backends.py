@@ -0,0 +1,179 @@
+"""
+Backends de inferencia de embeddings seleccionables por despliegue.
+
+EMBEDDING_BACKEND elige cómo se ejecuta el modelo en CPU:
+
+- sentence_transformers: PyTorch (comportamiento original).
+- onnx: ONNX Runtime a través de sentence-transformers (backend="onnx"),
+  con el mismo tokenizador y pooling que PyTorch. Con EMBEDDING_QUANTIZE=int8
+  se exporta y usa una versión cuantizada dinámicamente a int8.
+- fastembed: ONNX Runtime vía fastembed (ya en requirements.txt), sin torch
+  en el camino de inferencia.
+
+Todos exponen la misma interfaz (encode, dimension) y los usa
+embedding_registry; ver scripts/benchmark_embedding_backends.py para comparar
+latencia, throughput, memoria y concordancia coseno contra PyTorch.
+"""
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Sequence, Type
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence_transformers").lower()
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "none").lower()
+EMBEDDING_ONNX_CACHE_DIR = os.getenv("EMBEDDING_ONNX_CACHE_DIR", os.path.expanduser("~/.cache/applestore/onnx"))
+# Configuración de cuantización de ONNX Runtime: avx512_vnni, avx512, avx2 o arm64
+EMBEDDING_QUANTIZE_CONFIG = os.getenv("EMBEDDING_QUANTIZE_CONFIG", "avx2")
+
+
+class EmbeddingBackend(ABC):
+    """Interfaz común: un modelo cargado que codifica listas de textos"""
+
+    name = "base"
+
+    def __init__(self, model_name: str, quantize: str = "none"):
+        self.model_name = model_name
+        self.quantize = quantize
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}-{self.quantize}" if self.quantize != "none" else self.name
+
+    @abstractmethod
+    def encode(self, texts: Sequence[str], normalize: bool = True, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Retorna un array float32 (n, dim)"""
+
+    @abstractmethod
+    def dimension(self) -> int:
+        """Dimensión de los vectores del modelo"""
+
+
+class SentenceTransformersBackend(EmbeddingBackend):
+    """PyTorch vía sentence-transformers"""
+
+    name = "sentence_transformers"
+
+    def __init__(self, model_name: str, quantize: str = "none"):
+        super().__init__(model_name, quantize)
+        if quantize != "none":
+            logger.warning("EMBEDDING_QUANTIZE solo aplica a los backends onnx; se ignora con PyTorch")
+            self.quantize = "none"
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, **self._model_kwargs())
+
+    def _model_kwargs(self) -> Dict:
+        return {}
+
+    def encode(self, texts, normalize=True, batch_size=32, **kwargs):
+        return self.model.encode(
+            list(texts), normalize_embeddings=normalize, batch_size=batch_size, **kwargs
+        ).astype(np.float32, copy=False)
+
+    def dimension(self) -> int:
+        return int(self.model.get_sentence_embedding_dimension())
+
+
+class OnnxBackend(SentenceTransformersBackend):
+    """
+    ONNX Runtime con el pipeline de sentence-transformers (>= 3.2).
+
+    El export a ONNX (y su cuantización int8) se hace una vez y se guarda en
+    EMBEDDING_ONNX_CACHE_DIR; los arranques siguientes solo lo cargan.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, quantize: str = "none"):
+        EmbeddingBackend.__init__(self, model_name, quantize)
+        from sentence_transformers import SentenceTransformer
+        local_dir = os.path.join(EMBEDDING_ONNX_CACHE_DIR, model_name.replace("/", "__"))
+        exported = os.path.isdir(local_dir)
+        source = local_dir if exported else model_name
+        if quantize == "int8":
+            self.model = self._load_int8(source, local_dir, exported)
+        else:
+            self.model = SentenceTransformer(source, backend="onnx")
+            if not exported:
+                self.model.save_pretrained(local_dir)
+
+    def _load_int8(self, source: str, local_dir: str, exported: bool):
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+        file_name = f"model_qint8_{EMBEDDING_QUANTIZE_CONFIG}.onnx"
+        if os.path.exists(os.path.join(local_dir, "onnx", file_name)):
+            return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": f"onnx/{file_name}"})
+        model = SentenceTransformer(source, backend="onnx")
+        if not exported:
+            model.save_pretrained(local_dir)
+        logger.info(f"Cuantizando '{self.model_name}' a int8 ({EMBEDDING_QUANTIZE_CONFIG})...")
+        export_dynamic_quantized_onnx_model(model, EMBEDDING_QUANTIZE_CONFIG, local_dir)
+        return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": f"onnx/{file_name}"})
+
+
+class FastEmbedBackend(EmbeddingBackend):
+    """ONNX Runtime vía fastembed, sin dependencia de torch en inferencia"""
+
+    name = "fastembed"
+
+    @staticmethod
+    def check_model(model_name: str):
+        """Lanza ValueError si fastembed no publica el modelo (EMBED_MODEL)"""
+        from fastembed import TextEmbedding
+        supported = {model["model"].lower() for model in TextEmbedding.list_supported_models()}
+        if model_name.lower() not in supported:
+            raise ValueError(
+                f"EMBEDDING_BACKEND=fastembed no soporta el modelo '{model_name}' (EMBED_MODEL). "
+                f"Usar EMBEDDING_BACKEND=sentence_transformers u onnx, o un modelo de "
+                f"TextEmbedding.list_supported_models()"
+            )
+
+    def __init__(self, model_name: str, quantize: str = "none"):
+        super().__init__(model_name, quantize)
+        if quantize != "none":
+            logger.warning("fastembed usa los pesos ONNX publicados por el modelo; EMBEDDING_QUANTIZE se ignora")
+            self.quantize = "none"
+        from fastembed import TextEmbedding
+        self.model = TextEmbedding(model_name=model_name)
+        self._dimension: Optional[int] = None
+
+    def encode(self, texts, normalize=True, batch_size=32, **kwargs):
+        # fastembed no acepta las opciones de sentence-transformers (show_progress_bar, etc.)
+        vectors = np.asarray(list(self.model.embed(list(texts), batch_size=batch_size)), dtype=np.float32)
+        if normalize and len(vectors):
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = int(self.encode(["dimension"]).shape[1])
+        return self._dimension
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    SentenceTransformersBackend.name: SentenceTransformersBackend,
+    OnnxBackend.name: OnnxBackend,
+    FastEmbedBackend.name: FastEmbedBackend,
+}
+
+
+def validate_backend(model_name: str, backend: str = EMBEDDING_BACKEND) -> Type[EmbeddingBackend]:
+    """
+    Comprueba sin cargar el modelo que el backend existe y admite el modelo.
+    Lanza ValueError con un mensaje claro; se llama al arrancar la API.
+    """
+    backend_cls = BACKENDS.get(backend)
+    if backend_cls is None:
+        raise ValueError(f"EMBEDDING_BACKEND '{backend}' no soportado. Opciones: {', '.join(BACKENDS)}")
+    if backend_cls is FastEmbedBackend:
+        FastEmbedBackend.check_model(model_name)
+    return backend_cls
+
+
+def load_backend(model_name: str,
+                 backend: str = EMBEDDING_BACKEND,
+                 quantize: str = EMBEDDING_QUANTIZE) -> EmbeddingBackend:
+    """Instancia el backend indicado para el modelo"""
+    return validate_backend(model_name, backend)(model_name, quantize)
@@ -0,0 +1,154 @@
+"""
+Ejecutor de embeddings con micro-batching.
+
+Con carga concurrente cada petición llamaba model.encode() con un solo
+texto y desaprovechaba el throughput por lotes del transformer. Este
+ejecutor agrupa las peticiones concurrentes durante una ventana corta
+(EMBEDDING_BATCH_WINDOW_MS) o hasta EMBEDDING_BATCH_MAX_SIZE textos, ejecuta
+un único encode en un hilo dedicado y resuelve el Future de cada llamador.
+
+Los llamadores esperan como máximo EMBEDDING_BATCH_TIMEOUT_SECONDS; si el
+hilo del lote se atasca o muere, encode_with_fallback codifica directamente
+(y el hilo se vuelve a crear en la siguiente petición si murió).
+
+Ver scripts/benchmark_embedding_batching.py para medir la ganancia.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.embeddings.embedding_registry import embedding_registry
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "true").lower() == "true"
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+EMBEDDING_BATCH_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_BATCH_TIMEOUT_SECONDS", "10"))
+
+
+class BatchingEmbeddingExecutor:
+    """Agrupa peticiones de encode concurrentes en lotes para un modelo"""
+
+    def __init__(self,
+                 model_name: Optional[str] = None,
+                 window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+                 max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE):
+        self.model_name = model_name or embedding_registry.default_model
+        self.window_seconds = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_observed_batch = 0
+        self.timeouts = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"embedding-batcher-{self.model_name}", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Encola un texto; el Future se resuelve con su vector (np.ndarray)"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Versión bloqueante de submit"""
+        return self.submit(text).result(timeout=timeout)
+
+    def encode_with_fallback(self, text: str, timeout: float = EMBEDDING_BATCH_TIMEOUT_SECONDS) -> np.ndarray:
+        """Como encode, pero si el lote no responde a tiempo codifica directamente"""
+        future = self.submit(text)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Si aún está en cola el hilo del lote la descarta al verla cancelada
+            future.cancel()
+            self.timeouts += 1
+            logger.warning(f"El lote de embeddings no respondió en {timeout}s; encode directo")
+            return embedding_registry.encode([text], model_name=self.model_name, use_store=False)[0]
+
+    def _collect_batch(self) -> List:
+        # Bloquea hasta la primera petición y luego espera la ventana para agrupar
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Descarta peticiones cuyo llamador ya canceló
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                vectors = embedding_registry.encode(
+                    [text for text, _ in batch], model_name=self.model_name, use_store=False
+                )
+            except Exception as e:
+                logger.error(f"Error en encode por lotes ({len(batch)} textos): {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            self.batches += 1
+            self.items += len(batch)
+            self.max_observed_batch = max(self.max_observed_batch, len(batch))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "window_ms": self.window_seconds * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_observed_batch": self.max_observed_batch,
+            "timeouts": self.timeouts,
+            "thread_alive": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+_executors: Dict[str, BatchingEmbeddingExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_embedding_executor(model_name: Optional[str] = None) -> BatchingEmbeddingExecutor:
+    """Ejecutor compartido por modelo"""
+    model_name = model_name or embedding_registry.default_model
+    with _executors_lock:
+        executor = _executors.get(model_name)
+        if executor is None:
+            executor = _executors[model_name] = BatchingEmbeddingExecutor(model_name)
+        return executor
+
+
+def get_executors_stats() -> List[Dict[str, Any]]:
+    with _executors_lock:
+        return [executor.get_stats() for executor in _executors.values()]
@@ -0,0 +1,171 @@
+"""
+Registro de modelos de embeddings compartido por todo el proceso.
+
+Cada modelo se carga una sola vez, de forma perezosa y segura entre hilos, y
+lo comparten los nodos de agentes, AIAgentService, la sincronización de
+vectores y los scripts de la base de conocimiento. Antes de consultar una
+colección de Qdrant se verifica que la dimensión del modelo coincida con la
+de la colección.
+
+El motor de inferencia (PyTorch, ONNX Runtime, fastembed) se elige con
+EMBEDDING_BACKEND; ver backends.py. Los textos ya embebidos se leen del
+almacén persistente (embedding_store.py) sin volver a inferir.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.embeddings.backends import EMBEDDING_BACKEND, EMBEDDING_QUANTIZE, EmbeddingBackend, load_backend
+from services.embeddings.embedding_store import embedding_store
+
+logger = logging.getLogger(__name__)
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "intfloat/multilingual-e5-small")
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() == "true"
+
+
+class EmbeddingDimensionMismatch(Exception):
+    """La dimensión del modelo no coincide con la de la colección"""
+
+
+class EmbeddingRegistry:
+    """Carga cada modelo una vez y lo comparte entre hilos"""
+
+    def __init__(self,
+                 default_model: str = EMBED_MODEL,
+                 backend: str = EMBEDDING_BACKEND,
+                 quantize: str = EMBEDDING_QUANTIZE):
+        self.default_model = default_model
+        self.backend = backend
+        self.quantize = quantize
+        self._models: Dict[str, Any] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._checked_collections: Dict[str, int] = {}
+        self.load_seconds: Dict[str, float] = {}
+
+    @property
+    def variant(self) -> str:
+        """Backend y cuantización: vectores de variantes distintas no son intercambiables"""
+        return f"{self.backend}-{self.quantize}" if self.quantize != "none" else self.backend
+
+    def _model_lock(self, model_name: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(model_name, threading.Lock())
+
+    def get(self, model_name: Optional[str] = None) -> EmbeddingBackend:
+        """Retorna el backend del modelo, cargándolo la primera vez"""
+        model_name = model_name or self.default_model
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        # Un lock por modelo: cargar un modelo no bloquea el uso de otro ya cargado
+        with self._model_lock(model_name):
+            model = self._models.get(model_name)
+            if model is None:
+                started = time.perf_counter()
+                model = load_backend(model_name, self.backend, self.quantize)
+                self.load_seconds[model_name] = round(time.perf_counter() - started, 2)
+                self._models[model_name] = model
+                logger.info(
+                    f"Modelo de embeddings '{model_name}' ({model.label}) cargado en {self.load_seconds[model_name]}s"
+                )
+        return model
+
+    def dimension(self, model_name: Optional[str] = None) -> int:
+        return self.get(model_name).dimension()
+
+    def encode(self, texts: Sequence[str], model_name: Optional[str] = None, normalize: bool = True,
+               use_store: bool = True, **kwargs):
+        """
+        Codifica una lista de textos; retorna un array float32 (n, dim).
+
+        Con use_store (por defecto) solo se infieren los textos que no están en
+        el almacén persistente. Las consultas de búsqueda pasan use_store=False:
+        tienen su propia caché (query_cache.py) y harían crecer el almacén sin límite.
+        """
+        texts = list(texts)
+        model_name = model_name or self.default_model
+        if not (use_store and embedding_store.enabled) or not texts:
+            return self.get(model_name).encode(texts, normalize=normalize, **kwargs)
+
+        model_key = f"{self.variant}:{model_name}" + ("" if normalize else ":raw")
+        try:
+            vectors = embedding_store.get_many(model_key, texts)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el almacén de embeddings: {e}")
+            return self.get(model_name).encode(texts, normalize=normalize, **kwargs)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.get(model_name).encode([texts[i] for i in missing], normalize=normalize, **kwargs)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+            try:
+                embedding_store.put_many(model_key, [texts[i] for i in missing], encoded)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar en el almacén de embeddings: {e}")
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    def encode_query(self, text: str, model_name: Optional[str] = None) -> List[float]:
+        """Codifica un solo texto y retorna una lista de floats para Qdrant"""
+        vector = self.encode([text], model_name=model_name)[0]
+        return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+    def warmup(self, model_names: Optional[Sequence[str]] = None):
+        """Carga los modelos indicados (por defecto EMBED_MODEL) y ejecuta un encode de prueba"""
+        for model_name in model_names or [self.default_model]:
+            self.encode(["warmup"], model_name=model_name)
+
+    def check_collection(self, collection_name: str, vector_size, model_name: Optional[str] = None):
+        """
+        Lanza EmbeddingDimensionMismatch si la dimensión del modelo difiere de la
+        de la colección. El resultado se recuerda por (colección, modelo).
+
+        vector_size puede ser un entero o una función sin argumentos que lo
+        obtenga; la función solo se llama la primera vez.
+        """
+        model_name = model_name or self.default_model
+        key = f"{collection_name}:{model_name}"
+        if key in self._checked_collections:
+            return
+        if callable(vector_size):
+            vector_size = vector_size()
+        if vector_size is None:
+            return
+        model_dimension = self.dimension(model_name)
+        if model_dimension != int(vector_size):
+            raise EmbeddingDimensionMismatch(
+                f"El modelo '{model_name}' genera vectores de {model_dimension} dimensiones "
+                f"pero la colección '{collection_name}' usa {vector_size}"
+            )
+        self._checked_collections[key] = model_dimension
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "default_model": self.default_model,
+            "backend": self.backend,
+            "quantize": self.quantize,
+            "variant": self.variant,
+            "loaded_models": list(self._models),
+            "load_seconds": dict(self.load_seconds),
+            "checked_collections": dict(self._checked_collections),
+            "store": embedding_store.get_stats(),
+        }
+
+
+def get_collection_vector_size(client, collection_name: str) -> Optional[int]:
+    """Dimensión del vector (sin nombre) de una colección usando QdrantClient"""
+    vectors = client.get_collection(collection_name).config.params.vectors
+    if isinstance(vectors, dict):
+        # Vectores con nombre: se usa el primero
+        vectors = next(iter(vectors.values()), None)
+    return getattr(vectors, "size", None)
+
+
+# Instancia global del registro
+embedding_registry = EmbeddingRegistry()
@@ -0,0 +1,129 @@
+"""
+Almacén persistente de embeddings por contenido.
+
+Recargar la base de conocimiento, reindexar o actualizar un producto sin
+cambiar su texto volvía a pasar por el modelo. Aquí cada vector se guarda en
+SQLite con clave (modelo, sha256(texto)) como blob float32, y
+embedding_registry.encode solo infiere los textos que no están guardados.
+
+La clave de modelo incluye el backend y la cuantización (ver
+embedding_registry.variant): vectores de variantes distintas no se mezclan.
+SQLite en modo WAL permite que los workers de la API y los scripts lean y
+escriban a la vez; mmap_size hace que las lecturas se sirvan desde páginas
+mapeadas en memoria.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_STORE = os.getenv("EMBEDDING_STORE", "true").lower() == "true"
+EMBEDDING_STORE_PATH = os.getenv(
+    "EMBEDDING_STORE_PATH", os.path.expanduser("~/.cache/applestore/embeddings.sqlite3")
+)
+EMBEDDING_STORE_MMAP_BYTES = int(os.getenv("EMBEDDING_STORE_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+# Límite de parámetros por consulta IN (...) de SQLite
+_SQL_CHUNK = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Vectores float32 en SQLite con clave (modelo, sha256(texto))"""
+
+    def __init__(self, path: str = EMBEDDING_STORE_PATH, enabled: bool = EMBEDDING_STORE):
+        self.path = path
+        self.enabled = enabled
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 no comparte conexiones entre hilos: una por hilo
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={EMBEDDING_STORE_MMAP_BYTES}")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS embeddings (
+                               model TEXT NOT NULL,
+                               text_hash TEXT NOT NULL,
+                               dim INTEGER NOT NULL,
+                               vector BLOB NOT NULL,
+                               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                               PRIMARY KEY (model, text_hash)
+                           ) WITHOUT ROWID"""
+                    )
+                    conn.commit()
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model_key: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Vector guardado de cada texto (None si no está), en el mismo orden"""
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        conn = self._connection()
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), _SQL_CHUNK):
+            chunk = unique[start:start + _SQL_CHUNK]
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({', '.join('?' * len(chunk))})",
+                [model_key, *chunk]
+            ).fetchall()
+            for digest, blob in rows:
+                found[digest] = np.frombuffer(blob, dtype=np.float32)
+        vectors = [found.get(digest) for digest in hashes]
+        hits = sum(vector is not None for vector in vectors)
+        self.hits += hits
+        self.misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, model_key: str, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        conn = self._connection()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((model_key, text_hash(text), int(vector.shape[0]), vector.tobytes()))
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)", rows
+        )
+        conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        if self.enabled:
+            try:
+                rows = self._connection().execute(
+                    "SELECT model, COUNT(*) FROM embeddings GROUP BY model"
+                ).fetchall()
+                stats["vectors"] = {model: count for model, count in rows}
+                stats["size_bytes"] = os.path.getsize(self.path)
+            except Exception as e:
+                stats["error"] = str(e)
+        return stats
+
+
+# Instancia global del almacén
+embedding_store = EmbeddingStore()
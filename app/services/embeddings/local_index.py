@@ -0,0 +1,292 @@
+"""
+Índice vectorial de productos en memoria (NumPy).
+
+El catálogo tiene de decenas a unos pocos miles de productos: sus embeddings
+normalizados caben en una sola matriz float32 contigua (3.000 x 384 = 4.5 MB)
+y una búsqueda es un producto punto vectorizado más argpartition, sin ir a
+la red. Sirve como motor principal (PRODUCT_SEARCH_ENGINE=local) o como
+respaldo automático cuando Qdrant no responde (fallback).
+
+La matriz se persiste en LOCAL_INDEX_DIR como .npy y se abre con memmap al
+arrancar; si no existe o se generó con otro modelo se reconstruye desde
+MySQL. Las altas, cambios y bajas de productos se aplican en caliente
+(vector_sync_service) y se vuelven a persistir al apagar.
+
+Lo persistido puede estar desactualizado (caída sin apagado limpio, cambios
+hechos por otra instancia o drenados por el outbox en otro proceso): al
+abrirlo se concilia con los productos activos de MySQL (reconcile), que
+agrega o re-embebe los que cambiaron de texto, actualiza los payloads y
+quita los borrados o desactivados.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.embeddings.embedding_registry import embedding_registry
+from services.qdrant.payload_schema import PAYLOAD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# qdrant: solo Qdrant | local: solo este índice | fallback: Qdrant y este índice si Qdrant falla
+PRODUCT_SEARCH_ENGINE = os.getenv("PRODUCT_SEARCH_ENGINE", "fallback").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.expanduser("~/.cache/applestore/local_index"))
+
+
+@dataclass
+class LocalHit:
+    """Resultado con la misma forma que un ScoredPoint de Qdrant (id, score, payload)"""
+    id: int
+    score: float
+    payload: Dict[str, Any]
+
+
+class LocalVectorIndex:
+    """Matriz (n, dim) de vectores normalizados con ids y payloads paralelos"""
+
+    def __init__(self, directory: str = LOCAL_INDEX_DIR, model_name: Optional[str] = None):
+        self.directory = directory
+        self.model_name = model_name or embedding_registry.default_model
+        self._matrix: Optional[np.ndarray] = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._payloads: List[Dict[str, Any]] = []
+        self._positions: Dict[int, int] = {}
+        self._size = 0
+        self._lock = threading.RLock()
+        self.dirty = False
+        self.loaded_from: Optional[str] = None
+        self.searches = 0
+        self.last_reconcile: Optional[Dict[str, int]] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._matrix is not None
+
+    def _paths(self) -> Dict[str, str]:
+        return {
+            "matrix": os.path.join(self.directory, "vectors.npy"),
+            "ids": os.path.join(self.directory, "ids.npy"),
+            "payloads": os.path.join(self.directory, "payloads.json"),
+            "meta": os.path.join(self.directory, "meta.json"),
+        }
+
+    def _meta(self) -> Dict[str, Any]:
+        # Con otro esquema de payload el índice persistido también se reconstruye
+        return {"model": self.model_name, "variant": embedding_registry.variant, "payload": list(PAYLOAD_FIELDS)}
+
+    def _set(self, matrix: np.ndarray, ids: np.ndarray, payloads: List[Dict[str, Any]]):
+        with self._lock:
+            self._matrix = matrix
+            self._ids = ids
+            self._payloads = payloads
+            self._size = len(ids)
+            self._positions = {int(product_id): i for i, product_id in enumerate(ids)}
+
+    def load(self) -> bool:
+        """Abre el índice persistido (memmap) o lo reconstruye desde MySQL"""
+        paths = self._paths()
+        try:
+            with open(paths["meta"]) as f:
+                if json.load(f) == self._meta():
+                    with open(paths["payloads"]) as payloads_file:
+                        payloads = json.load(payloads_file)
+                    self._set(np.load(paths["matrix"], mmap_mode="r"), np.load(paths["ids"]), payloads)
+                    self.loaded_from = "disk"
+                    logger.info(f"Índice local cargado de {self.directory}: {self._size} productos")
+                    try:
+                        self.reconcile()
+                    except Exception as e:
+                        # Sin MySQL se sirve lo persistido antes que nada
+                        logger.warning(f"No se pudo conciliar el índice local con MySQL: {e}")
+                    return True
+                logger.info("El índice local persistido es de otro modelo; se reconstruye")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"No se pudo abrir el índice local persistido: {e}")
+        self.rebuild()
+        return True
+
+    @staticmethod
+    def _active_products() -> List[Dict[str, Any]]:
+        """Payloads (con hash del texto) de los productos activos"""
+        from database import get_connection
+        from services.qdrant.vector_sync_service import product_payload
+
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                # Igual que Qdrant: los productos inactivos no se recomiendan
+                cursor.execute("SELECT * FROM products WHERE is_active = TRUE ORDER BY id")
+                return [product_payload(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def _encode(self, products: List[Dict[str, Any]]) -> np.ndarray:
+        from services.embeddings.sparse_encoder import product_text
+
+        if not products:
+            return np.empty((0, embedding_registry.dimension(self.model_name)), dtype=np.float32)
+        return embedding_registry.encode(
+            [product_text(product) for product in products], model_name=self.model_name
+        ).astype(np.float32)
+
+    def rebuild(self):
+        """Recalcula todos los vectores desde los productos activos y persiste el índice"""
+        started = time.perf_counter()
+        products = self._active_products()
+        matrix = self._encode(products)
+        ids = np.array([product["id"] for product in products], dtype=np.int64)
+        self._set(np.ascontiguousarray(matrix), ids, products)
+        self.loaded_from = "mysql"
+        self.save()
+        logger.info(f"Índice local reconstruido con {len(products)} productos en {time.perf_counter() - started:.1f}s")
+
+    def reconcile(self) -> Dict[str, int]:
+        """Aplica al índice la diferencia con los productos activos de MySQL"""
+        from services.qdrant.vector_sync_service import TEXT_HASH_FIELD
+
+        products = self._active_products()
+        with self._lock:
+            current = {int(self._ids[i]): self._payloads[i] for i in range(self._size)}
+        active_ids = {product["id"] for product in products}
+        to_embed = [
+            product for product in products
+            if current.get(product["id"], {}).get(TEXT_HASH_FIELD) != product[TEXT_HASH_FIELD]
+        ]
+        embed_ids = {product["id"] for product in to_embed}
+        payload_only = [
+            product for product in products
+            if product["id"] not in embed_ids and current[product["id"]] != product
+        ]
+        removed = [product_id for product_id in current if product_id not in active_ids]
+
+        if to_embed:
+            for product, vector in zip(to_embed, self._encode(to_embed)):
+                self.upsert(product["id"], vector, product)
+        with self._lock:
+            for product in payload_only:
+                self._payloads[self._positions[product["id"]]] = product
+                self.dirty = True
+        for product_id in removed:
+            self.delete(product_id)
+
+        counts = {"embedded": len(to_embed), "payload_only": len(payload_only), "deleted": len(removed)}
+        self.last_reconcile = counts
+        if self.dirty:
+            self.save()
+            logger.info(f"Índice local conciliado con MySQL: {counts}")
+        return counts
+
+    def save(self):
+        """Persiste matriz, ids y payloads (escritura atómica por archivo)"""
+        with self._lock:
+            matrix = np.asarray(self._matrix[:self._size])
+            ids = self._ids[:self._size].copy()
+            payloads = list(self._payloads[:self._size])
+            self.dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        paths = self._paths()
+        for key, writer in (
+            ("matrix", lambda f: np.save(f, matrix)),
+            ("ids", lambda f: np.save(f, ids)),
+            ("payloads", lambda f: f.write(json.dumps(payloads, ensure_ascii=False).encode("utf-8"))),
+            ("meta", lambda f: f.write(json.dumps(self._meta()).encode("utf-8"))),
+        ):
+            tmp_path = f"{paths[key]}.tmp"
+            with open(tmp_path, "wb") as f:
+                writer(f)
+            os.replace(tmp_path, paths[key])
+
+    def _writable(self, extra_rows: int = 0):
+        # El memmap es de solo lectura: la primera escritura lo copia a RAM con
+        # capacidad de sobra para que las altas no copien la matriz cada vez
+        needed = self._size + extra_rows
+        if isinstance(self._matrix, np.memmap) or self._matrix.shape[0] < needed:
+            capacity = max(needed, 2 * self._size, 64)
+            matrix = np.empty((capacity, self._matrix.shape[1]), dtype=np.float32)
+            matrix[:self._size] = self._matrix[:self._size]
+            ids = np.empty(capacity, dtype=np.int64)
+            ids[:self._size] = self._ids[:self._size]
+            self._matrix, self._ids = matrix, ids
+
+    def upsert(self, product_id: int, vector: Sequence[float], payload: Dict[str, Any]):
+        """Agrega o reemplaza un producto (vector ya normalizado, como los de Qdrant)"""
+        if not self.ready:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            position = self._positions.get(int(product_id))
+            self._writable(extra_rows=0 if position is not None else 1)
+            if position is None:
+                position = self._size
+                self._positions[int(product_id)] = position
+                self._payloads.append(payload)
+                self._size += 1
+            else:
+                self._payloads[position] = payload
+            self._matrix[position] = vector
+            self._ids[position] = product_id
+            self.dirty = True
+
+    def delete(self, product_id: int):
+        """Elimina un producto moviendo la última fila a su posición"""
+        if not self.ready:
+            return
+        with self._lock:
+            position = self._positions.pop(int(product_id), None)
+            if position is None:
+                return
+            self._writable()
+            last = self._size - 1
+            if position != last:
+                self._matrix[position] = self._matrix[last]
+                self._ids[position] = self._ids[last]
+                self._payloads[position] = self._payloads[last]
+                self._positions[int(self._ids[position])] = position
+            self._payloads.pop()
+            self._size = last
+            self.dirty = True
+
+    def search(self, query_vector: Sequence[float], limit: int = 10,
+               score_threshold: Optional[float] = None) -> List[LocalHit]:
+        """Top-k por similitud coseno (producto punto de vectores normalizados)"""
+        if not self.ready:
+            raise RuntimeError("El índice local no está cargado")
+        query = np.asarray(query_vector, dtype=np.float32)
+        # Las escrituras mueven filas en sitio; con miles de filas la búsqueda
+        # dura microsegundos, así que se hace completa bajo el lock
+        with self._lock:
+            self.searches += 1
+            if self._size == 0 or limit <= 0:
+                return []
+            scores = self._matrix[:self._size] @ query
+            k = min(limit, self._size)
+            # argpartition es O(n); solo se ordenan los k mejores
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            hits = [LocalHit(int(self._ids[i]), float(scores[i]), self._payloads[i]) for i in top]
+        if score_threshold is not None:
+            hits = [hit for hit in hits if hit.score >= score_threshold]
+        return hits
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "engine": PRODUCT_SEARCH_ENGINE,
+            "ready": self.ready,
+            "products": self._size,
+            "loaded_from": self.loaded_from,
+            "memmap": isinstance(self._matrix, np.memmap),
+            "dirty": self.dirty,
+            "searches": self.searches,
+            "last_reconcile": self.last_reconcile,
+        }
+
+
+# Instancia global del índice
+local_product_index = LocalVectorIndex()
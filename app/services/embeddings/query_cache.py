@@ -0,0 +1,122 @@
+"""
+Caché de embeddings de consultas.
+
+Las mismas preguntas ("precio iphone 15", "hola quiero un mac") llegan miles
+de veces al día; aquí se guarda su vector para no volver a pasar por el
+modelo. La clave es (modelo, texto normalizado) y el valor un array float32
+compacto (384 dims = 1.5 KB). Solo la clave va en minúsculas: se embebe el
+texto original (multilingual-e5 distingue mayúsculas, "iPhone" != "iphone").
+
+Con QUERY_EMBEDDING_CACHE_REDIS=true la caché local se respalda en Redis y
+todos los workers comparten los vectores ya calculados.
+"""
+import hashlib
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from cache import TTLCache
+from services.embeddings.embedding_registry import embedding_registry
+from services.embeddings.batch_executor import EMBEDDING_BATCHING, get_embedding_executor
+
+logger = logging.getLogger(__name__)
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+QUERY_EMBEDDING_CACHE_REDIS = os.getenv("QUERY_EMBEDDING_CACHE_REDIS", "false").lower() == "true"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Minúsculas y espacios colapsados: 'Precio  iPhone 15 ' -> 'precio iphone 15'"""
+    return _WHITESPACE.sub(" ", (text or "").strip().lower())
+
+
+class QueryEmbeddingCache:
+    """LRU local de vectores float32 con respaldo opcional en Redis"""
+
+    def __init__(self,
+                 max_size: int = QUERY_EMBEDDING_CACHE_SIZE,
+                 ttl_seconds: float = QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+                 use_redis: bool = QUERY_EMBEDDING_CACHE_REDIS):
+        self._local = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self._redis = None
+        self.redis_hits = 0
+        self.encoded = 0
+        if use_redis:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(REDIS_URL)
+            except Exception as e:
+                logger.error(f"No se pudo configurar Redis para la caché de embeddings: {e}")
+
+    @staticmethod
+    def _redis_key(model_name: str, normalized: str) -> str:
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return f"emb:q:{embedding_registry.variant}:{model_name}:{digest}"
+
+    def get_vector(self, text: str, model_name: Optional[str] = None) -> np.ndarray:
+        """Retorna el vector float32 de la consulta, calculándolo solo si no está cacheado"""
+        model_name = model_name or embedding_registry.default_model
+        normalized = normalize_query(text)
+        key = (model_name, normalized)
+
+        vector = self._local.get(key)
+        if vector is not None:
+            return vector
+
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(self._redis_key(model_name, normalized))
+                if raw is not None:
+                    vector = np.frombuffer(raw, dtype=np.float32)
+                    self._local.set(key, vector)
+                    self.redis_hits += 1
+                    return vector
+            except Exception as e:
+                logger.warning(f"Error leyendo embedding de Redis: {e}")
+
+        # Sin cambiar mayúsculas: la primera variante vista llena la entrada de la clave
+        original = _WHITESPACE.sub(" ", (text or "").strip())
+        if EMBEDDING_BATCHING:
+            # Se agrupa con otras consultas concurrentes en un solo encode
+            vector = get_embedding_executor(model_name).encode_with_fallback(original)
+        else:
+            vector = embedding_registry.encode([original], model_name=model_name, use_store=False)[0]
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        self.encoded += 1
+        self._local.set(key, vector)
+        if self._redis is not None:
+            try:
+                self._redis.set(self._redis_key(model_name, normalized), vector.tobytes(), ex=int(self.ttl_seconds))
+            except Exception as e:
+                logger.warning(f"Error guardando embedding en Redis: {e}")
+        return vector
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self._local.get_stats()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "redis": self._redis is not None,
+            "redis_hits": self.redis_hits,
+            "encoded": self.encoded,
+            # Aciertos combinados local + Redis sobre el total de consultas
+            "overall_hit_rate": round((stats["hits"] + self.redis_hits) / lookups, 4) if lookups else 0.0,
+        })
+        return stats
+
+
+# Instancia global de la caché
+query_embedding_cache = QueryEmbeddingCache()
+
+
+def embed_query(text: str, model_name: Optional[str] = None) -> List[float]:
+    """Vector de una consulta de búsqueda como lista de floats para Qdrant"""
+    return query_embedding_cache.get_vector(text, model_name).tolist()
@@ -0,0 +1,78 @@
+"""
+Vectores dispersos estilo BM25 para la búsqueda híbrida.
+
+Los embeddings densos representan mal nombres de modelo y números ("M3 Max",
+"12.9", "15 Pro"). Cada documento se codifica como un vector disperso cuyos
+índices son hashes estables de sus términos y cuyos pesos son la saturación
+de frecuencia de BM25 (k1, b). El IDF lo aplica Qdrant en el servidor
+(modifier=IDF en la configuración del vector disperso), así que no hay
+vocabulario ni estadísticas que mantener al agregar productos.
+
+Las consultas se codifican con peso 1 por término: el score resultante es la
+suma BM25 de los términos compartidos.
+"""
+import os
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import List, Tuple
+
+SPARSE_VECTOR_NAME = os.getenv("QDRANT_SPARSE_VECTOR", "bm25")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Longitud media aproximada (en términos) de name + description de un producto
+BM25_AVG_DOC_LENGTH = float(os.getenv("BM25_AVG_DOC_LENGTH", "40"))
+
+# Términos alfanuméricos, conservando decimales como "12.9" o "6,1"
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+_STOPWORDS = frozenset(
+    "a al con de del el en es la las lo los o para por que un una unos unas y "
+    "the and of for with in on to".split()
+)
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def tokenize(text: str) -> List[str]:
+    """'iPhone 15 Pro, pantalla 6,1"' -> ['iphone', '15', 'pro', 'pantalla', '6.1']"""
+    tokens = _TOKEN.findall(_strip_accents((text or "").lower()))
+    return [token.replace(",", ".") for token in tokens if token not in _STOPWORDS]
+
+
+def term_index(term: str) -> int:
+    """Índice estable (entre procesos y despliegues) de un término"""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _to_sparse(weights: Counter) -> Tuple[List[int], List[float]]:
+    # Colisiones de hash: se suman los pesos de los términos que comparten índice
+    merged = Counter()
+    for term, weight in weights.items():
+        merged[term_index(term)] += weight
+    indices = sorted(merged)
+    return indices, [float(merged[index]) for index in indices]
+
+
+def encode_document(text: str) -> Tuple[List[int], List[float]]:
+    """Pesos BM25 (sin IDF) de los términos del documento"""
+    tokens = tokenize(text)
+    if not tokens:
+        return [], []
+    length_norm = 1 - BM25_B + BM25_B * len(tokens) / BM25_AVG_DOC_LENGTH
+    weights = Counter()
+    for term, tf in Counter(tokens).items():
+        weights[term] = tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+    return _to_sparse(weights)
+
+
+def encode_query(text: str) -> Tuple[List[int], List[float]]:
+    """Términos únicos de la consulta con peso 1"""
+    return _to_sparse(Counter({term: 1.0 for term in tokenize(text)}))
+
+
+def product_text(product: dict) -> str:
+    """Texto indexado de un producto (el mismo que usa el vector denso)"""
+    return f"{product.get('name', '')}. {product.get('description', '')}"
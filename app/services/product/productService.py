@@ -8,12 +8,11 @@ from schemas.product.productSchemas import (
 )
 from models.productos.createProduct import create_product
 from models.productos.getProduct import get_product_by_id
-from models.productos.updateProduct import update_product
 from models.productos.deleteProduct import delete_product
 from models.productos.createSpecs import (
     create_iphone_spec, create_mac_spec, create_ipad_spec, create_apple_watch_spec, create_accessory_spec
 )
-from services.qdrant.vector_sync_service import add_product, update_product, delete_product, extract_vector_from_product
+from services.qdrant.vector_outbox import enqueue_vector_sync, vector_outbox_worker
 
 import json
 import logging
@@ -56,7 +55,7 @@ def get_products_by_category_db(conn, category: str, limit: int = 50, offset: in
     )
     return cursor.fetchall()
 
-def update_product_partial_db(conn, product_id: int, update_data: dict) -> bool:
+def update_product_partial_db(conn, product_id: int, update_data: dict, commit: bool = True) -> bool:
     """Update a product with partial fields"""
     if not update_data:
         return True
@@ -71,14 +70,24 @@ def update_product_partial_db(conn, product_id: int, update_data: dict) -> bool:
     cursor = conn.cursor()
     query = f"UPDATE products SET {', '.join(fields)} WHERE id = %s"
     cursor.execute(query, values)
-    conn.commit()
+    if commit:
+        conn.commit()
     return cursor.rowcount > 0
 
-def update_product_stock_db(conn, product_id: int, new_stock: int) -> bool:
+def update_product_stock_db(conn, product_id: int, new_stock: int, commit: bool = True) -> bool:
     """Update the stock of a product"""
     cursor = conn.cursor()
     cursor.execute("UPDATE products SET stock = %s WHERE id = %s", (new_stock, product_id))
-    conn.commit()
+    if commit:
+        conn.commit()
+    return cursor.rowcount > 0
+
+def deactivate_product_db(conn, product_id: int, commit: bool = True) -> bool:
+    """Soft delete: mark a product as inactive"""
+    cursor = conn.cursor()
+    cursor.execute("UPDATE products SET is_active = FALSE WHERE id = %s", (product_id,))
+    if commit:
+        conn.commit()
     return cursor.rowcount > 0
 
 def format_json_field(data: Any) -> str:
@@ -123,31 +132,33 @@ def create_complete_product_service(product_data: ProductCompleteCreate) -> Opti
             p.image_secondary_url,
             p.image_tertiary_url,
             p.release_date,
-            p.is_active
+            p.is_active,
+            commit=False
         )
         # Insertar en tabla de especificaciones si corresponde
         if product_id:
             # iPhone
             if product_data.iphone_spec is not None:
-                create_iphone_spec(conn, product_id, product_data.iphone_spec)
+                create_iphone_spec(conn, product_id, product_data.iphone_spec, commit=False)
             # Mac
             if product_data.mac_spec is not None:
-                create_mac_spec(conn, product_id, product_data.mac_spec)
+                create_mac_spec(conn, product_id, product_data.mac_spec, commit=False)
             # iPad
             if product_data.ipad_spec is not None:
-                create_ipad_spec(conn, product_id, product_data.ipad_spec)
+                create_ipad_spec(conn, product_id, product_data.ipad_spec, commit=False)
             # Apple Watch
             if product_data.apple_watch_spec is not None:
-                create_apple_watch_spec(conn, product_id, product_data.apple_watch_spec)
+                create_apple_watch_spec(conn, product_id, product_data.apple_watch_spec, commit=False)
             # Accessory
             if product_data.accessory_spec is not None:
-                create_accessory_spec(conn, product_id, product_data.accessory_spec)
-            # Obtener producto creado y sincronizar con Qdrant
-            product = get_product_by_id(conn, product_id)
-            if product:
-                add_product(product)
+                create_accessory_spec(conn, product_id, product_data.accessory_spec, commit=False)
+            # Sincronización con Qdrant vía outbox, en la misma transacción
+            enqueue_vector_sync(conn, product_id)
+        conn.commit()
+        vector_outbox_worker.notify()
         return product_id
     except Exception as e:
+        conn.rollback()
         logger.error(f"Error in create_complete_product_service: {e}")
         return None
     finally:
@@ -291,13 +302,14 @@ def update_product_service(product_id: int, product_data: ProductUpdate) -> bool
         # Convertir enums a string
         if 'category' in update_data:
             update_data['category'] = update_data['category'].value
-        success = update_product_partial_db(conn, product_id, update_data)
+        success = update_product_partial_db(conn, product_id, update_data, commit=False)
         if success:
-            product = get_product_by_id(conn, product_id)
-            if product:
-                update_product(product)
+            enqueue_vector_sync(conn, product_id)
+        conn.commit()
+        vector_outbox_worker.notify()
         return success
     except Exception as e:
+        conn.rollback()
         logger.error(f"Error in update_product_service: {e}")
         return False
     finally:
@@ -316,13 +328,13 @@ def update_product_stock_service(product_id: int, new_stock: int) -> bool:
     """
     conn = get_connection()
     try:
-        success = update_product_stock_db(conn, product_id, new_stock)
-        if success:
-            product = get_product_by_id(conn, product_id)
-            if product:
-                update_product(product)
+        # El stock no forma parte del payload ni del texto embebido:
+        # no hace falta re-sincronizar el producto con Qdrant
+        success = update_product_stock_db(conn, product_id, new_stock, commit=False)
+        conn.commit()
         return success
     except Exception as e:
+        conn.rollback()
         logger.error(f"Error in update_product_stock_service: {e}")
         return False
     finally:
@@ -342,15 +354,17 @@ def delete_product_service(product_id: int, soft_delete: bool = True) -> bool:
     conn = get_connection()
     try:
         if soft_delete:
-            return deactivate_product_db(conn, product_id)
+            deleted = deactivate_product_db(conn, product_id, commit=False)
         else:
-            # Get product before deleting for Qdrant sync
-            product = get_product_by_id(conn, product_id)
-            db_deleted = delete_product(conn, product_id)
-            if db_deleted and product:
-                delete_product_qdrant = delete_product(product_id)
-            return db_deleted
+            deleted = delete_product(conn, product_id, commit=False)
+        if deleted:
+            # El worker quita del índice vectorial los productos borrados o inactivos
+            enqueue_vector_sync(conn, product_id, "delete")
+        conn.commit()
+        vector_outbox_worker.notify()
+        return deleted
     except Exception as e:
+        conn.rollback()
         logger.error(f"Error en delete_product_service: {e}")
         return False
     finally:
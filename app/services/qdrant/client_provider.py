@@ -0,0 +1,205 @@
+"""
+Cliente de Qdrant compartido por todo el proceso.
+
+Antes cada búsqueda de los agentes creaba un QdrantClient nuevo (conexión y
+handshake por consulta) y la sincronización de productos usaba requests sin
+sesión ni timeout. Aquí se mantienen un QdrantClient y un AsyncQdrantClient
+de larga vida, con conexiones keep-alive reutilizadas, transporte gRPC
+opcional (QDRANT_PREFER_GRPC), timeout por operación y reintentos con
+backoff exponencial y jitter ante fallos transitorios.
+
+La colección se verifica una sola vez al arrancar (existencia y dimensión
+del modelo de embeddings), no en cada consulta.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from services.embeddings.embedding_registry import embedding_registry, get_collection_vector_size
+from services.embeddings.sparse_encoder import SPARSE_VECTOR_NAME
+from services.qdrant.payload_schema import ensure_payload_indexes
+
+logger = logging.getLogger(__name__)
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://qdrant:6333")
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "products_kb")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY") or None
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "5"))
+QDRANT_RETRIES = int(os.getenv("QDRANT_RETRIES", "3"))
+QDRANT_RETRY_BASE_DELAY = float(os.getenv("QDRANT_RETRY_BASE_DELAY", "0.1"))
+QDRANT_RETRY_MAX_DELAY = float(os.getenv("QDRANT_RETRY_MAX_DELAY", "2"))
+
+T = TypeVar("T")
+
+# Códigos HTTP y gRPC que vale la pena reintentar
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_RETRYABLE_GRPC = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED", "ABORTED"}
+
+
+def _is_transient(error: Exception) -> bool:
+    """Errores de red, timeouts y respuestas 429/5xx; los 4xx no se reintentan"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    code = getattr(error, "code", None)
+    if callable(code):
+        # grpc.RpcError
+        try:
+            return getattr(code(), "name", "") in _RETRYABLE_GRPC
+        except Exception:
+            return False
+    try:
+        import httpx
+        if isinstance(error, (httpx.TransportError, httpx.TimeoutException)):
+            return True
+    except ImportError:
+        pass
+    from qdrant_client.http.exceptions import ResponseHandlingException
+    return isinstance(error, (ResponseHandlingException, ConnectionError, TimeoutError))
+
+
+class QdrantClientProvider:
+    """Un cliente síncrono y uno asíncrono por proceso, con reintentos"""
+
+    def __init__(self,
+                 url: str = QDRANT_URL,
+                 collection_name: str = QDRANT_COLLECTION,
+                 prefer_grpc: bool = QDRANT_PREFER_GRPC,
+                 timeout: int = QDRANT_TIMEOUT,
+                 retries: int = QDRANT_RETRIES):
+        self.url = url
+        self.collection_name = collection_name
+        self.prefer_grpc = prefer_grpc
+        self.timeout = timeout
+        self.retries = retries
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+        self.collection_ready = False
+        # Nombres de vectores dispersos de la colección (None = aún no consultado)
+        self.sparse_vectors: Optional[set] = None
+        self.calls = 0
+        self.retried = 0
+        self.failures = 0
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "api_key": QDRANT_API_KEY,
+            "prefer_grpc": self.prefer_grpc,
+            "grpc_port": QDRANT_GRPC_PORT,
+            "timeout": self.timeout,
+        }
+
+    def get_client(self):
+        """QdrantClient compartido (conexiones keep-alive del pool de httpx o canal gRPC)"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from qdrant_client import QdrantClient
+                    self._client = QdrantClient(**self._client_kwargs())
+        return self._client
+
+    def get_async_client(self):
+        """AsyncQdrantClient compartido para el event loop de la API"""
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    from qdrant_client import AsyncQdrantClient
+                    self._async_client = AsyncQdrantClient(**self._client_kwargs())
+        return self._async_client
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: evita que los workers reintenten todos a la vez
+        return random.uniform(0, min(QDRANT_RETRY_MAX_DELAY, QDRANT_RETRY_BASE_DELAY * 2 ** attempt))
+
+    def call(self, operation: Callable[[Any], T], description: str = "operación") -> T:
+        """Ejecuta operation(client) reintentando los fallos transitorios"""
+        self.calls += 1
+        for attempt in range(self.retries + 1):
+            try:
+                return operation(self.get_client())
+            except Exception as e:
+                if attempt >= self.retries or not _is_transient(e):
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt)
+                self.retried += 1
+                logger.warning(f"Qdrant {description} falló ({e}); reintento {attempt + 1} en {delay:.2f}s")
+                time.sleep(delay)
+
+    async def call_async(self, operation: Callable[[Any], Awaitable[T]], description: str = "operación") -> T:
+        """Versión asíncrona de call con AsyncQdrantClient"""
+        self.calls += 1
+        for attempt in range(self.retries + 1):
+            try:
+                return await operation(self.get_async_client())
+            except Exception as e:
+                if attempt >= self.retries or not _is_transient(e):
+                    self.failures += 1
+                    raise
+                delay = self._backoff(attempt)
+                self.retried += 1
+                logger.warning(f"Qdrant {description} falló ({e}); reintento {attempt + 1} en {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def ensure_collection(self) -> bool:
+        """
+        Verifica al arrancar que la colección existe y que su dimensión coincide
+        con el modelo de embeddings, y crea los índices de payload que falten.
+        Retorna False si la colección no existe.
+        """
+        client = self.get_client()
+        if not self.call(lambda c: c.collection_exists(self.collection_name), "collection_exists"):
+            logger.warning(f"La colección '{self.collection_name}' no existe en Qdrant ({self.url})")
+            return False
+        embedding_registry.check_collection(
+            self.collection_name, lambda: get_collection_vector_size(client, self.collection_name)
+        )
+        self.has_sparse_vector()
+        self.call(lambda c: ensure_payload_indexes(c, self.collection_name), "índices de payload")
+        self.collection_ready = True
+        return True
+
+    def has_sparse_vector(self, name: str = SPARSE_VECTOR_NAME) -> bool:
+        """Si la colección tiene el vector disperso para búsqueda híbrida (se consulta una vez)"""
+        if self.sparse_vectors is None:
+            info = self.call(lambda c: c.get_collection(self.collection_name), "get_collection")
+            self.sparse_vectors = set(info.config.params.sparse_vectors or {})
+            if name not in self.sparse_vectors:
+                logger.info(
+                    f"La colección '{self.collection_name}' no tiene el vector disperso '{name}'; "
+                    "búsqueda solo densa (recargar con load_kb.py --recreate para habilitar la híbrida)"
+                )
+        return name in self.sparse_vectors
+
+    async def close(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "collection": self.collection_name,
+            "transport": "grpc" if self.prefer_grpc else "http",
+            "timeout": self.timeout,
+            "collection_ready": self.collection_ready,
+            "sparse_vectors": sorted(self.sparse_vectors) if self.sparse_vectors is not None else None,
+            "calls": self.calls,
+            "retried": self.retried,
+            "failures": self.failures,
+        }
+
+
+# Instancia global del proveedor
+qdrant_provider = QdrantClientProvider()
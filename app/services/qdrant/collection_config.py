@@ -0,0 +1,189 @@
+"""
+Configuración declarativa de la colección de productos en Qdrant.
+
+load_kb.py creaba la colección con VectorParams por defecto: sin ajustar el
+grafo HNSW, sin cuantización y sin opciones de disco. Aquí cada perfil
+declara:
+
+- HNSW: m y ef_construct (grafo) y ef de búsqueda.
+- Cuantización escalar int8 (4x menos memoria, distancias con SIMD) con
+  rescoring sobre los vectores originales y oversampling.
+- Vectores originales en disco (on_disk) cuando la cuantización queda en RAM.
+- Umbrales del optimizador: a partir de indexing_threshold (KB de vectores
+  por segmento) Qdrant construye el índice HNSW; por debajo busca por fuerza
+  bruta. Con el default de Qdrant (10.000 KB) un catálogo de unos miles de
+  productos nunca llega a indexarse.
+
+apply_profile compara la configuración actual con el perfil y solo llama a
+update_collection con lo que difiere (idempotente). search_params() son los
+parámetros de búsqueda densa que usan product_search y agentService.
+
+CLI: scripts/manage_collection.py; comparación de perfiles (recall@k vs
+latencia): scripts/benchmark_collection_profiles.py.
+"""
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.models import (
+    Disabled, Distance, HnswConfigDiff, Modifier, OptimizersConfigDiff, QuantizationSearchParams,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams, SparseVectorParams,
+    VectorParams, VectorParamsDiff
+)
+
+from services.embeddings.sparse_encoder import SPARSE_VECTOR_NAME
+
+logger = logging.getLogger(__name__)
+
+QDRANT_COLLECTION_PROFILE = os.getenv("QDRANT_COLLECTION_PROFILE", "balanced").lower()
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    name: str
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    # None: Qdrant usa ef_construct
+    search_ef: Optional[int] = None
+    quantization: bool = False
+    quantization_quantile: float = 0.99
+    quantization_always_ram: bool = True
+    rescore: bool = True
+    oversampling: float = 2.0
+    on_disk_vectors: bool = False
+    indexing_threshold: int = 10000
+    default_segment_number: int = 0
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    # Valores por defecto de Qdrant (comportamiento previo)
+    "default": CollectionProfile(name="default"),
+    # HNSW desde ~650 productos e int8 con rescoring: menos latencia, mismo top-k en la práctica
+    "balanced": CollectionProfile(
+        name="balanced", hnsw_ef_construct=128, search_ef=64, quantization=True,
+        indexing_threshold=1000, default_segment_number=2
+    ),
+    # Grafo más denso y ef alto, sin cuantización: máximo recall
+    "accurate": CollectionProfile(
+        name="accurate", hnsw_m=32, hnsw_ef_construct=256, search_ef=256,
+        indexing_threshold=1000, default_segment_number=2
+    ),
+    # int8 en RAM y vectores originales en disco: mínima memoria
+    "compact": CollectionProfile(
+        name="compact", search_ef=64, quantization=True, oversampling=3.0, on_disk_vectors=True,
+        indexing_threshold=1000, default_segment_number=2
+    ),
+}
+
+
+def get_profile(name: Optional[str] = None) -> CollectionProfile:
+    name = (name or QDRANT_COLLECTION_PROFILE).lower()
+    if name not in PROFILES:
+        raise ValueError(f"Perfil de colección desconocido: {name} (disponibles: {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def hnsw_config(profile: CollectionProfile) -> HnswConfigDiff:
+    return HnswConfigDiff(m=profile.hnsw_m, ef_construct=profile.hnsw_ef_construct)
+
+
+def optimizers_config(profile: CollectionProfile) -> OptimizersConfigDiff:
+    return OptimizersConfigDiff(
+        indexing_threshold=profile.indexing_threshold,
+        default_segment_number=profile.default_segment_number
+    )
+
+
+def quantization_config(profile: CollectionProfile) -> Optional[ScalarQuantization]:
+    if not profile.quantization:
+        return None
+    return ScalarQuantization(scalar=ScalarQuantizationConfig(
+        type=ScalarType.INT8,
+        quantile=profile.quantization_quantile,
+        always_ram=profile.quantization_always_ram
+    ))
+
+
+def search_params(profile: Optional[CollectionProfile] = None, hnsw_ef: Optional[int] = None) -> SearchParams:
+    """Parámetros de búsqueda densa del perfil (hnsw_ef sobrescribe el del perfil)"""
+    profile = profile or get_profile()
+    quantization = None
+    if profile.quantization:
+        quantization = QuantizationSearchParams(rescore=profile.rescore, oversampling=profile.oversampling)
+    return SearchParams(hnsw_ef=hnsw_ef or profile.search_ef, quantization=quantization)
+
+
+def create_collection(client, collection_name: str, vector_size: int,
+                      profile: Optional[CollectionProfile] = None, sparse: bool = True):
+    """Crea la colección con el perfil; sparse agrega el vector BM25 (búsqueda híbrida)"""
+    profile = profile or get_profile()
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE, on_disk=profile.on_disk_vectors),
+        # BM25: los pesos de término van en el vector, el IDF lo calcula Qdrant
+        sparse_vectors_config={SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)} if sparse else None,
+        hnsw_config=hnsw_config(profile),
+        optimizers_config=optimizers_config(profile),
+        quantization_config=quantization_config(profile),
+    )
+
+
+def profile_diff(collection_info, profile: CollectionProfile) -> Dict[str, Any]:
+    """Argumentos de update_collection para llevar la colección al perfil (vacío si ya coincide)"""
+    config = collection_info.config
+    changes: Dict[str, Any] = {}
+
+    hnsw = config.hnsw_config
+    if (hnsw.m, hnsw.ef_construct) != (profile.hnsw_m, profile.hnsw_ef_construct):
+        changes["hnsw_config"] = hnsw_config(profile)
+
+    optimizer = config.optimizer_config
+    if (optimizer.indexing_threshold, optimizer.default_segment_number) != (
+            profile.indexing_threshold, profile.default_segment_number):
+        changes["optimizers_config"] = optimizers_config(profile)
+
+    desired = quantization_config(profile)
+    if desired is None:
+        if config.quantization_config is not None:
+            changes["quantization_config"] = Disabled.DISABLED
+    elif config.quantization_config != desired:
+        changes["quantization_config"] = desired
+
+    vectors = config.params.vectors
+    dense = vectors.get("") if isinstance(vectors, dict) else vectors
+    if dense is not None and bool(dense.on_disk) != profile.on_disk_vectors:
+        # "" es el vector denso sin nombre
+        changes["vectors_config"] = {"": VectorParamsDiff(on_disk=profile.on_disk_vectors)}
+    return changes
+
+
+def apply_profile(client, collection_name: str, profile: Optional[CollectionProfile] = None,
+                  dry_run: bool = False) -> List[str]:
+    """Aplica solo lo que difiere del perfil; retorna los grupos de ajustes cambiados"""
+    profile = profile or get_profile()
+    changes = profile_diff(client.get_collection(collection_name), profile)
+    if changes and not dry_run:
+        client.update_collection(collection_name=collection_name, **changes)
+        logger.info(f"Perfil '{profile.name}' aplicado a '{collection_name}': {sorted(changes)}")
+    return sorted(changes)
+
+
+def describe_collection(collection_info) -> Dict[str, Any]:
+    """Resumen de la configuración actual de la colección"""
+    config = collection_info.config
+    vectors = config.params.vectors
+    dense = vectors.get("") if isinstance(vectors, dict) else vectors
+    quantization = config.quantization_config
+    return {
+        "status": str(collection_info.status),
+        "points": collection_info.points_count,
+        "indexed_vectors": collection_info.indexed_vectors_count,
+        "segments": collection_info.segments_count,
+        "hnsw_m": config.hnsw_config.m,
+        "hnsw_ef_construct": config.hnsw_config.ef_construct,
+        "quantization": quantization.scalar.type if isinstance(quantization, ScalarQuantization) else None,
+        "on_disk_vectors": bool(dense.on_disk) if dense is not None else None,
+        "indexing_threshold": config.optimizer_config.indexing_threshold,
+        "default_segment_number": config.optimizer_config.default_segment_number,
+    }
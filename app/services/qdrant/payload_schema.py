@@ -0,0 +1,49 @@
+"""
+Esquema del payload de los puntos de productos en Qdrant.
+
+Antes el payload era la fila completa de products (tres URLs de imagen,
+stock, fechas) y cada búsqueda la devolvía entera con with_payload=True,
+aunque los agentes solo usan nombre, precio, descripción y categoría. Ahora
+se guardan únicamente PAYLOAD_FIELDS (más el hash del texto embebido, ver
+vector_sync_service.TEXT_HASH_FIELD) y las búsquedas piden solo
+SEARCH_PAYLOAD_FIELDS.
+
+category y price tienen índice de payload para filtrar por categoría o rango
+de precio sin recorrer todos los puntos.
+"""
+import logging
+from typing import Any, Dict
+
+from qdrant_client.models import PayloadSchemaType
+
+logger = logging.getLogger(__name__)
+
+# Campos de la fila de products que se guardan en el punto
+PAYLOAD_FIELDS = ("id", "name", "category", "description", "price")
+
+# Lo que leen los agentes de cada resultado (format_products_for_context, recomendaciones)
+SEARCH_PAYLOAD_FIELDS = list(PAYLOAD_FIELDS)
+
+PAYLOAD_INDEXES = {
+    "category": PayloadSchemaType.KEYWORD,
+    "price": PayloadSchemaType.FLOAT,
+}
+
+
+def project_payload(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Solo los campos del esquema (sin convertir tipos)"""
+    return {field: product.get(field) for field in PAYLOAD_FIELDS}
+
+
+def ensure_payload_indexes(client, collection_name: str) -> list:
+    """Crea los índices de payload que falten; retorna los creados"""
+    existing = client.get_collection(collection_name).payload_schema or {}
+    created = []
+    for field, schema in PAYLOAD_INDEXES.items():
+        if field in existing:
+            continue
+        client.create_payload_index(collection_name=collection_name, field_name=field, field_schema=schema)
+        created.append(field)
+    if created:
+        logger.info(f"Índices de payload creados en '{collection_name}': {created}")
+    return created
@@ -0,0 +1,164 @@
+"""
+Recuperación de productos en Qdrant para los agentes.
+
+Dos modos:
+
+- hybrid: si la colección tiene el vector disperso BM25 (ver
+  services/embeddings/sparse_encoder.py), una sola consulta con dos prefetch
+  (denso y disperso) fusionados en el servidor con reciprocal rank fusion.
+- keywords: búsqueda densa más una filtrada por cada palabra clave de
+  SEARCH_KEYWORDS encontrada en el mensaje, en un único query_batch_points.
+
+SEARCH_MODE=auto usa hybrid cuando la colección lo soporta. Las búsquedas
+densas usan el ef y el rescoring del perfil de colección (collection_config.py).
+
+Con PRODUCT_SEARCH_ENGINE=local la búsqueda se resuelve en el índice NumPy
+en memoria (services/embeddings/local_index.py) y con fallback ese índice
+responde cuando Qdrant falla, en lugar de dejar al agente sin productos.
+"""
+import asyncio
+import logging
+import os
+from typing import List, Optional
+
+from qdrant_client.models import (
+    FieldCondition, Filter, Fusion, FusionQuery, MatchText, Prefetch, QueryRequest, SparseVector
+)
+
+from services.embeddings.query_cache import embed_query
+from services.embeddings import sparse_encoder
+from services.embeddings.local_index import PRODUCT_SEARCH_ENGINE, local_product_index
+from services.qdrant.client_provider import qdrant_provider
+from services.qdrant.collection_config import search_params
+from services.qdrant.payload_schema import SEARCH_PAYLOAD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODE = os.getenv("SEARCH_MODE", "auto").lower()
+# Candidatos que aporta cada rama (densa y dispersa) antes de la fusión
+HYBRID_PREFETCH_LIMIT = int(os.getenv("HYBRID_PREFETCH_LIMIT", "30"))
+
+# Términos que, si aparecen en el mensaje, se buscan también en el nombre del producto
+SEARCH_KEYWORDS = ("iphone", "ipad", "mac", "airpods", "watch", "pro", "max", "15", "14", "13")
+
+
+def extract_search_keywords(query: str) -> List[str]:
+    """Palabras clave de SEARCH_KEYWORDS contenidas en la consulta, en ese orden"""
+    query_lower = query.lower()
+    return [keyword for keyword in SEARCH_KEYWORDS if keyword in query_lower]
+
+
+def keyword_batch_requests(query_vector: List[float], keywords: List[str], limit: int) -> List[QueryRequest]:
+    """Búsqueda vectorial principal + una filtrada por nombre por cada palabra clave"""
+    batch = [
+        QueryRequest(
+            query=query_vector,
+            limit=limit * 2,  # Obtener más resultados para filtrar después
+            params=search_params(),
+            with_payload=SEARCH_PAYLOAD_FIELDS
+        )
+    ]
+    for keyword in keywords:
+        batch.append(QueryRequest(
+            query=query_vector,
+            filter=Filter(must=[FieldCondition(key="name", match=MatchText(text=keyword))]),
+            limit=10,
+            params=search_params(),
+            with_payload=SEARCH_PAYLOAD_FIELDS
+        ))
+    return batch
+
+
+def merge_keyword_results(responses, limit: int):
+    """Une los resultados del lote sin duplicados (los vectoriales primero)"""
+    if len(responses) == 1:
+        return responses[0].points
+    seen_ids = set()
+    unique_results = []
+    for response in responses:
+        for result in response.points:
+            if result.id not in seen_ids:
+                seen_ids.add(result.id)
+                unique_results.append(result)
+    return unique_results[:limit]
+
+
+def hybrid_query(query_vector: List[float], query_text: str, limit: int) -> dict:
+    """Argumentos de query_points para denso + BM25 fusionados con RRF"""
+    indices, values = sparse_encoder.encode_query(query_text)
+    prefetch_limit = max(HYBRID_PREFETCH_LIMIT, limit)
+    return {
+        "prefetch": [
+            Prefetch(query=query_vector, params=search_params(), limit=prefetch_limit),
+            Prefetch(
+                query=SparseVector(indices=indices, values=values),
+                using=sparse_encoder.SPARSE_VECTOR_NAME,
+                limit=prefetch_limit
+            ),
+        ],
+        "query": FusionQuery(fusion=Fusion.RRF),
+        "limit": limit,
+        "with_payload": SEARCH_PAYLOAD_FIELDS,
+    }
+
+
+async def resolve_search_mode(mode: Optional[str] = None) -> str:
+    mode = mode or SEARCH_MODE
+    if mode != "auto":
+        return mode
+    if qdrant_provider.sparse_vectors is None:
+        # Normalmente ya se consultó al arrancar (ensure_collection)
+        await asyncio.to_thread(qdrant_provider.has_sparse_vector)
+    return "hybrid" if sparse_encoder.SPARSE_VECTOR_NAME in qdrant_provider.sparse_vectors else "keywords"
+
+
+async def search_product_points(query: str, limit: int = 10, mode: Optional[str] = None,
+                                engine: str = PRODUCT_SEARCH_ENGINE):
+    """Puntos (con id, payload y score) más relevantes para la consulta"""
+    # En un hilo: no bloquea el event loop y permite agrupar consultas concurrentes
+    query_vector = await asyncio.to_thread(embed_query, query)
+    if engine == "local":
+        return local_product_index.search(query_vector, limit)
+    try:
+        return await _search_qdrant(query, query_vector, limit, mode)
+    except Exception as e:
+        if engine != "fallback" or not local_product_index.ready:
+            raise
+        logger.warning(f"Qdrant no disponible ({e}); usando el índice local")
+        return local_product_index.search(query_vector, limit)
+
+
+async def _search_qdrant(query: str, query_vector: List[float], limit: int, mode: Optional[str]):
+    collection_name = qdrant_provider.collection_name
+    mode = await resolve_search_mode(mode)
+
+    if mode == "hybrid":
+        logger.debug("Ejecutando búsqueda híbrida (densa + BM25, RRF)")
+        response = await qdrant_provider.call_async(
+            lambda client: client.query_points(
+                collection_name=collection_name, **hybrid_query(query_vector, query, limit)
+            ),
+            "búsqueda híbrida"
+        )
+        return response.points
+
+    keywords = extract_search_keywords(query)
+    logger.debug(f"Palabras clave extraídas: {keywords}")
+    batch = keyword_batch_requests(query_vector, keywords, limit)
+    try:
+        responses = await qdrant_provider.call_async(
+            lambda client: client.query_batch_points(collection_name=collection_name, requests=batch),
+            "búsqueda en lote"
+        )
+    except Exception as e:
+        if not keywords:
+            raise
+        logger.warning(f"Error en búsqueda por palabras clave: {e}, usando solo búsqueda vectorial")
+        responses = [await qdrant_provider.call_async(
+            lambda client: client.query_points(
+                collection_name=collection_name, query=query_vector, limit=limit * 2,
+                search_params=search_params(), with_payload=SEARCH_PAYLOAD_FIELDS
+            ),
+            "búsqueda vectorial"
+        )]
+    return merge_keyword_results(responses, limit)
@@ -0,0 +1,375 @@
+"""
+Outbox transaccional para sincronizar productos con Qdrant.
+
+Las escrituras de productos ya no embeben ni llaman a Qdrant dentro de la
+petición HTTP: agregan una fila a vector_outbox en la misma transacción de
+MySQL (enqueue_vector_sync) y VectorOutboxWorker, en un hilo en segundo
+plano, la procesa por lotes:
+
+1. Reclama hasta VECTOR_OUTBOX_BATCH_SIZE filas disponibles con
+   FOR UPDATE SKIP LOCKED, les pone un lease (available_at +
+   VECTOR_OUTBOX_LEASE_SECONDS), lee los productos y hace commit. Ningún
+   lock ni conexión queda abierto durante la inferencia ni las llamadas a
+   Qdrant; si el proceso muere, las filas vuelven a la cola al vencer el lease.
+2. Si el producto existe y está activo se embebe en bloque y se hace un solo
+   upsert; si no, un solo delete.
+3. En una segunda transacción corta borra las filas sincronizadas.
+
+Errores:
+- Transitorios (red, timeouts, 429/5xx de Qdrant): se reprograma el lote
+  entero con backoff exponencial según los fallos consecutivos del worker,
+  sin contar intentos; una caída de Qdrant no agota ninguna fila.
+- Otros: el lote se divide por la mitad recursivamente para aislar los
+  productos que fallan; solo esos cuentan un intento. Tras
+  VECTOR_OUTBOX_MAX_ATTEMPTS intentos la fila se marca como fallida
+  (failed_at) y deja de reintentarse; requeue_failed (o
+  scripts/requeue_vector_outbox.py) la devuelve a la cola.
+
+get_stats() expone las filas pendientes, las fallidas y la antigüedad de la
+pendiente más vieja (lag).
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# false: este proceso solo encola (el outbox lo drena otro proceso/instancia)
+VECTOR_OUTBOX_WORKER = os.getenv("VECTOR_OUTBOX_WORKER", "true").lower() == "true"
+VECTOR_OUTBOX_BATCH_SIZE = int(os.getenv("VECTOR_OUTBOX_BATCH_SIZE", "100"))
+VECTOR_OUTBOX_POLL_SECONDS = float(os.getenv("VECTOR_OUTBOX_POLL_SECONDS", "2"))
+VECTOR_OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("VECTOR_OUTBOX_RETRY_BASE_SECONDS", "2"))
+VECTOR_OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("VECTOR_OUTBOX_RETRY_MAX_SECONDS", "300"))
+VECTOR_OUTBOX_MAX_ATTEMPTS = int(os.getenv("VECTOR_OUTBOX_MAX_ATTEMPTS", "10"))
+# Tiempo que una fila reclamada queda fuera de la cola mientras se procesa
+VECTOR_OUTBOX_LEASE_SECONDS = float(os.getenv("VECTOR_OUTBOX_LEASE_SECONDS", "120"))
+
+
+def enqueue_vector_sync(conn, product_id: int, operation: str = "upsert"):
+    """
+    Registra que el producto cambió. No hace commit: debe ir en la misma
+    transacción que la escritura del producto.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO vector_outbox (product_id, operation) VALUES (%s, %s)",
+        (product_id, operation)
+    )
+
+
+class VectorOutboxWorker:
+    """Hilo que drena vector_outbox por lotes hacia Qdrant y el índice local"""
+
+    def __init__(self,
+                 batch_size: int = VECTOR_OUTBOX_BATCH_SIZE,
+                 poll_seconds: float = VECTOR_OUTBOX_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        # Lotes seguidos con error transitorio: backoff mientras Qdrant no responde
+        self._outage_failures = 0
+        self.processed = 0
+        self.upserted = 0
+        self.deleted = 0
+        self.failed_batches = 0
+        self.transient_failures = 0
+        self.failed_products = 0
+        self.dead_lettered = 0
+        self.last_error: Optional[str] = None
+        self.last_batch_seconds: Optional[float] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vector-outbox", daemon=True)
+        self._thread.start()
+        logger.info("Worker de vector_outbox iniciado")
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def notify(self):
+        """Despierta al worker tras un commit (evita esperar al siguiente sondeo)"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                logger.error(f"Error en el worker de vector_outbox: {e}")
+                processed = 0
+            if processed < self.batch_size:
+                # Sin más trabajo pendiente: esperar al sondeo o a un notify
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def process_batch(self) -> int:
+        """Procesa un lote; retorna cuántas filas del outbox sincronizó"""
+        from services.qdrant.client_provider import _is_transient
+
+        rows, active = self._claim()
+        if not rows:
+            return 0
+        products_by_id = {product["id"]: product for product in active}
+        # Varias filas del mismo producto se sincronizan una sola vez
+        product_ids = sorted({row["product_id"] for row in rows})
+
+        started = time.perf_counter()
+        try:
+            synced, failed = self._sync(product_ids, products_by_id)
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            self._reschedule_outage(rows, e)
+            # 0: el worker espera al siguiente sondeo en lugar de insistir
+            return 0
+        self._outage_failures = 0
+        done = [row for row in rows if row["product_id"] in synced]
+        self._complete(done, [row for row in rows if row["product_id"] in failed], failed)
+        self.last_batch_seconds = round(time.perf_counter() - started, 3)
+        self.processed += len(done)
+        self.upserted += len([product_id for product_id in synced if product_id in products_by_id])
+        self.deleted += len([product_id for product_id in synced if product_id not in products_by_id])
+        return len(done)
+
+    def _claim(self):
+        """
+        Reclama filas disponibles y lee sus productos en una transacción
+        corta; las filas quedan con un lease hasta que se completan.
+        """
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT id, product_id, attempts FROM vector_outbox
+                   WHERE failed_at IS NULL AND available_at <= CURRENT_TIMESTAMP(3)
+                   ORDER BY id LIMIT %s
+                   FOR UPDATE SKIP LOCKED""",
+                (self.batch_size,)
+            )
+            rows = cursor.fetchall()
+            active = []
+            if rows:
+                outbox_ids = [row["id"] for row in rows]
+                cursor.execute(
+                    f"""UPDATE vector_outbox
+                        SET available_at = CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND
+                        WHERE id IN ({', '.join(['%s'] * len(outbox_ids))})""",
+                    [int(VECTOR_OUTBOX_LEASE_SECONDS * 1_000_000)] + outbox_ids
+                )
+                product_ids = sorted({row["product_id"] for row in rows})
+                cursor.execute(
+                    f"SELECT * FROM products WHERE id IN ({', '.join(['%s'] * len(product_ids))}) AND is_active = TRUE",
+                    product_ids
+                )
+                active = cursor.fetchall()
+            conn.commit()
+            return rows, active
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _sync(self, product_ids: List[int], products_by_id: Dict[int, Dict[str, Any]]):
+        """
+        Sincroniza los productos (upsert de activos, delete de borrados o
+        desactivados). Retorna (ids sincronizados, {id: error} de los que
+        fallan). Ante un error no transitorio divide el grupo por la mitad
+        para aislar los productos que fallan; los transitorios se propagan.
+        """
+        from services.qdrant.client_provider import _is_transient
+        from services.qdrant.vector_sync_service import upsert_products_batch, delete_products_batch
+
+        try:
+            upsert_products_batch([products_by_id[product_id] for product_id in product_ids
+                                   if product_id in products_by_id])
+            delete_products_batch([product_id for product_id in product_ids if product_id not in products_by_id])
+            return set(product_ids), {}
+        except Exception as e:
+            if _is_transient(e):
+                raise
+            if len(product_ids) == 1:
+                return set(), {product_ids[0]: e}
+            middle = len(product_ids) // 2
+            synced_left, failed_left = self._sync(product_ids[:middle], products_by_id)
+            synced_right, failed_right = self._sync(product_ids[middle:], products_by_id)
+            return synced_left | synced_right, {**failed_left, **failed_right}
+
+    def _complete(self, done: List[Dict[str, Any]], failed_rows: List[Dict[str, Any]],
+                  errors: Dict[int, Exception]):
+        """Borra las filas sincronizadas y cuenta un intento a las que fallaron"""
+        if not done and not failed_rows:
+            return
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            if done:
+                outbox_ids = [row["id"] for row in done]
+                cursor.execute(
+                    f"DELETE FROM vector_outbox WHERE id IN ({', '.join(['%s'] * len(outbox_ids))})", outbox_ids
+                )
+            if failed_rows:
+                self._reschedule_failed(cursor, failed_rows, errors)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _reschedule_failed(self, cursor, rows: List[Dict[str, Any]], errors: Dict[int, Exception]):
+        self.failed_batches += 1
+        self.failed_products += len(errors)
+        for row in rows:
+            error = str(errors[row["product_id"]])[:500]
+            self.last_error = error
+            if row["attempts"] + 1 >= VECTOR_OUTBOX_MAX_ATTEMPTS:
+                # Intentos agotados: se marca como fallida y sale de la cola
+                cursor.execute(
+                    """UPDATE vector_outbox
+                       SET attempts = attempts + 1, last_error = %s, failed_at = CURRENT_TIMESTAMP(3)
+                       WHERE id = %s""",
+                    (error, row["id"])
+                )
+                self.dead_lettered += 1
+                logger.error(
+                    f"Fila {row['id']} de vector_outbox (producto {row['product_id']}) "
+                    f"marcada como fallida tras {row['attempts'] + 1} intentos: {error}"
+                )
+                continue
+            logger.warning(f"Sincronización del producto {row['product_id']} falló, se reintentará: {error}")
+            # Backoff exponencial con jitter por fila según sus intentos previos
+            delay = min(VECTOR_OUTBOX_RETRY_MAX_SECONDS, VECTOR_OUTBOX_RETRY_BASE_SECONDS * 2 ** row["attempts"])
+            delay = random.uniform(delay / 2, delay)
+            cursor.execute(
+                """UPDATE vector_outbox
+                   SET attempts = attempts + 1, last_error = %s,
+                       available_at = CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND
+                   WHERE id = %s""",
+                (error, int(delay * 1_000_000), row["id"])
+            )
+
+    def _reschedule_outage(self, rows: List[Dict[str, Any]], error: Exception):
+        """Error transitorio: reprograma el lote sin contar intentos"""
+        self.transient_failures += 1
+        self._outage_failures += 1
+        self.last_error = str(error)[:500]
+        delay = min(VECTOR_OUTBOX_RETRY_MAX_SECONDS,
+                    VECTOR_OUTBOX_RETRY_BASE_SECONDS * 2 ** (self._outage_failures - 1))
+        delay = random.uniform(delay / 2, delay)
+        logger.warning(
+            f"Qdrant no disponible, {len(rows)} filas de vector_outbox se reintentarán en {delay:.1f}s: {error}"
+        )
+        outbox_ids = [row["id"] for row in rows]
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""UPDATE vector_outbox
+                    SET last_error = %s, available_at = CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND
+                    WHERE id IN ({', '.join(['%s'] * len(outbox_ids))})""",
+                [self.last_error, int(delay * 1_000_000)] + outbox_ids
+            )
+            conn.commit()
+        except Exception:
+            # Las filas vuelven a la cola al vencer el lease
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ---------- Filas fallidas ----------
+
+    def list_failed(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Filas marcadas como fallidas, las más recientes primero"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT id, product_id, operation, attempts, last_error, created_at, failed_at
+                   FROM vector_outbox WHERE failed_at IS NOT NULL
+                   ORDER BY failed_at DESC LIMIT %s""",
+                (limit,)
+            )
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def requeue_failed(self, product_ids: Optional[List[int]] = None) -> int:
+        """
+        Devuelve a la cola las filas fallidas (todas o las de los productos
+        indicados) con los intentos a cero. Retorna cuántas se reencolaron.
+        """
+        query = """UPDATE vector_outbox
+                   SET failed_at = NULL, attempts = 0, available_at = CURRENT_TIMESTAMP(3)
+                   WHERE failed_at IS NOT NULL"""
+        params: List[Any] = []
+        if product_ids:
+            query += f" AND product_id IN ({', '.join(['%s'] * len(product_ids))})"
+            params = list(product_ids)
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            requeued = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        self.notify()
+        return requeued
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "batch_size": self.batch_size,
+            "processed": self.processed,
+            "upserted": self.upserted,
+            "deleted": self.deleted,
+            "failed_batches": self.failed_batches,
+            "failed_products": self.failed_products,
+            "transient_failures": self.transient_failures,
+            "dead_lettered": self.dead_lettered,
+            "max_attempts_allowed": VECTOR_OUTBOX_MAX_ATTEMPTS,
+            "last_error": self.last_error,
+            "last_batch_seconds": self.last_batch_seconds,
+        }
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """SELECT COALESCE(SUM(failed_at IS NULL), 0) AS pending,
+                          COALESCE(SUM(failed_at IS NOT NULL), 0) AS failed,
+                          MAX(CASE WHEN failed_at IS NULL THEN attempts END) AS max_attempts,
+                          TIMESTAMPDIFF(MICROSECOND,
+                                        MIN(CASE WHEN failed_at IS NULL THEN created_at END),
+                                        CURRENT_TIMESTAMP(3)) AS lag_us
+                   FROM vector_outbox"""
+            )
+            row = cursor.fetchone()
+            stats["pending"] = int(row["pending"])
+            # Filas con los intentos agotados: requieren revisión manual
+            stats["failed"] = int(row["failed"])
+            stats["max_attempts"] = row["max_attempts"] or 0
+            # Antigüedad del cambio más viejo aún sin sincronizar
+            stats["lag_seconds"] = round(row["lag_us"] / 1_000_000, 3) if row["lag_us"] is not None else 0.0
+        finally:
+            conn.close()
+        return stats
+
+
+# Instancia global del worker
+vector_outbox_worker = VectorOutboxWorker()
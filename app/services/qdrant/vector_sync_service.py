@@ -15,38 +15,50 @@ def convert_for_qdrant(obj):
     else:
         return obj
 
-import requests
+import hashlib
 import os
 import logging
-from sentence_transformers import SentenceTransformer
-
-QDRANT_URL = os.getenv("QDRANT_URL", "http://qdrant:6333")
-COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "products_kb")
+from typing import List
+from qdrant_client.models import PointStruct, PointIdsList, SparseVector
+from services.embeddings.embedding_registry import embedding_registry
+from services.embeddings.sparse_encoder import SPARSE_VECTOR_NAME, encode_document, product_text
+from services.embeddings.local_index import local_product_index
+from services.qdrant.payload_schema import project_payload
+from services.qdrant.client_provider import qdrant_provider, QDRANT_COLLECTION as COLLECTION_NAME
 
 logger = logging.getLogger(__name__)
 
+# Hash del texto embebido guardado en el payload: la sincronización incremental
+# (data/qdrant/load_kb.py) solo vuelve a embeber si cambia
+TEXT_HASH_FIELD = "_text_hash"
+
+def product_payload(product: dict) -> dict:
+    """
+    Payload del punto: solo los campos de payload_schema.PAYLOAD_FIELDS
+    (convertidos a tipos JSON) más el hash del texto embebido.
+    """
+    payload = convert_for_qdrant(project_payload(product))
+    payload[TEXT_HASH_FIELD] = product_text_hash(payload)
+    return payload
+
 def add_product(product: dict):
     """
     Agrega un producto a Qdrant como un punto/vector.
     El producto debe contener al menos 'id' y 'name'.
     """
     try:
-        # Convert Decimal to float for Qdrant compatibility
-        product_clean = convert_for_qdrant(product)
+        product_clean = product_payload(product)
         vector = extract_vector_from_product(product_clean)
-        payload = {
-            "points": [
-                {
-                    "id": product_clean["id"],
-                    "vector": vector,
-                    "payload": product_clean
-                }
-            ]
-        }
-        url = f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points"
-        response = requests.put(url, json=payload)
-        response.raise_for_status()
-        return response.json()
+        # El índice local se actualiza aunque Qdrant falle (es su respaldo)
+        local_product_index.upsert(product_clean["id"], vector, product_clean)
+        if qdrant_provider.has_sparse_vector():
+            # Colección híbrida: el upsert reemplaza todos los vectores del punto
+            vector = {"": vector, SPARSE_VECTOR_NAME: extract_sparse_vector_from_product(product_clean)}
+        point = PointStruct(id=product_clean["id"], vector=vector, payload=product_clean)
+        return qdrant_provider.call(
+            lambda client: client.upsert(collection_name=COLLECTION_NAME, points=[point]),
+            "upsert de producto"
+        )
     except Exception as e:
         logger.error(f"Error agregando producto a Qdrant: {e}")
         return None
@@ -61,26 +73,61 @@ def delete_product(product_id: int):
     """
     Elimina un producto de Qdrant por su ID.
     """
+    local_product_index.delete(product_id)
     try:
-        url = f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points/delete"
-        payload = {"points": [product_id]}
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        return response.json()
+        return qdrant_provider.call(
+            lambda client: client.delete(
+                collection_name=COLLECTION_NAME, points_selector=PointIdsList(points=[product_id])
+            ),
+            "borrado de producto"
+        )
     except Exception as e:
         logger.error(f"Error eliminando producto de Qdrant: {e}")
         return None
 
 
+def upsert_products_batch(products: List[dict]):
+    """
+    Embebe en bloque y hace upsert de varios productos en una sola llamada.
+    A diferencia de add_product, los errores se propagan (el llamador reintenta).
+    """
+    if not products:
+        return None
+    products_clean = [product_payload(product) for product in products]
+    vectors = embedding_registry.encode([product_text(product) for product in products_clean], EMBED_MODEL)
+    hybrid = qdrant_provider.has_sparse_vector()
+    points = []
+    for product, vector in zip(products_clean, vectors):
+        vector = vector.tolist()
+        local_product_index.upsert(product["id"], vector, product)
+        if hybrid:
+            vector = {"": vector, SPARSE_VECTOR_NAME: extract_sparse_vector_from_product(product)}
+        points.append(PointStruct(id=product["id"], vector=vector, payload=product))
+    return qdrant_provider.call(
+        lambda client: client.upsert(collection_name=COLLECTION_NAME, points=points),
+        f"upsert de {len(points)} productos"
+    )
+
+def delete_products_batch(product_ids: List[int]):
+    """Elimina varios productos en una sola llamada; los errores se propagan"""
+    if not product_ids:
+        return None
+    for product_id in product_ids:
+        local_product_index.delete(product_id)
+    return qdrant_provider.call(
+        lambda client: client.delete(
+            collection_name=COLLECTION_NAME, points_selector=PointIdsList(points=list(product_ids))
+        ),
+        f"borrado de {len(product_ids)} productos"
+    )
+
+
 EMBED_MODEL = os.getenv("EMBED_MODEL", "intfloat/multilingual-e5-small")
 VECTOR_SIZE = 384
-_embedder = None
 
 def get_embedder():
-    global _embedder
-    if _embedder is None:
-        _embedder = SentenceTransformer(EMBED_MODEL)
-    return _embedder
+    """Backend de embeddings compartido del proceso (ver embedding_registry y EMBEDDING_BACKEND)"""
+    return embedding_registry.get(EMBED_MODEL)
 
 def extract_vector_from_product(product: dict):
     """
@@ -89,6 +136,19 @@ def extract_vector_from_product(product: dict):
     name = product.get("name", "")
     description = product.get("description", "")
     text = f"{name}. {description}"
-    embedder = get_embedder()
-    vector = embedder.encode([text], normalize_embeddings=True)[0]
-    return vector.tolist() if hasattr(vector, 'tolist') else list(vector)
+    return embedding_registry.encode_query(text, EMBED_MODEL)
+
+def extract_sparse_vector_from_product(product: dict) -> SparseVector:
+    """
+    Vector disperso BM25 (nombres de modelo, números) del mismo texto que el denso.
+    """
+    indices, values = encode_document(product_text(product))
+    return SparseVector(indices=indices, values=values)
+
+def product_text_hash(product: dict) -> str:
+    """
+    Hash del texto embebido y del modelo/backend que lo embebe: si cualquiera
+    cambia, el vector guardado ya no corresponde.
+    """
+    key = f"{embedding_registry.variant}|{EMBED_MODEL}|{product_text(product)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
@@ -0,0 +1,86 @@
+"""
+Totales de usuarios cacheados para el listado de administración.
+
+COUNT(*) sobre users recorre toda la tabla. El listado admin solo necesita un
+total aproximado para la interfaz:
+- total general: estimación de InnoDB (EXPLAIN), sin recorrer la tabla.
+- admin: COUNT(*) exacto, pocas filas por idx_role.
+- user: total estimado menos admins (la gran mayoría de la tabla).
+
+Los valores se sirven desde memoria; cuando superan
+USERS_COUNT_REFRESH_SECONDS se devuelve el anterior y se recalcula en un hilo
+en segundo plano (stale-while-revalidate). Crear o eliminar un usuario
+invalida los conteos.
+
+Las consultas por prefijo de email no se cachean (cada prefijo sería una
+clave nueva con su COUNT(*) síncrono): para ellas no hay total.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from services.user.userService import get_users_count_db, get_users_count_estimate_db
+
+logger = logging.getLogger(__name__)
+
+USERS_COUNT_REFRESH_SECONDS = float(os.getenv("USERS_COUNT_REFRESH_SECONDS", "60"))
+
+
+class CachedUserCounts:
+    """Conteos por rol (None = todos) refrescados en segundo plano"""
+
+    def __init__(self, refresh_seconds: float = USERS_COUNT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        # Solo dos claves: None (estimado) y 'admin' (exacto); 'user' se deriva
+        self._values: Dict[Optional[str], tuple] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, role: Optional[str] = None) -> int:
+        if role == "user":
+            return max(0, self._get(None) - self._get("admin"))
+        return self._get(role)
+
+    def _get(self, role: Optional[str]) -> int:
+        with self._lock:
+            cached = self._values.get(role)
+        if cached is None:
+            return self._refresh(role)
+        value, computed_at = cached
+        if time.monotonic() - computed_at > self.refresh_seconds:
+            self._refresh_in_background(role)
+        return value
+
+    def _refresh(self, key: Optional[str]) -> int:
+        value = get_users_count_estimate_db() if key is None else get_users_count_db(role=key)
+        with self._lock:
+            self._values[key] = (value, time.monotonic())
+        return value
+
+    def _refresh_in_background(self, key: Optional[str]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._refresh(key)
+            except Exception as e:
+                logger.warning(f"Error refrescando conteo de usuarios {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name="users-count-refresh", daemon=True).start()
+
+    def invalidate(self):
+        """Marca todos los conteos como vencidos (se refrescan en la próxima lectura)"""
+        with self._lock:
+            self._values = {key: (value, 0.0) for key, (value, _) in self._values.items()}
+
+
+# Instancia global de los conteos
+user_counts = CachedUserCounts()
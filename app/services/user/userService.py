@@ -1,16 +1,27 @@
 
 # Refactor: Usar modelos para acceso a datos y solo lógica de negocio aquí
 from typing import Optional, Dict, Any, List
-from auth.auth_utils import hash_password, verify_password
+from fastapi.concurrency import run_in_threadpool
+from auth.password_hasher import password_hasher
+from auth.principal_cache import invalidate_principal
+from auth.token_revocation import token_revocation_store
 from database import get_connection
 from models.usuarios import crear_usuario, obtener_usuario_por_id, actualizar_usuario, eliminar_usuario
 
 def create_user_db(name: str, email: str, password: str, role: str = "user") -> Optional[int]:
     """Crea un nuevo usuario con contraseña hasheada usando el modelo"""
+    return _insert_user(name, email, password_hasher.hash(password), role)
+
+async def create_user_async(name: str, email: str, password: str, role: str = "user") -> Optional[int]:
+    """Como create_user_db: bcrypt se espera en el event loop y solo el INSERT va al threadpool"""
+    hashed_password = await password_hasher.hash_async(password)
+    return await run_in_threadpool(_insert_user, name, email, hashed_password, role)
+
+def _insert_user(name: str, email: str, hashed_password: str, role: str) -> Optional[int]:
     conn = get_connection()
     try:
-        hashed_password = hash_password(password)
         user_id = crear_usuario(conn, name, email, hashed_password, role)
+        _invalidate_user_counts()
         return user_id
     except Exception as e:
         print(f"Error creando usuario: {e}")
@@ -19,6 +30,11 @@ def create_user_db(name: str, email: str, password: str, role: str = "user") ->
     finally:
         conn.close()
 
+def _invalidate_user_counts():
+    # Import local: userCounts importa este módulo
+    from services.user.userCounts import user_counts
+    user_counts.invalidate()
+
 def get_user_by_id_db(user_id: int) -> Optional[Dict[str, Any]]:
     """Obtiene un usuario por su ID usando el modelo"""
     conn = get_connection()
@@ -35,6 +51,7 @@ def update_user_db(user_id: int, name: Optional[str] = None, email: Optional[str
     conn = get_connection()
     try:
         actualizar_usuario(conn, user_id, name, email)
+        invalidate_principal(user_id)
         return True
     except Exception as e:
         print(f"Error actualizando usuario: {e}")
@@ -48,6 +65,9 @@ def delete_user_db(user_id: int) -> bool:
     conn = get_connection()
     try:
         eliminar_usuario(conn, user_id)
+        invalidate_principal(user_id)
+        token_revocation_store.revoke_user(user_id)
+        _invalidate_user_counts()
         return True
     except Exception as e:
         print(f"Error eliminando usuario: {e}")
@@ -59,16 +79,31 @@ def delete_user_db(user_id: int) -> bool:
 
 def change_password_db(user_id: int, current_password: str, new_password: str) -> bool:
     """Cambia la contraseña de un usuario"""
+    # Verificar la contraseña actual
+    user = get_user_by_id_db(user_id)
+    if not user or not password_hasher.verify(current_password, user["password"]):
+        return False
+    return _set_password(user_id, password_hasher.hash(new_password))
+
+
+async def change_password_async(user_id: int, current_password: str, new_password: str) -> bool:
+    """Como change_password_db, sin ocupar un hilo del threadpool mientras bcrypt calcula"""
+    user = await run_in_threadpool(get_user_by_id_db, user_id)
+    if not user or not await password_hasher.verify_async(current_password, user["password"]):
+        return False
+    hashed_password = await password_hasher.hash_async(new_password)
+    return await run_in_threadpool(_set_password, user_id, hashed_password)
+
+
+def _set_password(user_id: int, hashed_password: str) -> bool:
     conn = get_connection()
     try:
         cursor = conn.cursor()
-        # Verificar la contraseña actual
-        user = get_user_by_id_db(user_id)
-        if not user or not verify_password(current_password, user["password"]):
-            return False
-        hashed_password = hash_password(new_password)
         cursor.execute("UPDATE users SET password = %s WHERE id = %s", (hashed_password, user_id))
         conn.commit()
+        invalidate_principal(user_id)
+        # Cerrar las sesiones abiertas con la contraseña anterior
+        token_revocation_store.bump_version(user_id)
         return cursor.rowcount > 0
     except Exception as e:
         print(f"Error cambiando contraseña: {e}")
@@ -78,6 +113,28 @@ def change_password_db(user_id: int, current_password: str, new_password: str) -
         conn.close()
 
 
+def update_password_hash_db(user_id: int, old_hash: str, new_hash: str) -> bool:
+    """
+    Reemplaza el hash de la contraseña por uno con los parámetros actuales.
+    Solo actualiza si el hash no cambió desde que se leyó (no pisa un cambio de contraseña).
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE users SET password = %s WHERE id = %s AND password = %s",
+            (new_hash, user_id, old_hash)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+    except Exception as e:
+        print(f"Error actualizando hash de contraseña: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
 def get_user_by_email_db(email: str) -> Optional[Dict[str, Any]]:
     """Obtiene un usuario por email (incluye password para autenticación)"""
     conn = get_connection()
@@ -91,15 +148,41 @@ def get_user_by_email_db(email: str) -> Optional[Dict[str, Any]]:
     finally:
         conn.close()
 
-def get_all_users_db(skip: int = 0, limit: int = 100) -> list:
-    """Obtiene todos los usuarios con paginación"""
+def _users_filters(role: Optional[str] = None, email_prefix: Optional[str] = None):
+    """Construye el WHERE de los filtros de usuarios (rol y prefijo de email)"""
+    conditions, params = [], []
+    if role:
+        conditions.append("role = %s")
+        params.append(role)
+    if email_prefix:
+        # Prefijo sin comodines del usuario: usa el índice único de email
+        escaped = email_prefix.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("email LIKE %s")
+        params.append(f"{escaped}%")
+    return conditions, params
+
+def get_all_users_db(skip: int = 0, limit: int = 100, after_id: Optional[int] = None,
+                     role: Optional[str] = None, email_prefix: Optional[str] = None) -> list:
+    """
+    Obtiene usuarios ordenados por id con paginación keyset.
+
+    Con after_id se leen solo los ids mayores (costo constante por página);
+    skip (OFFSET) se mantiene por compatibilidad y solo se usa sin after_id.
+    """
+    conditions, params = _users_filters(role, email_prefix)
+    if after_id is not None:
+        conditions.append("id > %s")
+        params.append(after_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"SELECT id, name, email, role, register_date, updated_at FROM users {where} ORDER BY id LIMIT %s"
+    params.append(limit)
+    if after_id is None and skip:
+        query += " OFFSET %s"
+        params.append(skip)
     conn = get_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, name, email, role, register_date, updated_at FROM users ORDER BY id LIMIT %s OFFSET %s", 
-            (limit, skip)
-        )
+        cursor.execute(query, params)
         return cursor.fetchall()
     finally:
         conn.close()
@@ -110,21 +193,59 @@ def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
     if not user:
         return None
     
-    if not verify_password(password, user['password']):
+    valid, new_hash = password_hasher.verify_and_update(password, user['password'])
+    if not valid:
         return None
+
+    # Re-hash transparente cuando cambió BCRYPT_ROUNDS
+    if new_hash:
+        update_password_hash_db(user['id'], user['password'], new_hash)
     
     # Remover password del resultado
     user.pop('password', None)
     return user
 
-def get_users_count_db() -> int:
-    """Obtiene el número total de usuarios"""
+async def authenticate_user_async(email: str, password: str) -> Optional[Dict[str, Any]]:
+    """Como authenticate_user; las consultas van al threadpool y bcrypt se espera en el event loop"""
+    user = await run_in_threadpool(get_user_by_email_db, email)
+    if not user:
+        return None
+
+    valid, new_hash = await password_hasher.verify_and_update_async(password, user['password'])
+    if not valid:
+        return None
+
+    if new_hash:
+        await run_in_threadpool(update_password_hash_db, user['id'], user['password'], new_hash)
+
+    user.pop('password', None)
+    return user
+
+def get_users_count_db(role: Optional[str] = None, email_prefix: Optional[str] = None) -> int:
+    """Obtiene el número total de usuarios (con filtros opcionales)"""
+    conditions, params = _users_filters(role, email_prefix)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) as count FROM users {where}", params)
+        result = cursor.fetchone()
+        return result["count"] if result else 0
+    finally:
+        conn.close()
+
+def get_users_count_estimate_db() -> int:
+    """
+    Total aproximado de usuarios según las estadísticas de InnoDB, sin
+    recorrer la tabla. Se usa EXPLAIN y no information_schema.TABLES: en
+    MySQL 8 TABLE_ROWS se cachea hasta information_schema_stats_expiry (24 h).
+    """
     conn = get_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) as count FROM users")
+        cursor.execute("EXPLAIN SELECT id FROM users")
         result = cursor.fetchone()
-        return result[0] if result else 0
+        return int(result["rows"] or 0) if result else 0
     finally:
         conn.close()
 